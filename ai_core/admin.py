@@ -1,3 +1,8 @@
 from django.contrib import admin
-
+from ai_core.models import Question
 # Register your models here.
+@admin.register(Question)
+class QuestionAdmin(admin.ModelAdmin):
+    list_display = ("question", "kind", "topic", "difficulty", "created_at")
+    list_filter = ("kind", "difficulty")
+    search_fields = ("topic", "question")
@@ -0,0 +1,249 @@
+"""
+Simulated LLM backends for the bench_* management commands.
+
+They stand in for the Groq chains so benchmarks are repeatable and free:
+latency follows time-to-first-token plus a per-item generation cost, and
+completions longer than `max_items` are truncated the way long single
+completions are in production. Like the cacheable (temperature 0) model,
+identical prompts get identical questions.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import time
+
+from langchain_core.language_models.chat_models import (
+    BaseChatModel, agenerate_from_stream, generate_from_stream,
+)
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.runnables import RunnableLambda
+from pydantic import PrivateAttr
+
+_counter = itertools.count(1)
+
+
+class SimulatedLLM:
+    def __init__(self, ttft=0.4, per_item=0.3, max_items=30, jitter=0.1, scale=1.0, seed=7):
+        self.ttft = ttft
+        self.per_item = per_item
+        self.max_items = max_items
+        self.jitter = jitter
+        self.scale = scale
+        self._rng = random.Random(seed)
+
+    def items_for(self, requested: int) -> int:
+        return min(int(requested), self.max_items)
+
+    def latency(self, n_items: int) -> float:
+        base = self.ttft + self.per_item * n_items
+        return base * (1 + self._rng.uniform(-self.jitter, self.jitter)) * self.scale
+
+    def wait(self, n_items: int):
+        time.sleep(self.latency(n_items))
+
+    async def await_(self, n_items: int):
+        await asyncio.sleep(self.latency(n_items))
+
+
+def prompt_seed(inputs: dict) -> int:
+    """
+    First question number of the completion for these prompt inputs:
+    the same prompt always numbers its questions alike.
+    """
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return int(digest[:10], 16) * 1000
+
+
+def fake_mcq(topic: str, n: int = None) -> dict:
+    n = next(_counter) if n is None else n
+    return {
+        "question": f"Question {n} about {topic}?",
+        "options": [f"A option {n}a", f"B option {n}b", f"C option {n}c", f"D option {n}d"],
+        "answer": "ABCD"[n % 4],
+    }
+
+
+def fake_quiz_block(topic: str, n: int = None) -> str:
+    n = next(_counter) if n is None else n
+    return (
+        f"Q: Question {n} about {topic}?\n"
+        f"A. Option {n}a\n"
+        f"B. Option {n}b\n"
+        f"C. Option {n}c\n"
+        f"D. Option {n}d\n"
+        f"Answer: {'ABCD'[n % 4]}\n"
+        f"Explanation: Option {'ABCD'[n % 4]} is correct because of reason {n}.\n"
+        f"Area of Improvement:\n"
+        f"- Concept: Concept {n} of {topic}\n"
+        f"- What to practice: Work through exercise set {n}\n"
+    )
+
+
+TUTORIAL_WORDS = (
+    "the kernel schedules each process on a core while the memory manager maps "
+    "virtual pages to physical frames – a page fault loads the missing page from "
+    "disk, and the “working set” of a process is the set of pages it touches often"
+).split()
+
+
+def fake_tutorial(topic: str, sections: int, seed: int = 0) -> str:
+    """
+    Tutorial text in the generator's format: section headers, numbered
+    subheadings, bullets and paragraphs of varying length, exam points and
+    code blocks. About 1.1 PDF pages per section.
+    """
+    rng = random.Random(seed)
+
+    def sentence(words: int) -> str:
+        return " ".join(rng.choice(TUTORIAL_WORDS) for _ in range(words)).capitalize() + "."
+
+    lines = [f"# {topic}"]
+    for s in range(1, sections + 1):
+        lines += ["", f"SECTION {s}: CORE CONCEPTS OF {topic.upper()}:"]
+        for sub in range(1, 4):
+            lines += ["", f"{s}.{sub} **{sentence(rng.randint(2, 5))[:-1]}**:"]
+            lines += [f"- {sentence(rng.randint(6, 40))}" for _ in range(rng.randint(3, 6))]
+            lines.append(" ".join(sentence(rng.randint(8, 20)) for _ in range(rng.randint(2, 5))))
+        lines += ["", f"EXAM POINT: {sentence(rng.randint(10, 30))}"]
+        lines += ["```", f"def step_{s}(pages):", "    # " + sentence(8), "    return [p for p in pages if p.dirty]", "```"]
+    return "\n".join(lines)
+
+
+def fake_summary(topic: str, sections: int, seed: int = 0) -> str:
+    """
+    Summary notes in the generator's format: upper-case section headers,
+    bullet points, and numbered points in "steps" sections.
+    """
+    rng = random.Random(seed)
+
+    def sentence(words: int) -> str:
+        return " ".join(rng.choice(TUTORIAL_WORDS) for _ in range(words)).capitalize() + "."
+
+    lines = []
+    for s in range(1, sections + 1):
+        steps = s % 3 == 0
+        lines += ["", f"KEY {'STEPS' if steps else 'IDEAS'} OF {topic.upper()} PART {s}:"]
+        lines += [f"- {sentence(rng.randint(6, 30))}" for _ in range(rng.randint(4, 8))]
+    return "\n".join(lines).strip()
+
+
+def mcq_runnable(sim: SimulatedLLM) -> RunnableLambda:
+    def output(inputs: dict, n: int) -> dict:
+        seed = prompt_seed(inputs)
+        return {"mcqs": [fake_mcq(inputs["topic"], seed + i) for i in range(n)]}
+
+    def run(inputs: dict):
+        n = sim.items_for(inputs["num_ques"])
+        sim.wait(n)
+        return output(inputs, n)
+
+    async def arun(inputs: dict):
+        n = sim.items_for(inputs["num_ques"])
+        await sim.await_(n)
+        return output(inputs, n)
+    return RunnableLambda(run, afunc=arun)
+
+
+def quiz_runnable(sim: SimulatedLLM) -> RunnableLambda:
+    def output(inputs: dict, n: int) -> str:
+        seed = prompt_seed(inputs)
+        return "\n".join(fake_quiz_block(inputs["topic"], seed + i) for i in range(n))
+
+    def run(inputs: dict):
+        n = sim.items_for(inputs["num_questions"])
+        sim.wait(n)
+        return output(inputs, n)
+
+    async def arun(inputs: dict):
+        n = sim.items_for(inputs["num_questions"])
+        await sim.await_(n)
+        return output(inputs, n)
+    return RunnableLambda(run, afunc=arun)
+
+
+class SimulatedChatModel(BaseChatModel):
+    """
+    Streaming chat model with a long-tailed time to first token: a
+    `tail_share` of calls wait 5-10x `ttft` before streaming `tokens`
+    tokens. Counts calls started and streams completed.
+    """
+
+    model_name: str = "simulated"
+    ttft: float = 0.5
+    tail_share: float = 0.08
+    tokens: int = 40
+    per_token: float = 0.02
+    scale: float = 1.0
+    seed: int = 7
+    _rng: random.Random = PrivateAttr()
+    calls: int = 0
+    completed: int = 0
+
+    def model_post_init(self, __context):
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated"
+
+    def _first_token_delay(self) -> float:
+        delay = self.ttft * (1 + self._rng.uniform(-0.2, 0.2))
+        if self._rng.random() < self.tail_share:
+            delay *= self._rng.uniform(5, 10)
+        return delay * self.scale
+
+    def _chunk(self, i: int) -> ChatGenerationChunk:
+        return ChatGenerationChunk(message=AIMessageChunk(content=f"tok{i} "))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return generate_from_stream(self._stream(messages, stop=stop, **kwargs))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await agenerate_from_stream(self._astream(messages, stop=stop, **kwargs))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        time.sleep(self._first_token_delay())
+        for i in range(self.tokens):
+            if i:
+                time.sleep(self.per_token * self.scale)
+            yield self._chunk(i)
+        self.completed += 1
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self._first_token_delay())
+        for i in range(self.tokens):
+            if i:
+                await asyncio.sleep(self.per_token * self.scale)
+            yield self._chunk(i)
+        self.completed += 1
+
+
+def text_runnable(output_tokens: int, ttft: float, tokens_per_second: float, scale: float = 1.0,
+                  calls: list = None, prefill_per_1k: float = 0.0) -> RunnableLambda:
+    """
+    Text chain that answers after `ttft` plus `output_tokens` at
+    `tokens_per_second`, plus `prefill_per_1k` seconds per thousand prompt
+    tokens (4 characters each). Each call appends its inputs to `calls`.
+    """
+    def latency(inputs: dict):
+        prompt_tokens = sum(len(str(v)) for v in inputs.values()) / 4
+        return (ttft + output_tokens / tokens_per_second + prefill_per_1k * prompt_tokens / 1000) * scale
+
+    def output(inputs: dict) -> str:
+        if calls is not None:
+            calls.append(inputs)
+        return " ".join(f"word{i}" for i in range(int(output_tokens * 0.75)))
+
+    def run(inputs: dict):
+        time.sleep(latency(inputs))
+        return output(inputs)
+
+    async def arun(inputs: dict):
+        await asyncio.sleep(latency(inputs))
+        return output(inputs)
+    return RunnableLambda(run, afunc=arun)
@@ -0,0 +1,52 @@
+import logging
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from fpdf import FPDF
+
+from ai_core.services import documents
+
+LINE = "Page {page}, line {line}: virtual memory maps pages to frames through a multi-level page table."
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = "PDF text extraction throughput (pages/sec) by number of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=500)
+        parser.add_argument("--processes", default=f"1,{os.cpu_count() or 1}",
+                            help="Comma-separated process counts to compare.")
+
+    def handle(self, *args, **opts):
+        logging.disable(logging.WARNING)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "textbook.pdf")
+            self._write_pdf(path, opts["pages"])
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            self.stdout.write(f"{opts['pages']} pages, {size_mb:.1f} MB")
+            self.stdout.write(f"{'processes':>9} | {'time (s)':>8} | {'pages/sec':>9} | chars")
+            self.stdout.write("-" * 46)
+            try:
+                for processes in dict.fromkeys(int(p) for p in opts["processes"].split(",")):
+                    with override_settings(DOCUMENT_MAX_PAGES=max(opts["pages"], 1000)):
+                        start = time.perf_counter()
+                        chars = sum(len(t) for t in documents.iter_pdf_pages(path, processes=processes))
+                        elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f"{processes:>9} | {elapsed:>8.2f} | {opts['pages'] / elapsed:>9.1f} | {chars}"
+                    )
+            finally:
+                logging.disable(logging.NOTSET)
+
+    def _write_pdf(self, path, pages):
+        pdf = FPDF()
+        pdf.set_font("Arial", size=10)
+        for page in range(1, pages + 1):
+            pdf.add_page()
+            for line in range(1, 46):
+                pdf.cell(0, 6, LINE.format(page=page, line=line), ln=1)
+        pdf.output(path)
@@ -0,0 +1,73 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ai_core.benchmarks.fakes import SimulatedLLM, mcq_runnable, quiz_runnable
+from ai_core.services import mcq_generator, quiz_generator
+from ai_core.services.llm_config import MODEL_70B, MODEL_8B
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = "Latency vs question count for single-completion and chunked fan-out generation."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--generator", choices=["mcq", "quiz"], default="quiz")
+        parser.add_argument("--counts", default="5,10,20,30,50,75,100")
+        parser.add_argument("--chunk-size", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--scale", type=float, default=0.1,
+                            help="Multiplier on simulated latency (1.0 = realistic seconds).")
+        parser.add_argument("--live", action="store_true",
+                            help="Call Groq instead of the simulated model.")
+
+    def handle(self, *args, **opts):
+        logging.disable(logging.WARNING)
+        counts = [int(c) for c in opts["counts"].split(",")]
+
+        if opts["generator"] == "mcq":
+            module, chain_attr, run = mcq_generator, "mcq_chain", self._run_mcq
+            setting = "MCQ_CHUNK_SIZE"
+        else:
+            module, chain_attr, run = quiz_generator, "quiz_chain", self._run_quiz
+            setting = "QUIZ_CHUNK_SIZE"
+
+        original_chain = getattr(module, chain_attr)
+        if not opts["live"]:
+            sim = SimulatedLLM(scale=opts["scale"])
+            fake = mcq_runnable(sim) if opts["generator"] == "mcq" else quiz_runnable(sim)
+            setattr(module, chain_attr, fake)
+
+        self.stdout.write(f"{'count':>6} | {'single (s)':>10} {'items':>6} | {'chunked (s)':>11} {'items':>6} | speedup")
+        self.stdout.write("-" * 64)
+        try:
+            for count in counts:
+                with override_settings(**{setting: 10 ** 6, "FANOUT_TOPUP_ROUNDS": 0, "METRICS_ENABLED": False}):
+                    single_t, single_n = self._measure(run, count, opts["repeat"])
+                with override_settings(**{setting: opts["chunk_size"], "METRICS_ENABLED": False}):
+                    chunk_t, chunk_n = self._measure(run, count, opts["repeat"])
+                self.stdout.write(
+                    f"{count:>6} | {single_t:>10.3f} {single_n:>6.1f} | {chunk_t:>11.3f} {chunk_n:>6.1f} | "
+                    f"{single_t / chunk_t:>6.2f}x"
+                )
+        finally:
+            setattr(module, chain_attr, original_chain)
+            logging.disable(logging.NOTSET)
+
+    def _measure(self, run, count, repeat):
+        total_t, total_n = 0.0, 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            total_n += len(run(count))
+            total_t += time.perf_counter() - start
+        return total_t / repeat, total_n / repeat
+
+    def _run_mcq(self, count):
+        inputs = {"topic": "Binary Trees", "num_ques": count, "difficulty": "medium"}
+        return mcq_generator._generate_mcqs(inputs, MODEL_8B)
+
+    def _run_quiz(self, count):
+        inputs = {"topic": "Binary Trees", "num_questions": count, "difficulty": "medium"}
+        return quiz_generator._run_quiz_chain(inputs, MODEL_70B)
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ai_core.benchmarks.fakes import SimulatedChatModel
+from ai_core.services.hedging import HedgedChatModel
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = (
+        "Latency percentiles of LLM calls with a long-tailed time to first "
+        "token, sent directly vs hedged after the p95 TTFT deadline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=400)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--tail-share", type=float, default=0.04,
+                            help="Share of calls whose first token takes 5-10x longer.")
+        parser.add_argument("--backup-speed", type=float, default=1.0,
+                            help="Backup latency relative to the primary (e.g. 0.4 for a smaller model).")
+        parser.add_argument("--scale", type=float, default=0.2,
+                            help="Multiplier on simulated latency (1.0 = realistic seconds).")
+
+    def handle(self, *args, **opts):
+        logging.disable(logging.WARNING)
+
+        def model(name, seed, speed=1.0):
+            return SimulatedChatModel(model_name=name, tail_share=opts["tail_share"],
+                                      scale=opts["scale"] * speed, seed=seed)
+
+        self.stdout.write(f"{'mode':<8} | {'p50 (s)':>7} | {'p95 (s)':>7} | {'p99 (s)':>7} | "
+                          f"{'max (s)':>7} | {'hedged':>6} | backup won")
+        self.stdout.write("-" * 72)
+        try:
+            with override_settings(METRICS_ENABLED=False):
+                direct = model("direct", seed=1)
+                self._report("direct", asyncio.run(self._run(direct, opts)), 0, 0, opts["calls"])
+
+                primary = model("primary", seed=1)
+                backup = model("backup", seed=2, speed=opts["backup_speed"])
+                hedged = HedgedChatModel(primary=primary, backup=backup)
+                # Fill the TTFT window first so the deadline is the real p95
+                asyncio.run(self._run(hedged, {**opts, "calls": 50}))
+                hedges, wins = backup.calls, backup.completed
+                latencies = asyncio.run(self._run(hedged, opts))
+                self._report("hedged", latencies, backup.calls - hedges,
+                             backup.completed - wins, opts["calls"])
+        finally:
+            logging.disable(logging.NOTSET)
+
+    async def _run(self, llm, opts):
+        semaphore = asyncio.Semaphore(opts["concurrency"])
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                await llm.ainvoke("Explain binary trees")
+                return time.perf_counter() - start
+
+        return sorted(await asyncio.gather(*(one() for _ in range(opts["calls"]))))
+
+    def _report(self, mode, latencies, hedges, backup_wins, calls):
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+        self.stdout.write(
+            f"{mode:<8} | {pct(0.5):>7.2f} | {pct(0.95):>7.2f} | {pct(0.99):>7.2f} | "
+            f"{latencies[-1]:>7.2f} | {hedges / calls:>6.1%} | {backup_wins}"
+        )
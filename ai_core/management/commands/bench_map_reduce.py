@@ -0,0 +1,73 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ai_core.benchmarks.fakes import text_runnable
+from ai_core.services import summary_generator
+
+PARAGRAPH = (
+    "Paragraph {n}: a hash table maps keys to buckets with a hash function, and collisions "
+    "are resolved by chaining or open addressing. Load factor decides when to resize. "
+)
+# llama-3.1-8b-instant context window
+CONTEXT_TOKENS = 131072
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = (
+        "Summary latency vs document size: one prompt with the whole text "
+        "against the chunked map-reduce pipeline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--words", default="2000,5000,10000,20000,40000,80000")
+        parser.add_argument("--scale", type=float, default=0.1,
+                            help="Multiplier on simulated latency (1.0 = realistic seconds).")
+
+    def handle(self, *args, **opts):
+        logging.disable(logging.WARNING)
+        map_calls = []
+        # 8B model: ~500-token notes per chunk, ~600-token final summary;
+        # prompt processing costs ~40ms per thousand tokens
+        fakes = {
+            "chunk_notes_chain": text_runnable(500, 0.2, 750, opts["scale"], map_calls, prefill_per_1k=0.04),
+            "summary_chain": text_runnable(600, 0.2, 750, opts["scale"], prefill_per_1k=0.04),
+        }
+        originals = {name: getattr(summary_generator, name) for name in fakes}
+        for name, fake in fakes.items():
+            setattr(summary_generator, name, fake)
+
+        self.stdout.write(f"{'words':>6} | {'est. tokens':>11} | {'one prompt (s)':>14} | "
+                          f"{'map-reduce (s)':>14} | {'chunk calls':>11} | s per 1k words")
+        self.stdout.write("-" * 84)
+        try:
+            with override_settings(GENERATION_CACHE_ENABLED=False, METRICS_ENABLED=False):
+                for words in (int(w) for w in opts["words"].split(",")):
+                    text = self._document(words)
+                    tokens = summary_generator.estimate_tokens(text)
+                    one_prompt = "over context" if tokens > CONTEXT_TOKENS else \
+                        f"{self._time(text, split=False):.2f}"
+                    map_calls.clear()
+                    mapped = self._time(text, split=True)
+                    self.stdout.write(
+                        f"{words:>6} | {tokens:>11} | {one_prompt:>14} | {mapped:>14.2f} | "
+                        f"{len(map_calls):>11} | {mapped / words * 1000:.3f}"
+                    )
+        finally:
+            for name, original in originals.items():
+                setattr(summary_generator, name, original)
+            logging.disable(logging.NOTSET)
+
+    def _document(self, words):
+        paragraph_words = len(PARAGRAPH.split())
+        return "\n\n".join(PARAGRAPH.format(n=n) for n in range(words // paragraph_words))
+
+    def _time(self, text, split):
+        limit = {} if split else {"SUMMARY_MAP_REDUCE_TOKENS": 10 ** 9}
+        with override_settings(**limit):
+            start = time.perf_counter()
+            summary_generator.generate_summary(text, "detailed", "simple")
+            return time.perf_counter() - start
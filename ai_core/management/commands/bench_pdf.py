@@ -0,0 +1,65 @@
+import contextlib
+import io
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from ai_core.benchmarks.fakes import fake_tutorial
+from ai_core.benchmarks.legacy_tutorial_pdf import legacy_generate_tutorial_pdf
+from ai_core.services.document_tree import parse_tutorial
+from ai_core.services.tutorial_generator import render_tutorial_pdf
+
+CREATION_DATE = re.compile(rb"/CreationDate \(D:\d+\)")
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = (
+        "Tutorial PDF render time, legacy renderer vs shared layout engine (parsing "
+        "the text, and from an already parsed document tree), with a byte-for-byte output check."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sections", type=int, default=18, help="Tutorial sections (~1.1 pages each).")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        topic = "Virtual Memory"
+        text = fake_tutorial(topic, opts["sections"])
+
+        legacy = self._legacy(text, topic)
+        tree = parse_tutorial(text)
+        # The legacy renderer has no size optimizations to compare against
+        with override_settings(PDF_OPTIMIZE=False):
+            new = render_tutorial_pdf(tree, topic)
+        pages = new.count(b"/Type /Page\n")
+        identical = CREATION_DATE.sub(b"", legacy) == CREATION_DATE.sub(b"", new)
+        self.stdout.write(f"{pages} pages, {len(text.splitlines())} lines, {len(new)} bytes, identical output: {identical}")
+        if not identical:
+            raise CommandError("The layout engine's PDF differs from the legacy renderer's")
+
+        # First render fills the word width cache; later ones reuse it
+        legacy_ms = self._time(lambda: self._legacy(text, topic), opts["repeat"])
+        new_ms = self._time(lambda: render_tutorial_pdf(parse_tutorial(text), topic), opts["repeat"])
+        tree_ms = self._time(lambda: render_tutorial_pdf(tree, topic), opts["repeat"])
+        self.stdout.write(f"{'renderer':>11} | {'best ms/PDF':>11} | {'pages/sec':>9}")
+        self.stdout.write("-" * 38)
+        for name, ms in (("legacy", legacy_ms), ("engine", new_ms), ("parsed tree", tree_ms)):
+            self.stdout.write(f"{name:>11} | {ms:>11.2f} | {pages / ms * 1000:>9.0f}")
+        self.stdout.write(f"speedup: {legacy_ms / new_ms:.1f}x ({legacy_ms / tree_ms:.1f}x from a parsed tree)")
+
+    def _legacy(self, text, topic):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return legacy_generate_tutorial_pdf(text, topic)
+
+    def _time(self, render, repeat):
+        # Best of `repeat`: rendering is CPU-bound, so the fastest run is
+        # the least disturbed by other work on the machine
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ai_core.benchmarks.fakes import fake_mcq, fake_summary, fake_tutorial
+from ai_core.services.document_tree import parse_summary, parse_tutorial
+from ai_core.services.mcq_generator import generate_styled_mcq_pdf
+from ai_core.services.summary_generator import render_summary_pdf
+from ai_core.services.tutorial_generator import render_tutorial_pdf
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = (
+        "PDF size and render time of the MCQ, summary and tutorial PDFs, "
+        "with PDF_OPTIMIZE off (plain fpdf output) and on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=30)
+        parser.add_argument("--sections", type=int, default=18, help="Tutorial sections (~1.1 pages each).")
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **opts):
+        topic = "Virtual Memory"
+        mcqs = [fake_mcq(topic) for _ in range(opts["questions"])]
+        summary = parse_summary(fake_summary(topic, opts["sections"]))
+        tutorial = parse_tutorial(fake_tutorial(topic, opts["sections"]))
+        documents = (
+            ("mcq", lambda: generate_styled_mcq_pdf(mcqs, topic)),
+            ("summary", lambda: render_summary_pdf(summary, topic)),
+            ("tutorial", lambda: render_tutorial_pdf(tutorial, topic)),
+        )
+
+        self.stdout.write(
+            f"{'document':>8} | {'optimize':>8} | {'pages':>5} | {'bytes':>7} | "
+            f"{'bytes/page':>10} | {'best ms':>7}"
+        )
+        self.stdout.write("-" * 62)
+        for name, render in documents:
+            results = {}
+            for optimize in (False, True):
+                with override_settings(PDF_OPTIMIZE=optimize):
+                    pdf = render()
+                    ms = self._time(render, opts["repeat"])
+                pages = pdf.count(b"/Type /Page\n")
+                results[optimize] = (len(pdf), ms)
+                self.stdout.write(
+                    f"{name:>8} | {'on' if optimize else 'off':>8} | {pages:>5} | {len(pdf):>7} | "
+                    f"{len(pdf) // pages:>10} | {ms:>7.2f}"
+                )
+            (off_bytes, off_ms), (on_bytes, on_ms) = results[False], results[True]
+            self.stdout.write(
+                f"{'':>8}   size {(on_bytes - off_bytes) / off_bytes:+.1%}, "
+                f"render time {(on_ms - off_ms) / off_ms:+.1%}"
+            )
+
+    def _time(self, render, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
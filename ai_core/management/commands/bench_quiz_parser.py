@@ -0,0 +1,64 @@
+import contextlib
+import io
+import itertools
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_core.benchmarks.fakes import fake_quiz_block
+from ai_core.benchmarks.legacy_quiz_parser import legacy_parse_quiz_response
+from ai_core.services.quiz_generator import parse_quiz_response
+
+CORPUS = Path(__file__).resolve().parents[2] / "benchmarks" / "data" / "quiz_responses.json"
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = "Quiz response parsing time, legacy vs single-pass parser, with an output equivalence check."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--counts", default="10,50,100")
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **opts):
+        corpus = json.loads(CORPUS.read_text(encoding="utf-8"))
+
+        mismatches = [i for i, response in enumerate(corpus)
+                      if self._legacy(response) != parse_quiz_response(response)]
+        if mismatches:
+            raise CommandError(f"Parsers disagree on corpus responses {mismatches}")
+        self.stdout.write(f"corpus: {len(corpus)} responses, identical output")
+
+        # Larger responses mix corpus blocks with simulated ones
+        corpus_blocks = ["Q:" + b for r in corpus for b in r.split("Q:")[1:]]
+
+        self.stdout.write(f"{'questions':>9} | {'legacy (ms)':>11} | {'new (ms)':>8} | speedup | identical")
+        self.stdout.write("-" * 58)
+        for count in (int(c) for c in opts["counts"].split(",")):
+            blocks = itertools.cycle(corpus_blocks)
+            response = "\n".join(
+                next(blocks) if i % 3 == 0 else fake_quiz_block("Operating Systems")
+                for i in range(count)
+            )
+            legacy_ms = self._time(self._legacy, response, opts["repeat"])
+            new_ms = self._time(parse_quiz_response, response, opts["repeat"])
+            identical = self._legacy(response) == parse_quiz_response(response)
+            self.stdout.write(
+                f"{count:>9} | {legacy_ms:>11.3f} | {new_ms:>8.3f} | {legacy_ms / new_ms:>6.1f}x | {identical}"
+            )
+            if not identical:
+                raise CommandError(f"Parsers disagree on the {count}-question response")
+
+    def _legacy(self, response):
+        # The legacy parser prints ~10 lines per question; capture rather
+        # than time the terminal
+        with contextlib.redirect_stdout(io.StringIO()):
+            return legacy_parse_quiz_response(response)
+
+    def _time(self, parse, response, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parse(response)
+        return (time.perf_counter() - start) / repeat * 1000
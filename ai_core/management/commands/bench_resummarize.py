@@ -0,0 +1,97 @@
+import logging
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ai_core.benchmarks.fakes import text_runnable
+from ai_core.services import summary_generator
+from ai_core.services.rate_limit import CHARS_PER_TOKEN
+
+TOPICS = ["hash tables", "binary heaps", "graph traversal", "dynamic programming", "B-trees",
+          "paging", "deadlocks", "TCP handshakes", "normal forms", "sorting networks"]
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = (
+        "Re-summarizing an edited long document with the per-chunk notes "
+        "cache: chunk calls and time for small edits, and how many chunks "
+        "an edit invalidates with content-defined vs fixed-size chunking. "
+        "Uses the configured Redis."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=30)
+        parser.add_argument("--seed", type=int, default=3)
+        parser.add_argument("--scale", type=float, default=0.1,
+                            help="Multiplier on simulated latency (1.0 = realistic seconds).")
+
+    def handle(self, *args, **opts):
+        logging.disable(logging.WARNING)
+        rng = random.Random(opts["seed"])
+        # ~500 words per page in paragraphs of 60-140 words. A run id keeps
+        # the first submission uncached.
+        run_id = uuid.uuid4().hex[:8]
+        paragraphs = [self._paragraph(rng, f"{run_id}-{i}") for i in range(opts["pages"] * 5)]
+        middle = len(paragraphs) // 2
+        versions = [
+            ("first submission", paragraphs),
+            ("one paragraph edited", paragraphs[:middle] + [paragraphs[middle] + " (revised)"]
+             + paragraphs[middle + 1:]),
+            ("one paragraph added", paragraphs[:middle] + [self._paragraph(rng, f"{run_id}-new")]
+             + paragraphs[middle:]),
+            ("one paragraph removed", paragraphs[:middle] + paragraphs[middle + 1:]),
+        ]
+
+        chunk_calls, reduce_calls = [], []
+        fakes = {
+            "chunk_notes_chain": text_runnable(500, 0.2, 750, opts["scale"], chunk_calls),
+            "summary_chain": text_runnable(600, 0.2, 750, opts["scale"], reduce_calls),
+        }
+        originals = {name: getattr(summary_generator, name) for name in fakes}
+        for name, fake in fakes.items():
+            setattr(summary_generator, name, fake)
+
+        self.stdout.write(f"{'version':<22} | {'chunks':>6} | {'chunk calls':>11} | {'reduce':>6} | "
+                          f"{'time (s)':>8} | fixed-size chunks changed")
+        self.stdout.write("-" * 90)
+        previous = None
+        try:
+            with override_settings(METRICS_ENABLED=False):
+                for label, version in versions:
+                    text = "\n\n".join(version)
+                    chunk_calls.clear()
+                    reduce_calls.clear()
+                    start = time.perf_counter()
+                    summary_generator.generate_summary(text, "detailed", "simple")
+                    elapsed = time.perf_counter() - start
+                    fixed = self._fixed_chunks(text)
+                    changed = "-" if previous is None else f"{len(set(fixed) - set(previous))} of {len(fixed)}"
+                    previous = previous or fixed
+                    self.stdout.write(
+                        f"{label:<22} | {len(summary_generator.split_document(text)):>6} | "
+                        f"{len(chunk_calls):>11} | {len(reduce_calls):>6} | {elapsed:>8.2f} | {changed}"
+                    )
+        finally:
+            for name, original in originals.items():
+                setattr(summary_generator, name, original)
+            logging.disable(logging.NOTSET)
+
+    def _paragraph(self, rng, tag):
+        words = []
+        for _ in range(rng.randint(6, 14)):
+            topic = rng.choice(TOPICS)
+            words.append(f"Note {tag}: {topic} trade space for time when the access pattern allows it.")
+        return " ".join(words)
+
+    def _fixed_chunks(self, text):
+        # The fixed-size splitter with overlap that content-defined chunking replaced
+        return RecursiveCharacterTextSplitter(
+            chunk_size=settings.SUMMARY_CHUNK_TOKENS * CHARS_PER_TOKEN,
+            chunk_overlap=settings.SUMMARY_CHUNK_OVERLAP_TOKENS * CHARS_PER_TOKEN,
+        ).split_text(text)
@@ -0,0 +1,93 @@
+import json
+import logging
+import random
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ai_core.services import metrics
+from ai_core.services.llm_config import DEFAULT_MODELS, MODEL_70B, MODEL_8B, route_model
+from ai_core.services.rate_limit import expected_completion_tokens
+
+REQUEST_MIX = Path(__file__).resolve().parents[2] / "benchmarks" / "data" / "request_mix.json"
+
+# Assumed Groq figures: time to first token, output tokens per second and
+# USD per million input / output tokens
+MODELS = {
+    MODEL_70B: {"ttft": 0.45, "tokens_per_second": 280, "input": 0.59, "output": 0.79},
+    MODEL_8B: {"ttft": 0.20, "tokens_per_second": 750, "input": 0.05, "output": 0.08},
+}
+PROMPT_TOKENS = 400
+TOKENS_PER_WORD = 1.3
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = (
+        "Offline replay of a request mix through three model policies (all "
+        "70B, the fixed per-generator models, the router): simulated latency "
+        "and cost per request, without calling the LLM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--slowdown", default="1,2.5",
+                            help="70B speed multipliers to replay, e.g. 2.5 = 2.5x slower than usual.")
+
+    def handle(self, *args, **opts):
+        logging.disable(logging.WARNING)
+        mix = json.loads(REQUEST_MIX.read_text(encoding="utf-8"))
+        rng = random.Random(opts["seed"])
+        requests = rng.choices(mix, weights=[r["share"] for r in mix], k=opts["requests"])
+
+        try:
+            with override_settings(METRICS_ENABLED=False, LLM_ROUTER_ENABLED=True):
+                for slowdown in (float(s) for s in opts["slowdown"].split(",")):
+                    self._replay(requests, slowdown)
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def _replay(self, requests, slowdown):
+        speeds = {name: model["tokens_per_second"] / (slowdown if name == MODEL_70B else 1)
+                  for name, model in MODELS.items()}
+        # The router sees the 70B model's speed through live call stats
+        metrics._speeds.clear()
+        for _ in range(metrics.MIN_SPEED_SAMPLES):
+            metrics.observe_speed(MODEL_70B, 1.0, speeds[MODEL_70B])
+
+        policies = {
+            "all 70B": lambda r: MODEL_70B,
+            "fixed": lambda r: DEFAULT_MODELS[r["generator"]],
+            "router": lambda r: route_model(r["generator"], r["level"], r.get("size")),
+        }
+        self.stdout.write(f"\n70B slowdown {slowdown:g}x, {len(requests)} requests")
+        self.stdout.write(f"{'policy':<8} | {'mean (s)':>8} | {'p95 (s)':>7} | {'max (s)':>7} | "
+                          f"{'USD / 1k req':>12} | 70B share")
+        self.stdout.write("-" * 70)
+        for policy, choose in policies.items():
+            latencies, cost, on_70b = [], 0.0, 0
+            for request in requests:
+                model_name = choose(request)
+                seconds, usd = self._simulate(request, model_name, speeds[model_name])
+                latencies.append(seconds)
+                cost += usd
+                on_70b += model_name == MODEL_70B
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f"{policy:<8} | {sum(latencies) / len(latencies):>8.2f} | {p95:>7.2f} | "
+                f"{latencies[-1]:>7.2f} | {cost / len(requests) * 1000:>12.3f} | "
+                f"{on_70b / len(requests):.0%}"
+            )
+
+    def _simulate(self, request, model_name, tokens_per_second):
+        model = MODELS[model_name]
+        prompt = PROMPT_TOKENS
+        if request["generator"] == "summary":
+            prompt += int(request.get("size", 0) * TOKENS_PER_WORD)
+        completion = expected_completion_tokens(request["generator"], request["level"], request.get("size"))
+        seconds = model["ttft"] + completion / tokens_per_second
+        usd = (prompt * model["input"] + completion * model["output"]) / 1_000_000
+        return seconds, usd
@@ -0,0 +1,69 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ai_core.benchmarks.fakes import text_runnable
+from ai_core.services import summary_generator
+
+# Pasted notes of increasing length, plus short topic strings
+SENTENCE = "Binary search trees keep keys ordered so lookups halve the remaining range at each node. "
+INPUTS = [
+    ("topic, 3 words", "Binary Search Trees"),
+    ("topic, 6 words", "TCP congestion control in computer networks"),
+    ("text, 150 words", SENTENCE * 10),
+    ("text, 600 words", SENTENCE * 40),
+    ("text, 2000 words", SENTENCE * 135),
+]
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = (
+        "Summary latency per input, before (every input explained first) "
+        "and after input-mode detection (pasted text summarized directly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--scale", type=float, default=0.1,
+                            help="Multiplier on simulated latency (1.0 = realistic seconds).")
+
+    def handle(self, *args, **opts):
+        logging.disable(logging.WARNING)
+        explanations, summaries = [], []
+        # A ~1200-token 70B explanation and a ~500-token 8B summary
+        fakes = {
+            "explanation_chain": text_runnable(1200, 0.45, 280, opts["scale"], explanations),
+            "summary_chain": text_runnable(500, 0.2, 750, opts["scale"], summaries),
+        }
+        originals = {name: getattr(summary_generator, name) for name in fakes}
+        for name, fake in fakes.items():
+            setattr(summary_generator, name, fake)
+
+        self.stdout.write(f"{'input':<17} | {'mode':<5} | {'before (s)':>10} | {'after (s)':>9} | "
+                          f"{'speedup':>7} | LLM calls before / after")
+        self.stdout.write("-" * 84)
+        try:
+            with override_settings(GENERATION_CACHE_ENABLED=False, METRICS_ENABLED=False):
+                for label, content in INPUTS:
+                    mode = summary_generator.resolve_summary_mode(content)
+                    results = []
+                    for run_mode in ("topic", "auto"):
+                        explanations.clear()
+                        summaries.clear()
+                        start = time.perf_counter()
+                        for _ in range(opts["repeat"]):
+                            summary_generator.summarize(content, "short", "simple", run_mode)
+                        results.append(((time.perf_counter() - start) / opts["repeat"],
+                                        (len(explanations) + len(summaries)) / opts["repeat"]))
+                    (before, before_calls), (after, after_calls) = results
+                    self.stdout.write(
+                        f"{label:<17} | {mode:<5} | {before:>10.3f} | {after:>9.3f} | "
+                        f"{before / after:>6.2f}x | {before_calls:g} / {after_calls:g}"
+                    )
+        finally:
+            for name, original in originals.items():
+                setattr(summary_generator, name, original)
+            logging.disable(logging.NOTSET)
@@ -0,0 +1,100 @@
+import asyncio
+import contextlib
+import io
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ai_core.benchmarks.fakes import SimulatedLLM, mcq_runnable
+from ai_core.services import mcq_generator
+
+URL = "http://testserver/ai/mcq/"
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = (
+        "Concurrent POSTs to the MCQ view on simulated LLM latency: WSGI on a "
+        "fixed number of worker threads vs ASGI on one event loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", default="10,50,200",
+                            help="Requests in flight at once, comma separated.")
+        parser.add_argument("--wsgi-threads", type=int, default=8,
+                            help="WSGI worker threads (e.g. gunicorn workers x threads).")
+        parser.add_argument("--questions", type=int, default=10)
+        parser.add_argument("--scale", type=float, default=0.2,
+                            help="Multiplier on simulated latency (1.0 = realistic seconds).")
+
+    def handle(self, *args, **opts):
+        logging.disable(logging.WARNING)
+        original_chain = mcq_generator.mcq_chain
+        mcq_generator.mcq_chain = mcq_runnable(SimulatedLLM(scale=opts["scale"]))
+        form = {"topic": "Binary Trees", "count": str(opts["questions"]), "difficulty": "medium"}
+
+        overrides = {
+            "GENERATION_CACHE_ENABLED": False,
+            "QUESTION_BANK_ENABLED": False,
+            "METRICS_ENABLED": False,
+            # Keep the database out of the measurement
+            "SESSION_ENGINE": "django.contrib.sessions.backends.signed_cookies",
+            "MIDDLEWARE": [m for m in settings.MIDDLEWARE if "CsrfViewMiddleware" not in m],
+            "ALLOWED_HOSTS": ["*"],
+        }
+
+        self.stdout.write(f"{'in flight':>9} | {'server':<12} | {'seconds':>7} | {'req/s':>6} | "
+                          f"{'p50 (s)':>7} | {'p95 (s)':>7} | ok")
+        self.stdout.write("-" * 70)
+        try:
+            with override_settings(**overrides), contextlib.redirect_stdout(io.StringIO()):
+                wsgi_app, asgi_app = WSGIHandler(), ASGIHandler()
+                for n in (int(c) for c in opts["concurrency"].split(",")):
+                    wsgi = self._run_wsgi(wsgi_app, form, n, opts["wsgi_threads"])
+                    asgi = asyncio.run(self._run_asgi(asgi_app, form, n))
+                    self._report(n, f"wsgi-{opts['wsgi_threads']}", *wsgi)
+                    self._report(n, "asgi", *asgi)
+        finally:
+            mcq_generator.mcq_chain = original_chain
+            logging.disable(logging.NOTSET)
+
+    def _run_wsgi(self, app, form, n, threads):
+        start = time.perf_counter()
+
+        def one(_):
+            with httpx.Client(transport=httpx.WSGITransport(app=app)) as client:
+                response = client.post(URL, data=form)
+            return time.perf_counter() - start, response.status_code
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(one, range(n)))
+        return time.perf_counter() - start, results
+
+    async def _run_asgi(self, app, form, n):
+        start = time.perf_counter()
+
+        async def one(client):
+            response = await client.post(URL, data=form)
+            return time.perf_counter() - start, response.status_code
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app)) as client:
+            results = await asyncio.gather(*(one(client) for _ in range(n)))
+        return time.perf_counter() - start, results
+
+    def _report(self, n, label, elapsed, results):
+        # Latency counts from when all requests arrived, so queueing is included
+        latencies = sorted(t for t, _ in results)
+        ok = sum(1 for _, status in results if status == 200)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"{n:>9} | {label:<12} | {elapsed:>7.2f} | {n / elapsed:>6.1f} | "
+            f"{statistics.median(latencies):>7.2f} | {p95:>7.2f} | {ok}/{n}"
+        )
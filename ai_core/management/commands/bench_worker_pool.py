@@ -0,0 +1,54 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from ai_core import tasks
+from ai_core.benchmarks.fakes import SimulatedLLM, mcq_runnable
+from ai_core.services import mcq_generator
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = "Task throughput of a solo worker vs thread pools of several sizes on simulated LLM latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tasks", type=int, default=64)
+        parser.add_argument("--questions", type=int, default=10)
+        parser.add_argument("--concurrency", default="8,32,64")
+        parser.add_argument("--scale", type=float, default=0.1,
+                            help="Multiplier on simulated latency (1.0 = realistic seconds).")
+
+    def handle(self, *args, **opts):
+        logging.disable(logging.WARNING)
+        original_chain, original_slots = mcq_generator.mcq_chain, tasks._task_slots
+        mcq_generator.mcq_chain = mcq_runnable(SimulatedLLM(scale=opts["scale"]))
+        # Measure the pool itself; per-type limits would cap the larger pools
+        tasks._task_slots = {}
+
+        self.stdout.write(f"{'pool':>10} | {'seconds':>8} | {'tasks/s':>8} | speedup")
+        self.stdout.write("-" * 44)
+        try:
+            with override_settings(GENERATION_CACHE_ENABLED=False, QUESTION_BANK_ENABLED=False,
+                                   METRICS_ENABLED=False):
+                solo = self._measure(1, opts)
+                self._report("solo", solo, solo, opts["tasks"])
+                for size in (int(c) for c in opts["concurrency"].split(",")):
+                    self._report(f"threads-{size}", self._measure(size, opts), solo, opts["tasks"])
+        finally:
+            mcq_generator.mcq_chain, tasks._task_slots = original_chain, original_slots
+            logging.disable(logging.NOTSET)
+
+    def _measure(self, workers, opts):
+        def run_one(_):
+            return tasks.mcq_generation_task.run("Binary Trees", opts["questions"], "medium")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run_one, range(opts["tasks"])))
+        return time.perf_counter() - start
+
+    def _report(self, label, elapsed, solo, n_tasks):
+        self.stdout.write(f"{label:>10} | {elapsed:>8.2f} | {n_tasks / elapsed:>8.1f} | {solo / elapsed:>6.1f}x")
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-17 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Question',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('mcq', 'MCQ'), ('quiz', 'Quiz')], max_length=8)),
+                ('topic', models.CharField(max_length=255)),
+                ('topic_key', models.CharField(max_length=255)),
+                ('difficulty', models.CharField(max_length=16)),
+                ('question', models.TextField()),
+                ('options', models.JSONField()),
+                ('answer', models.CharField(max_length=8)),
+                ('explanation', models.TextField(blank=True)),
+                ('improvement', models.TextField(blank=True)),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'topic_key', 'difficulty'], name='ai_core_que_kind_e7cc9a_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,34 @@
 from django.db import models
 
 # Create your models here.
+class Question(models.Model):
+    """
+    A generated MCQ or quiz question kept for reuse.
+    MCQ options are a list ("A ...", "B ..."), quiz options a dict keyed A-D.
+    """
+    KIND_MCQ = "mcq"
+    KIND_QUIZ = "quiz"
+    KIND_CHOICES = [
+        (KIND_MCQ, "MCQ"),
+        (KIND_QUIZ, "Quiz"),
+    ]
+
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    topic = models.CharField(max_length=255)
+    topic_key = models.CharField(max_length=255)
+    difficulty = models.CharField(max_length=16)
+    question = models.TextField()
+    options = models.JSONField()
+    answer = models.CharField(max_length=8)
+    explanation = models.TextField(blank=True)
+    improvement = models.TextField(blank=True)
+    content_hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["kind", "topic_key", "difficulty"]),
+        ]
+
+    def __str__(self):
+        return self.question[:80]
@@ -0,0 +1,109 @@
+import logging
+import time
+
+import redis
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+
+from .mcq_generator import generate_styled_mcq_pdf
+from .pdf_cache import cached_pdf, pdf_digest
+from .redis_client import get_redis, make_key
+from .summary_generator import generate_summary_pdf
+from .tutorial_generator import generate_tutorial_pdf
+
+logger = logging.getLogger(__name__)
+
+# ===========================
+#  PDF ARTIFACTS
+# ===========================
+# Downloadable PDFs are rendered in a Celery task as soon as their text is
+# generated and stored in Redis for ARTIFACT_TTL seconds, named by the
+# same digest as the rendered-PDF cache (see pdf_cache), so the download
+# view can find one from the content alone. Downloads go through signed
+# links. A link is signed with the start of the current ARTIFACT_URL_MAX_AGE
+# window rather than the current second, so an artifact keeps one URL for
+# the whole window and the browser revalidates its copy (If-None-Match ->
+# 304) instead of fetching a new URL on every click. Links stay valid for
+# between one and two windows.
+PDF_DOCUMENTS = {
+    "mcq": (generate_styled_mcq_pdf, "{title}_MCQs.pdf"),
+    "summary": (generate_summary_pdf, "{title}_Summary.pdf"),
+    "tutorial": (generate_tutorial_pdf, "{title}_Tutorial.pdf"),
+}
+
+
+class _WindowSigner(signing.TimestampSigner):
+    def timestamp(self):
+        window = settings.ARTIFACT_URL_MAX_AGE
+        return signing.b62_encode(int(time.time()) // window * window)
+
+
+_signer = _WindowSigner(salt="ai_core.artifacts")
+
+
+def _key(digest: str) -> str:
+    return make_key("artifact", digest)
+
+
+def artifact_digest(generator: str, content, title: str) -> str:
+    render, _ = PDF_DOCUMENTS[generator]
+    return pdf_digest(generator, render, content, title)
+
+
+def artifact_exists(digest: str) -> bool:
+    try:
+        return bool(get_redis().exists(_key(digest)))
+    except redis.RedisError as e:
+        logger.warning("[ARTIFACT] Redis unavailable on read: %s", e)
+        return False
+
+
+def load_artifact(digest: str):
+    """
+    {"data", "filename", "content_type"} of a stored artifact, or None.
+    Redis errors propagate: an outage is not the same as an expired file.
+    """
+    stored = get_redis().hgetall(_key(digest))
+    if not stored:
+        return None
+    return {
+        "data": stored[b"data"],
+        "filename": stored[b"filename"].decode(),
+        "content_type": stored[b"content_type"].decode(),
+    }
+
+
+def render_pdf_artifact(generator: str, content, title: str) -> str:
+    """
+    Render the PDF of a generation into the artifact store (through the
+    rendered-PDF cache) unless it is already there. Returns its digest.
+    """
+    render, filename = PDF_DOCUMENTS[generator]
+    digest = pdf_digest(generator, render, content, title)
+    if artifact_exists(digest):
+        return digest
+
+    pdf_bytes = cached_pdf(generator, render, content, title, digest=digest)
+    pipe = get_redis().pipeline()
+    pipe.hset(_key(digest), mapping={
+        "data": pdf_bytes,
+        "filename": filename.format(title=title),
+        "content_type": "application/pdf",
+    })
+    pipe.expire(_key(digest), settings.ARTIFACT_TTL)
+    pipe.execute()
+    logger.info("[ARTIFACT] Stored %s PDF %s (%d bytes)", generator, digest[:12], len(pdf_bytes))
+    return digest
+
+
+def signed_url(digest: str) -> str:
+    return reverse("artifact_download", args=[_signer.sign(digest)])
+
+
+def unsign(token: str) -> str:
+    """
+    The digest in a signed download token. Raises signing.SignatureExpired
+    or signing.BadSignature.
+    """
+    return _signer.unsign(token, max_age=2 * settings.ARTIFACT_URL_MAX_AGE)
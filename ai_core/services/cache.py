@@ -0,0 +1,356 @@
+import hashlib
+import json
+import logging
+import threading
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .redis_client import get_redis, make_key
+from .topic_index import topic_index
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = make_key("cache", "stats")
+
+_prompt_versions = {}
+
+
+# Strings up to this length are topic-like and compared case-insensitively.
+# Longer strings are user-supplied text whose case may matter (code, names).
+TOPIC_MAX_LENGTH = 200
+
+
+def normalize_value(value):
+    """
+    Normalize user input so trivially different requests share a key:
+    surrounding and repeated whitespace are ignored, and so is case for
+    short topic-like strings.
+    """
+    if isinstance(value, str):
+        value = " ".join(value.split())
+        if len(value) <= TOPIC_MAX_LENGTH:
+            value = value.casefold()
+    return value
+
+
+def prompt_version(prompt) -> str:
+    """
+    Short hash of a prompt template. Editing a prompt changes its version,
+    so entries generated from the old wording are never served again.
+    """
+    cache_id = id(prompt)
+    if cache_id not in _prompt_versions:
+        template = getattr(prompt, "template", str(prompt))
+        _prompt_versions[cache_id] = hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+    return _prompt_versions[cache_id]
+
+
+def _digest(payload: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _key_payload(inputs: dict, prompt, model_name: str, temperature) -> dict:
+    return {
+        "inputs": {k: normalize_value(v) for k, v in sorted(inputs.items())},
+        "model": model_name,
+        "temperature": temperature,
+        "prompt": prompt_version(prompt),
+    }
+
+
+def generation_key(generator: str, inputs: dict, prompt, model_name: str, temperature=None) -> str:
+    payload = _key_payload(inputs, prompt, model_name, temperature)
+    return make_key("gen", generator, _digest(payload))
+
+
+def topic_namespace(generator: str, inputs: dict, prompt, model_name: str, temperature=None) -> str:
+    """
+    Everything in the cache key except the topic. Only generations that
+    agree on all of it may be served for a similar topic.
+    """
+    rest = {k: v for k, v in inputs.items() if k != "topic"}
+    payload = _key_payload(rest, prompt, model_name, temperature)
+    return f"{generator}:{_digest(payload)[:16]}"
+
+
+def _record(generator: str, outcome: str, amount: int = 1):
+    if not amount:
+        return
+    try:
+        get_redis().hincrby(STATS_KEY, f"{generator}:{outcome}", amount)
+    except redis.RedisError:
+        pass
+
+
+def cache_get(key: str):
+    try:
+        raw = get_redis().get(key)
+    except redis.RedisError as e:
+        logger.warning("[CACHE] Redis unavailable on read: %s", e)
+        return None
+    if raw is None:
+        return None
+    return json.loads(raw)
+
+
+def cache_set(key: str, value, ttl: int = None):
+    try:
+        get_redis().set(
+            key,
+            json.dumps(value),
+            ex=ttl or settings.GENERATION_CACHE_TTL,
+        )
+    except redis.RedisError as e:
+        logger.warning("[CACHE] Redis unavailable on write: %s", e)
+
+
+def _similar_topic_lookup(generator: str, inputs: dict, prompt, model_name: str, temperature):
+    namespace = topic_namespace(generator, inputs, prompt, model_name, temperature)
+    match = topic_index.find_similar(namespace, normalize_value(inputs["topic"]))
+    if match is None:
+        return None
+
+    similar_topic, score = match
+    key = generation_key(generator, {**inputs, "topic": similar_topic}, prompt, model_name, temperature)
+    cached = cache_get(key)
+    if cached is not None:
+        logger.info("[CACHE] NEAR HIT %s '%s' -> '%s' (%.2f)", generator, inputs["topic"], similar_topic, score)
+    return cached
+
+
+def _cache_lookup(generator: str, inputs: dict, prompt, model_name: str, temperature,
+                  similar_topics: bool):
+    """
+    Exact, then near-topic lookup. Returns (key, use_similar, cached value or None)
+    and records the hit/miss.
+    """
+    key = generation_key(generator, inputs, prompt, model_name, temperature)
+
+    cached = cache_get(key)
+    if cached is not None:
+        _record(generator, "hit")
+        logger.info("[CACHE] HIT %s %s", generator, key)
+        return key, False, cached
+
+    use_similar = similar_topics and settings.TOPIC_SIMILARITY_ENABLED and "topic" in inputs
+    if use_similar:
+        cached = _similar_topic_lookup(generator, inputs, prompt, model_name, temperature)
+        if cached is not None:
+            _record(generator, "near_hit")
+            return key, use_similar, cached
+
+    _record(generator, "miss")
+    logger.info("[CACHE] MISS %s %s", generator, key)
+    return key, use_similar, None
+
+
+def _cache_store(generator: str, inputs: dict, prompt, model_name: str, temperature,
+                 key: str, value, ttl: int, use_similar: bool):
+    if not value:
+        return
+    cache_set(key, value, ttl)
+    if use_similar:
+        namespace = topic_namespace(generator, inputs, prompt, model_name, temperature)
+        topic_index.add(namespace, normalize_value(inputs["topic"]))
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key in this process into one:
+    the first caller runs the function, later callers wait for it and
+    share its result (or its exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+        if not leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["value"]
+
+        try:
+            call["value"] = fn()
+            return call["value"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+_flights = SingleFlight()
+
+
+def cached_value(generator: str, inputs: dict, prompt, llm, similar_topics: bool = False):
+    """
+    The cached output for this generation if there is one, without
+    generating it or counting a hit or miss.
+    """
+    if not settings.GENERATION_CACHE_ENABLED:
+        return None
+    model_name = getattr(llm, "model_name", "")
+    temperature = getattr(llm, "temperature", None)
+    cached = cache_get(generation_key(generator, inputs, prompt, model_name, temperature))
+    use_similar = similar_topics and settings.TOPIC_SIMILARITY_ENABLED and "topic" in inputs
+    if cached is None and use_similar:
+        cached = _similar_topic_lookup(generator, inputs, prompt, model_name, temperature)
+    return cached
+
+
+def cached_generation(generator: str, inputs: dict, prompt, llm, compute, ttl: int = None,
+                      similar_topics: bool = False, single_flight: bool = False):
+    """
+    Return the cached output for this generation, or run `compute()`
+    and cache its result.
+
+    The key covers the normalized inputs, the model name, its temperature
+    and the prompt version. Empty results are never cached so a failed
+    generation is retried on the next request.
+
+    With `similar_topics`, an exact miss falls back to the closest prior
+    topic generated with otherwise identical inputs (see topic_index).
+    With `single_flight`, concurrent requests for the same key in this
+    process share one lookup and one `compute()`.
+    """
+    if not settings.GENERATION_CACHE_ENABLED:
+        return compute()
+
+    model_name = getattr(llm, "model_name", "")
+    temperature = getattr(llm, "temperature", None)
+    if single_flight:
+        key = generation_key(generator, inputs, prompt, model_name, temperature)
+        return _flights.do(key, lambda: cached_generation(
+            generator, inputs, prompt, llm, compute, ttl, similar_topics
+        ))
+
+    key, use_similar, cached = _cache_lookup(
+        generator, inputs, prompt, model_name, temperature, similar_topics
+    )
+    if cached is not None:
+        return cached
+
+    value = compute()
+    _cache_store(generator, inputs, prompt, model_name, temperature, key, value, ttl, use_similar)
+    return value
+
+
+async def acached_generation(generator: str, inputs: dict, prompt, llm, acompute, ttl: int = None,
+                             similar_topics: bool = False):
+    """
+    cached_generation for async views: `acompute()` is awaited and the
+    Redis lookups run in a worker thread.
+    """
+    if not settings.GENERATION_CACHE_ENABLED:
+        return await acompute()
+
+    model_name = getattr(llm, "model_name", "")
+    temperature = getattr(llm, "temperature", None)
+    key, use_similar, cached = await sync_to_async(_cache_lookup, thread_sensitive=False)(
+        generator, inputs, prompt, model_name, temperature, similar_topics
+    )
+    if cached is not None:
+        return cached
+
+    value = await acompute()
+    await sync_to_async(_cache_store, thread_sensitive=False)(
+        generator, inputs, prompt, model_name, temperature, key, value, ttl, use_similar
+    )
+    return value
+
+
+def _map_lookup(generator: str, items: list, prompt, llm, key_inputs):
+    model_name = getattr(llm, "model_name", "")
+    temperature = getattr(llm, "temperature", None)
+    keys = [generation_key(generator, key_inputs(item), prompt, model_name, temperature)
+            for item in items]
+    try:
+        raw = get_redis().mget(keys)
+    except redis.RedisError as e:
+        logger.warning("[CACHE] Redis unavailable on read: %s", e)
+        raw = [None] * len(keys)
+    results = [None if r is None else json.loads(r) for r in raw]
+    missing = [i for i, r in enumerate(results) if r is None]
+    _record(generator, "hit", len(items) - len(missing))
+    _record(generator, "miss", len(missing))
+    logger.info("[CACHE] %s: %d of %d items cached", generator, len(items) - len(missing), len(items))
+    return keys, results, missing
+
+
+def _map_store(keys: list, results: list, missing: list, computed: list, ttl: int):
+    pipe = get_redis().pipeline(transaction=False)
+    for i, value in zip(missing, computed):
+        results[i] = value
+        if value:
+            pipe.set(keys[i], json.dumps(value), ex=ttl or settings.GENERATION_CACHE_TTL)
+    try:
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("[CACHE] Redis unavailable on write: %s", e)
+    return results
+
+
+def cached_map(generator: str, items: list, prompt, llm, compute_many, key_inputs, ttl: int = None):
+    """
+    cached_generation for a batch of independent generations: one output
+    per item of `items`. Cached outputs are read in one round trip and
+    only the missing items are passed to `compute_many(items)`, which
+    returns their outputs in order. `key_inputs(item)` gives the inputs
+    an item's cache key is built from.
+    """
+    if not settings.GENERATION_CACHE_ENABLED:
+        return compute_many(items)
+    keys, results, missing = _map_lookup(generator, items, prompt, llm, key_inputs)
+    computed = compute_many([items[i] for i in missing]) if missing else []
+    return _map_store(keys, results, missing, computed, ttl)
+
+
+async def acached_map(generator: str, items: list, prompt, llm, acompute_many, key_inputs,
+                      ttl: int = None):
+    """
+    cached_map with an async `acompute_many(items)`.
+    """
+    if not settings.GENERATION_CACHE_ENABLED:
+        return await acompute_many(items)
+    keys, results, missing = await sync_to_async(_map_lookup, thread_sensitive=False)(
+        generator, items, prompt, llm, key_inputs
+    )
+    computed = await acompute_many([items[i] for i in missing]) if missing else []
+    return await sync_to_async(_map_store, thread_sensitive=False)(keys, results, missing, computed, ttl)
+
+
+def cache_stats() -> dict:
+    """
+    Hit/miss counters per generator, aggregated across all processes.
+    """
+    try:
+        raw = get_redis().hgetall(STATS_KEY)
+    except redis.RedisError as e:
+        logger.warning("[CACHE] Redis unavailable for stats: %s", e)
+        return {}
+
+    stats = {}
+    for field, count in raw.items():
+        generator, outcome = field.decode().rsplit(":", 1)
+        entry = stats.setdefault(generator, {"hit": 0, "near_hit": 0, "miss": 0})
+        entry[outcome] = int(count)
+
+    for entry in stats.values():
+        served = entry["hit"] + entry["near_hit"]
+        total = served + entry["miss"]
+        entry["hit_rate"] = round(served / total, 4) if total else 0.0
+    return stats
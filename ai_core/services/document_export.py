@@ -0,0 +1,116 @@
+import io
+from datetime import datetime
+
+from django.utils.html import escape
+
+# ===========================
+#  HTML / DOCX EXPORTS
+# ===========================
+# Both render a document tree (see document_tree); neither looks at the
+# generated text itself.
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+# ---------- HTML ----------
+def _html_block(block_type: str, text: str) -> str:
+    text = escape(text)
+    if block_type == "subheading":
+        return f'<h5 class="doc-subheading">{text}</h5>'
+    if block_type == "point":
+        return f'<p class="doc-point">{text}</p>'
+    if block_type == "bullet":
+        return f'<li class="doc-bullet">{text}</li>'
+    if block_type == "code":
+        return f'<pre class="doc-code"><code>{text}</code></pre>'
+    if block_type == "exam":
+        return f'<div class="doc-exam"><strong>EXAM POINT:</strong> {text}</div>'
+    return f'<p class="doc-text">{text}</p>'
+
+
+def html_pages(tree: dict, page_chars: int = None) -> list:
+    """
+    Server-rendered HTML of a document tree, split into pages of about
+    `page_chars` characters of text (one page when None). Pages break
+    between blocks, never inside one. Runs of bullets are wrapped in <ul>.
+    """
+    pages, page, size = [], [], 0
+    in_list = False
+
+    def close_list():
+        nonlocal in_list
+        if in_list:
+            page.append("</ul>")
+            in_list = False
+
+    def break_page(length):
+        nonlocal page, size
+        if page_chars and size and size + length > page_chars:
+            close_list()
+            pages.append("".join(page))
+            page, size = [], 0
+        size += length
+
+    for section in tree["sections"]:
+        if section["title"] is not None:
+            break_page(len(section["title"]))
+            close_list()
+            page.append(f'<h4 class="doc-section">{escape(section["title"])}</h4>')
+        for block_type, text in section["blocks"]:
+            break_page(len(text))
+            if block_type == "bullet" and not in_list:
+                page.append('<ul class="doc-bullets">')
+                in_list = True
+            elif block_type != "bullet":
+                close_list()
+            page.append(_html_block(block_type, text))
+
+    close_list()
+    if page or not pages:
+        pages.append("".join(page))
+    return pages
+
+
+def render_html(tree: dict) -> str:
+    return html_pages(tree)[0]
+
+
+# ---------- DOCX ----------
+def render_docx(tree: dict, title: str, subtitle: str) -> bytes:
+    """
+    Word document of a document tree: section headers and subheadings as
+    Word headings (so they appear in the navigation pane), bullets as
+    list items, code in a monospace font.
+    """
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.shared import Pt, RGBColor
+
+    document = Document()
+    document.add_heading(title, level=0)
+    caption = document.add_paragraph(f"{subtitle} | {datetime.now().strftime('%B %d, %Y')}")
+    caption.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    for section in tree["sections"]:
+        if section["title"] is not None:
+            document.add_heading(section["title"], level=1)
+        for block_type, text in section["blocks"]:
+            if block_type == "subheading":
+                document.add_heading(text, level=2)
+            elif block_type == "bullet":
+                document.add_paragraph(text, style="List Bullet")
+            elif block_type == "code":
+                run = document.add_paragraph().add_run(text)
+                run.font.name = "Courier New"
+                run.font.size = Pt(9)
+            elif block_type == "exam":
+                paragraph = document.add_paragraph()
+                label = paragraph.add_run("EXAM POINT: ")
+                label.bold = True
+                label.font.color.rgb = RGBColor(0xFF, 0x99, 0x33)
+                paragraph.add_run(text)
+            else:
+                document.add_paragraph(text)
+
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
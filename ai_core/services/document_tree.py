@@ -0,0 +1,210 @@
+import hashlib
+import inspect
+import logging
+import re
+import sys
+
+from django.conf import settings
+
+from .cache import cache_get, cache_set
+from .pdf_engine import strip_markdown
+from .redis_client import make_key
+
+logger = logging.getLogger(__name__)
+
+# ===========================
+#  DOCUMENT TREE
+# ===========================
+# Summary and tutorial text is parsed once into a compact tree that every
+# export (PDF, HTML, DOCX) renders from:
+#
+#   {"kind": "tutorial", "sections": [
+#       {"title": "CORE CONCEPTS" | None, "blocks": [[block_type, text], ...]},
+#   ]}
+#
+# Blocks before the first section header go in a section titled None.
+# Block types:
+#   subheading  a title line ("2.1 Arrays:", "Question 3:")
+#   point       a numbered line, number included ("3. Heap property ...")
+#   bullet      an unnumbered summary line
+#   text        a tutorial paragraph
+#   code        the contents of a ``` block, lines joined with "\n"
+#   exam        an EXAM POINT, without its prefix
+#
+# Text is stored with markdown removed but still Unicode; renderers only
+# escape or encode it for their format. Trees are cached in Redis by
+# content hash for as long as generations are (GENERATION_CACHE_TTL), so
+# the linked PDF render task parses the text and later downloads reuse it.
+EXAM_POINT_PREFIX = re.compile(r'^(EXAM POINT:|KEY EXAM POINT:)\s*', re.IGNORECASE)
+QUESTION_TITLE = re.compile(r'^Question\s+\d+$', re.IGNORECASE)
+NUMBERED_TITLE = re.compile(r'^\d+\.\d+\s+')
+NUMBERED_SECTION_KEYWORDS = ("step", "stage", "phase", "process", "principle", "rule", "law", "type")
+
+_parser_version = None
+
+
+def _is_numbered(line: str) -> bool:
+    return line[0].isdigit() and len(line) > 2 and line[1:3] in ('. ', ') ')
+
+
+def _is_section_title(title: str) -> bool:
+    return title.replace(" ", "").isupper() and len(title) > 8
+
+
+class _Builder:
+    def __init__(self, kind: str):
+        self.section = {"title": None, "blocks": []}
+        self.tree = {"kind": kind, "sections": [self.section]}
+
+    def start_section(self, title: str):
+        self.section = {"title": title, "blocks": []}
+        self.tree["sections"].append(self.section)
+
+    def add(self, block_type: str, text: str):
+        self.section["blocks"].append([block_type, text])
+
+    def build(self) -> dict:
+        sections = self.tree["sections"]
+        if sections[0]["blocks"] == [] and len(sections) > 1:
+            del sections[0]
+        return self.tree
+
+
+def parse_summary(text: str) -> dict:
+    """
+    Tree of summary notes. Section headers are upper-case lines ending in
+    a colon; in sections about steps, rules, types etc. every point is
+    numbered.
+    """
+    doc = _Builder("summary")
+    counter = 0
+    numbered_section = False
+
+    for line in text.strip().split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+
+        line_clean = strip_markdown(line)
+
+        if line_clean.endswith(":") and len(line_clean) > 3:
+            title = line_clean[:-1].strip()
+            if _is_section_title(title):
+                doc.start_section(title)
+                counter = 0
+                numbered_section = any(word in title.lower() for word in NUMBERED_SECTION_KEYWORDS)
+                continue
+            if title[0].isupper():
+                doc.add("subheading", strip_markdown(title))
+                continue
+
+        clean_line = line_clean.lstrip("-").lstrip("*").strip()
+        if not clean_line:
+            continue
+
+        if _is_numbered(clean_line):
+            doc.add("point", strip_markdown(clean_line))
+        elif numbered_section:
+            counter += 1
+            doc.add("point", strip_markdown(f"{counter}. {clean_line}"))
+        else:
+            doc.add("bullet", clean_line)
+
+    return doc.build()
+
+
+def parse_tutorial(text: str) -> dict:
+    """
+    Tree of a tutorial: section headers, subheadings (numbered titles,
+    "Question N:" and other short capitalized titles), fenced code blocks,
+    EXAM POINT lines, numbered points and paragraphs. A code block that is
+    never closed is dropped.
+    """
+    doc = _Builder("tutorial")
+    in_code_block = False
+    code_buffer = []
+
+    for line in text.split("\n"):
+        line_stripped = line.strip()
+
+        if line_stripped.startswith("```"):
+            in_code_block = not in_code_block
+            if not in_code_block and code_buffer:
+                doc.add("code", "\n".join(code_buffer).strip())
+                code_buffer = []
+            continue
+
+        if in_code_block:
+            code_buffer.append(line)
+            continue
+
+        if not line_stripped or line_stripped.startswith("-----"):
+            continue
+
+        line_clean = strip_markdown(line_stripped)
+
+        if line_clean.upper().startswith(("EXAM POINT:", "KEY EXAM POINT:")):
+            doc.add("exam", EXAM_POINT_PREFIX.sub('', line_clean))
+            continue
+
+        if line_clean.endswith(":") and len(line_clean) > 3:
+            title = line_clean[:-1].strip()
+            if QUESTION_TITLE.match(title):
+                doc.add("subheading", title)
+                continue
+            if _is_section_title(title):
+                doc.start_section(title)
+                continue
+            if NUMBERED_TITLE.match(title) or (title[0].isupper() and len(title) < 80):
+                doc.add("subheading", title)
+                continue
+
+        clean_line = line_clean.lstrip("-").lstrip("*").strip()
+        if not clean_line:
+            continue
+
+        paragraph = strip_markdown(clean_line)
+        if paragraph:
+            doc.add("point" if _is_numbered(clean_line) else "text", paragraph)
+
+    return doc.build()
+
+
+PARSERS = {
+    "summary": parse_summary,
+    "tutorial": parse_tutorial,
+}
+
+
+def parser_version() -> str:
+    """
+    Short hash of this module's source: editing the parser invalidates
+    cached trees (and, through pdf_cache, rendered PDFs).
+    """
+    global _parser_version
+    if _parser_version is None:
+        source = inspect.getsource(sys.modules[__name__])
+        _parser_version = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+    return _parser_version
+
+
+def tree_key(kind: str, text: str) -> str:
+    digest = hashlib.sha256(f"{parser_version()}\n{text}".encode("utf-8")).hexdigest()
+    return make_key("doctree", kind, digest)
+
+
+def document_tree(kind: str, text: str) -> dict:
+    """
+    The parsed tree of summary or tutorial `text`, from the cache when it
+    has been parsed before.
+    """
+    if not settings.GENERATION_CACHE_ENABLED:
+        return PARSERS[kind](text)
+
+    key = tree_key(kind, text)
+    tree = cache_get(key)
+    if tree is None:
+        tree = PARSERS[kind](text)
+        cache_set(key, tree)
+        logger.info("[DOCTREE] Parsed %s: %d sections, %d chars", kind, len(tree["sections"]), len(text))
+    return tree
@@ -0,0 +1,186 @@
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_TYPES = {".pdf": "pdf", ".docx": "docx"}
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class DocumentError(Exception):
+    """The upload is not a readable PDF/DOCX, or is over the size limits."""
+
+
+def document_type(filename: str):
+    return DOCUMENT_TYPES.get(Path(filename).suffix.lower())
+
+
+# ===========================
+#  UPLOADS
+# ===========================
+def save_upload(upload, task_name: str) -> Path:
+    """
+    Write an uploaded file to DOCUMENT_UPLOAD_DIR chunk by chunk (Django
+    has already spooled large uploads to a temp file), so neither the web
+    process nor the worker ever holds the whole file in memory.
+    """
+    upload_dir = Path(settings.DOCUMENT_UPLOAD_DIR)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    path = upload_dir / f"{task_name}{Path(upload.name).suffix.lower()}"
+    with open(path, "wb") as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    return path
+
+
+# ===========================
+#  PDF: PAGE RANGES IN A PROCESS POOL
+# ===========================
+# Text extraction is pure-Python CPU work, so pages are parsed in worker
+# processes. Each worker opens the file itself and parses one range of
+# pages; only the extracted text comes back. At most DOCUMENT_EXTRACT_WINDOW
+# ranges are in flight, so memory stays bounded whatever the page count.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Workers run many threads: fork would copy their locks mid-use
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.DOCUMENT_EXTRACT_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _pool
+
+
+def _extract_pdf_range(path: str, start: int, stop: int) -> list:
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def pdf_page_count(path) -> int:
+    from PyPDF2 import PdfReader
+    from PyPDF2.errors import PdfReadError
+
+    try:
+        return len(PdfReader(str(path)).pages)
+    except (PdfReadError, ValueError, KeyError) as e:
+        raise DocumentError(f"Could not read PDF: {e}") from e
+
+
+def iter_pdf_pages(path, processes: int = None):
+    """
+    Yield the text of each page of the PDF at `path`, in order.
+    `processes` overrides DOCUMENT_EXTRACT_PROCESSES (1 = in this process).
+    """
+    path = str(path)
+    total = pdf_page_count(path)
+    if total > settings.DOCUMENT_MAX_PAGES:
+        raise DocumentError(f"PDF has {total} pages, the limit is {settings.DOCUMENT_MAX_PAGES}")
+
+    step = settings.DOCUMENT_EXTRACT_PAGES_PER_TASK
+    ranges = [(start, min(start + step, total)) for start in range(0, total, step)]
+    processes = processes or settings.DOCUMENT_EXTRACT_PROCESSES
+    if processes <= 1 or len(ranges) <= 1:
+        for start, stop in ranges:
+            yield from _extract_pdf_range(path, start, stop)
+        return
+
+    pool = _get_pool() if processes == settings.DOCUMENT_EXTRACT_PROCESSES else ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+    )
+    pending = deque()
+    try:
+        for start, stop in ranges:
+            pending.append(pool.submit(_extract_pdf_range, path, start, stop))
+            if len(pending) >= settings.DOCUMENT_EXTRACT_WINDOW:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if pool is not _pool:
+            pool.shutdown()
+
+
+# ===========================
+#  DOCX: STREAMED XML
+# ===========================
+# python-docx builds the whole document tree in memory. The paragraphs
+# are read straight from word/document.xml with iterparse instead,
+# clearing each one once its text is taken.
+def iter_docx_paragraphs(path):
+    from lxml import etree
+
+    try:
+        archive = zipfile.ZipFile(path)
+        xml = archive.open("word/document.xml")
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise DocumentError(f"Could not read DOCX: {e}") from e
+
+    with archive, xml:
+        try:
+            for _, element in etree.iterparse(xml, events=("end",), tag=f"{WORD_NS}p"):
+                text = "".join(node.text or "" for node in element.iter(f"{WORD_NS}t"))
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+                if text.strip():
+                    yield text
+        except etree.XMLSyntaxError as e:
+            raise DocumentError(f"Could not read DOCX: {e}") from e
+
+
+# ===========================
+#  TEXT
+# ===========================
+def extract_text(path, on_progress=None) -> str:
+    """
+    All text of a PDF (pages separated by blank lines) or DOCX (one
+    paragraph per line). `on_progress(done, total)` is called every few
+    PDF pages. Stops with DocumentError at DOCUMENT_MAX_CHARS.
+    """
+    path = Path(path)
+    kind = document_type(path.name)
+    if kind is None:
+        raise DocumentError(f"Unsupported file type: {path.suffix}")
+
+    if kind == "pdf":
+        total = pdf_page_count(path)
+        parts, separator = iter_pdf_pages(path), "\n\n"
+    else:
+        total = None
+        parts, separator = iter_docx_paragraphs(path), "\n"
+
+    texts, size = [], 0
+    for done, text in enumerate(parts, start=1):
+        size += len(text)
+        if size > settings.DOCUMENT_MAX_CHARS:
+            raise DocumentError(f"Document text is over {settings.DOCUMENT_MAX_CHARS} characters")
+        texts.append(text)
+        if on_progress is not None and total and done % settings.DOCUMENT_EXTRACT_PAGES_PER_TASK == 0:
+            on_progress(done, total)
+    logger.info("[DOCUMENT] %s: %d %s, %d chars", path.name, len(texts),
+                "pages" if kind == "pdf" else "paragraphs", size)
+    return separator.join(texts).strip()
+
+
+def remove_upload(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.warning("[DOCUMENT] Could not remove %s: %s", path, e)
@@ -0,0 +1,150 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Chunks of one request must not share a prompt: with a deterministic model
+# (LLM_CACHEABLE, temperature 0) identical prompts return identical
+# questions, which deduplication then throws away. Each chunk is given its
+# own part of the topic, and top-up rounds list the questions already
+# generated (the most recent AVOID_MAX_QUESTIONS, each cut to
+# AVOID_MAX_CHARS) so the model writes new ones.
+AVOID_MAX_QUESTIONS = 40
+AVOID_MAX_CHARS = 160
+
+
+def chunk_sizes(total: int, chunk_size: int) -> list:
+    """
+    Split `total` into near-equal chunks of at most `chunk_size`:
+    23 with chunk size 10 becomes [8, 8, 7] rather than [10, 10, 3].
+    """
+    if total <= 0:
+        return []
+    n_chunks = -(-total // max(1, chunk_size))
+    base, extra = divmod(total, n_chunks)
+    return [base + 1 if i < extra else base for i in range(n_chunks)]
+
+
+def question_key(item) -> str:
+    if not isinstance(item, dict):
+        return ""
+    return " ".join(str(item.get("question", "")).casefold().split())
+
+
+def merge_unique(target: list, seen: set, items, limit: int):
+    for item in items or []:
+        if len(target) >= limit:
+            break
+        key = question_key(item)
+        if key and key not in seen:
+            seen.add(key)
+            target.append(item)
+
+
+def chunk_focus(part: int, parts: int, avoid: list) -> str:
+    """
+    Prompt text that sets one chunk apart from the others: which part of
+    the topic it covers, and the questions it must not repeat. Empty for
+    a request generated as a single chunk.
+    """
+    lines = []
+    if parts > 1:
+        lines.append(
+            f"This is part {part} of {parts} of a larger question set. Divide the topic into "
+            f"{parts} distinct areas and write questions ONLY on area {part}, so the parts do not overlap."
+        )
+    if avoid:
+        lines.append("These questions were already written. Do NOT repeat or rephrase any of them:")
+        lines += [f"- {question}" for question in avoid]
+    return "\n".join(lines)
+
+
+def chunk_inputs(inputs: dict, count_key: str, chunks: list) -> list:
+    """
+    Prompt inputs for each chunk of a fan_out round: the request's inputs
+    with the chunk's size under `count_key` and its focus under "focus".
+    """
+    return [{**inputs, count_key: size, "focus": focus} for size, focus in chunks]
+
+
+def _avoid_list(merged: list) -> list:
+    return [str(item.get("question", ""))[:AVOID_MAX_CHARS] for item in merged[-AVOID_MAX_QUESTIONS:]]
+
+
+def _round_chunks(merged: list, total: int, chunk_size: int, label: str, round_no: int):
+    missing = total - len(merged)
+    if missing <= 0:
+        return None
+    sizes = chunk_sizes(missing, chunk_size)
+    logger.info("[FANOUT] %s round %d: %d missing, chunks %s", label, round_no + 1, missing, sizes)
+    avoid = _avoid_list(merged)
+    return [(size, chunk_focus(part, len(sizes), avoid)) for part, size in enumerate(sizes, start=1)]
+
+
+def _merge_round(merged: list, seen: set, results, total: int, label: str):
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("[FANOUT] %s chunk failed: %s", label, result)
+            continue
+        merge_unique(merged, seen, result, total)
+
+
+def fan_out(run_batch, total: int, chunk_size: int, label: str) -> list:
+    """
+    Generate `total` questions as concurrent chunks.
+
+    `run_batch(chunks)` generates the chunks concurrently and returns one
+    list of questions per chunk (an exception in place of a list counts as
+    an empty chunk). Each chunk is a (size, focus) pair; chunk_inputs()
+    turns them into prompt inputs. Results are merged in order and
+    deduplicated by question text; any shortfall from truncated, failed or
+    duplicate chunks is requested again, with the questions so far to
+    avoid, for up to FANOUT_TOPUP_ROUNDS extra rounds.
+    """
+    merged, seen = [], set()
+
+    for round_no in range(1 + settings.FANOUT_TOPUP_ROUNDS):
+        chunks = _round_chunks(merged, total, chunk_size, label, round_no)
+        if chunks is None:
+            break
+        _merge_round(merged, seen, run_batch(chunks), total, label)
+
+    if len(merged) < total:
+        logger.warning("[FANOUT] %s returned %d of %d", label, len(merged), total)
+    return merged
+
+
+async def afan_out(arun_batch, total: int, chunk_size: int, label: str) -> list:
+    """
+    fan_out with an async `arun_batch(chunks)`.
+    """
+    merged, seen = [], set()
+
+    for round_no in range(1 + settings.FANOUT_TOPUP_ROUNDS):
+        chunks = _round_chunks(merged, total, chunk_size, label, round_no)
+        if chunks is None:
+            break
+        _merge_round(merged, seen, await arun_batch(chunks), total, label)
+
+    if len(merged) < total:
+        logger.warning("[FANOUT] %s returned %d of %d", label, len(merged), total)
+    return merged
+
+
+def batch_config() -> dict:
+    return {"max_concurrency": settings.LLM_MAX_CONCURRENCY}
+
+
+def run_concurrently(fn, batch: list) -> list:
+    """
+    Call `fn(inputs)` for every item of `batch` on a thread pool bounded by
+    LLM_MAX_CONCURRENCY. Like Runnable.batch(return_exceptions=True), a
+    failed call leaves its exception in place of the result.
+    """
+    if not batch:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(batch), settings.LLM_MAX_CONCURRENCY)) as pool:
+        futures = [pool.submit(fn, inputs) for inputs in batch]
+    return [f.exception() or f.result() for f in futures]
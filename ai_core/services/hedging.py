@@ -0,0 +1,338 @@
+import asyncio
+import collections
+import logging
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from langchain_core.language_models.chat_models import BaseChatModel, generate_from_stream
+
+from .metrics import LLM_HEDGES, LLM_HEDGE_LATENCY, record
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================
+#  HEDGE DEADLINE
+# ===========================
+class TTFTWindow:
+    """
+    Recent time-to-first-token samples of one primary model in this
+    process. The hedge deadline is their LLM_HEDGE_PERCENTILE, so roughly
+    that share of calls never needs a backup.
+    """
+
+    def __init__(self, size: int = 200):
+        self._samples = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def deadline(self) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return settings.LLM_HEDGE_DEFAULT_DEADLINE
+        index = min(len(samples) - 1, int(len(samples) * settings.LLM_HEDGE_PERCENTILE / 100))
+        return max(settings.LLM_HEDGE_MIN_DEADLINE, samples[index])
+
+
+_windows = collections.defaultdict(TTFTWindow)
+
+
+# ===========================
+#  ATTEMPTS
+# ===========================
+# The raced clients get the run's metadata (the rate limiter estimates
+# cost from it) but not its callbacks: only the winner's tokens are
+# reported, by the hedged model itself. The rate limiter reports how long
+# a call queues for budget, so the hedge deadline runs from when the
+# request is actually sent.
+class _QuietRunManager:
+    def __init__(self, run_manager, attempt):
+        self.metadata = getattr(run_manager, "metadata", None)
+        self.on_rate_limit_wait = attempt.queued
+
+    def on_llm_new_token(self, *args, **kwargs):
+        pass
+
+
+class _AsyncQuietRunManager(_QuietRunManager):
+    async def on_llm_new_token(self, *args, **kwargs):
+        pass
+
+
+class _Attempt:
+    """One streamed call to one model, raced against the other attempt."""
+
+    def __init__(self, model, role: str):
+        self.model = model
+        self.role = role
+        self.start_time = time.perf_counter()
+        self.sent_at = self.start_time
+        self.first_token_at = None
+        self.finished = False
+        self.error = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.finished and self.error is None
+
+    def queued(self, seconds: float):
+        self.sent_at = time.perf_counter() + seconds
+        self._notify()
+
+    def _on_chunk(self, chunk) -> bool:
+        """Returns True on the first chunk that carries text."""
+        if self.first_token_at is None and chunk.text:
+            self.first_token_at = time.perf_counter()
+            return True
+        return False
+
+
+class _ThreadAttempt(_Attempt):
+    def __init__(self, model, role, call, changed: threading.Condition):
+        super().__init__(model, role)
+        self.chunks = queue.Queue()
+        self.cancelled = False
+        self._changed = changed
+        self._thread = threading.Thread(target=self._run, args=call, daemon=True)
+        self._thread.start()
+
+    def _run(self, messages, stop, run_manager, kwargs):
+        stream = None
+        try:
+            stream = self.model._stream(
+                messages, stop=stop, run_manager=_QuietRunManager(run_manager, self), **kwargs
+            )
+            for chunk in stream:
+                if self.cancelled:
+                    break
+                self.chunks.put(chunk)
+                if self._on_chunk(chunk):
+                    self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            if stream is not None:
+                stream.close()
+            self.chunks.put(None)
+            with self._changed:
+                self.finished = True
+                self._changed.notify_all()
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def cancel(self):
+        # The thread stops at its next chunk and closes the response
+        self.cancelled = True
+
+
+class _TaskAttempt(_Attempt):
+    def __init__(self, model, role, call, changed: asyncio.Event):
+        super().__init__(model, role)
+        self.chunks = asyncio.Queue()
+        self._changed = changed
+        self._task = asyncio.ensure_future(self._run(*call))
+
+    async def _run(self, messages, stop, run_manager, kwargs):
+        try:
+            async for chunk in self.model._astream(
+                messages, stop=stop, run_manager=_AsyncQuietRunManager(run_manager, self), **kwargs
+            ):
+                self.chunks.put_nowait(chunk)
+                if self._on_chunk(chunk):
+                    self._notify()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self.chunks.put_nowait(None)
+            self._changed.set()
+
+    def _notify(self):
+        self._changed.set()
+
+    def cancel(self):
+        self._task.cancel()
+
+
+def _first_token(attempt) -> bool:
+    return attempt.first_token_at is not None or attempt.succeeded
+
+
+def _complete(attempt) -> bool:
+    return attempt.succeeded
+
+
+# ===========================
+#  HEDGED MODEL
+# ===========================
+class HedgedChatModel(BaseChatModel):
+    """
+    Chat model that hedges a slow primary: if no token has arrived within
+    the primary's recent p95 time-to-first-token, the same request is sent
+    to `backup` (the same model or a faster one) and the two race.
+
+    invoke()/batch() take whichever response completes first; stream()
+    commits to whichever starts streaming first, since its tokens are
+    already on their way to the user. The loser is cancelled. Calls that
+    fail before a hedge are not retried here (the clients retry).
+    """
+
+    primary: BaseChatModel
+    backup: BaseChatModel
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged"
+
+    # The cache and metrics see the primary model
+    @property
+    def model_name(self) -> str:
+        return self.primary.model_name
+
+    @property
+    def temperature(self):
+        return self.primary.temperature
+
+    def _get_ls_params(self, stop=None, **kwargs):
+        return self.primary._get_ls_params(stop=stop, **kwargs)
+
+    # ---------- sync: one thread per attempt ----------
+    def _race(self, call, ready):
+        changed = threading.Condition()
+        attempts = [_ThreadAttempt(self.primary, "primary", call, changed)]
+        hedge_after = _windows[self.model_name].deadline()
+
+        with changed:
+            while True:
+                winner = next((a for a in attempts if ready(a)), None)
+                if winner is not None:
+                    break
+                if all(a.finished for a in attempts):
+                    raise attempts[-1].error
+                if len(attempts) == 1 and attempts[0].first_token_at is None:
+                    remaining = attempts[0].sent_at + hedge_after - time.perf_counter()
+                    if remaining <= 0:
+                        attempts.append(
+                            _ThreadAttempt(self.backup, "backup", call, changed)
+                        )
+                        continue
+                    changed.wait(remaining)
+                else:
+                    changed.wait()
+
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel()
+        return winner, attempts
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        winner, attempts = self._race((messages, stop, run_manager, kwargs), _complete)
+        chunks = []
+        while (chunk := winner.chunks.get()) is not None:
+            chunks.append(chunk)
+        self._report(winner, attempts)
+        return generate_from_stream(iter(chunks))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        winner, attempts = self._race((messages, stop, run_manager, kwargs), _first_token)
+        try:
+            while (chunk := winner.chunks.get()) is not None:
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            winner.cancel()
+        if winner.error is not None:
+            raise winner.error
+        self._report(winner, attempts)
+
+    # ---------- async: one task per attempt ----------
+    async def _arace(self, call, ready):
+        changed = asyncio.Event()
+        attempts = [_TaskAttempt(self.primary, "primary", call, changed)]
+        hedge_after = _windows[self.model_name].deadline()
+
+        try:
+            while True:
+                changed.clear()
+                winner = next((a for a in attempts if ready(a)), None)
+                if winner is not None:
+                    break
+                if all(a.finished for a in attempts):
+                    raise attempts[-1].error
+                if len(attempts) == 1 and attempts[0].first_token_at is None:
+                    remaining = attempts[0].sent_at + hedge_after - time.perf_counter()
+                    if remaining <= 0:
+                        attempts.append(
+                            _TaskAttempt(self.backup, "backup", call, changed)
+                        )
+                        continue
+                    try:
+                        await asyncio.wait_for(changed.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await changed.wait()
+        except BaseException:
+            for attempt in attempts:
+                attempt.cancel()
+            raise
+
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel()
+        return winner, attempts
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        winner, attempts = await self._arace((messages, stop, run_manager, kwargs), _complete)
+        chunks = []
+        while (chunk := winner.chunks.get_nowait()) is not None:
+            chunks.append(chunk)
+        await sync_to_async(self._report, thread_sensitive=False)(winner, attempts)
+        return generate_from_stream(iter(chunks))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        winner, attempts = await self._arace((messages, stop, run_manager, kwargs), _first_token)
+        try:
+            while (chunk := await winner.chunks.get()) is not None:
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        finally:
+            winner.cancel()
+        if winner.error is not None:
+            raise winner.error
+        await sync_to_async(self._report, thread_sensitive=False)(winner, attempts)
+
+    # ---------- reporting ----------
+    def _report(self, winner, attempts):
+        primary = attempts[0]
+        now = time.perf_counter()
+        # A primary cancelled before its first token contributes the time
+        # it had waited so far, a lower bound, so slow spells still raise
+        # the deadline
+        _windows[self.model_name].add(
+            max(0.0, (primary.first_token_at or now) - primary.sent_at)
+        )
+
+        if len(attempts) == 1:
+            outcome = "not_hedged"
+        else:
+            outcome = f"{winner.role}_won"
+            logger.info("[HEDGE] %s: %s after %.2fs", self.model_name, outcome, now - primary.start_time)
+        record([
+            (LLM_HEDGES, 1, {"model": self.model_name, "backup_model": self.backup.model_name,
+                             "outcome": outcome}),
+            (LLM_HEDGE_LATENCY, now - primary.start_time, {"model": self.model_name, "outcome": outcome}),
+        ])
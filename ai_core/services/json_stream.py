@@ -0,0 +1,68 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JsonItemStream:
+    """
+    Incremental scanner for a JSON document that arrives in pieces.
+
+    feed() returns every object that is an element of a top-level array,
+    or of an array directly inside the top-level object ({"mcqs": [...]}),
+    as soon as its closing brace arrives. Text outside the JSON (prose,
+    markdown fences) is skipped, and malformed output after an object
+    never affects the objects already returned.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+        self._item_depth = 0
+
+    def feed(self, chunk: str) -> list:
+        text = self._text + chunk
+        items = []
+        i = self._pos
+
+        while i < len(text):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"' and self._stack:
+                self._in_string = True
+            elif c == "{" or c == "[":
+                if (c == "{" and self._item_start is None
+                        and self._stack and self._stack[-1] == "[" and len(self._stack) <= 2):
+                    self._item_start = i
+                    self._item_depth = len(self._stack)
+                self._stack.append(c)
+            elif c == "}" or c == "]":
+                if self._stack:
+                    self._stack.pop()
+                if c == "}" and self._item_start is not None and len(self._stack) == self._item_depth:
+                    raw = text[self._item_start:i + 1]
+                    try:
+                        items.append(json.loads(raw))
+                    except ValueError:
+                        logger.warning("[JSON STREAM] Skipping malformed item: %.80s", raw)
+                    self._item_start = None
+            i += 1
+
+        # Keep only the text of the item still open, if any
+        if self._item_start is None:
+            self._text, self._pos = "", 0
+        else:
+            self._text = text[self._item_start:]
+            self._pos = i - self._item_start
+            self._item_start = 0
+        return items
@@ -1,26 +1,248 @@
+import logging
 import os
+import threading
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import ConfigurableField
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
 
+from . import rate_limit
+from .hedging import HedgedChatModel
+from .metrics import LLM_ROUTES, level_label, llm_metrics, seconds_per_token
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 groq_api_key = os.getenv("GROQ_API_KEY")
 
-llm = ChatGroq(
-    temperature=0.7,
-    max_tokens=None,
-    groq_api_key=groq_api_key,
-    model_name="llama-3.3-70b-versatile"
-)
-
-llm2 = ChatGroq(
-    temperature=0.7,
-    max_tokens=None,
-    groq_api_key=groq_api_key,
-    model_name="llama-3.3-70b-versatile"
-)
-llm3= ChatGroq(
-    temperature=0.7,
-    max_tokens=None,
-    groq_api_key=groq_api_key,
-    model_name="llama-3.1-8b-instant"
-)
\ No newline at end of file
+MODEL_70B = "llama-3.3-70b-versatile"
+MODEL_8B = "llama-3.1-8b-instant"
+
+# ===========================
+#  CACHEABLE MODE
+# ===========================
+# Sampling at 0.7 means two runs of the same prompt legitimately differ,
+# so serving one user's generation to another is a product decision.
+# LLM_CACHEABLE=1 pins temperature to 0 so cached outputs are what the
+# model would have produced anyway.
+LLM_CACHEABLE = os.getenv("LLM_CACHEABLE", "0") == "1"
+LLM_TEMPERATURE = 0.0 if LLM_CACHEABLE else 0.7
+
+# Per-request HTTP timeout and retries. Workers run many tasks on threads,
+# so a hung connection must not hold a thread forever.
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 180))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+
+
+class RateLimitedChatGroq(ChatGroq):
+    """
+    ChatGroq that books each call's request and estimated tokens in the
+    shared rate limiter before sending it, waiting its turn when the
+    account budget is spent, and settles the estimate against the real
+    usage afterwards. A call that fails settles as using no tokens, so a
+    run of errors does not leave the budget booked up; a call cancelled
+    or abandoned by its caller (a losing hedge) keeps its estimate, as
+    it did use tokens.
+    """
+
+    def _estimate(self, messages, run_manager) -> int:
+        metadata = getattr(run_manager, "metadata", None)
+        return rate_limit.estimate_tokens(messages, metadata)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate(messages, run_manager)
+        rate_limit.acquire(self.model_name, estimate, _on_wait(run_manager))
+        try:
+            result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        except Exception:
+            rate_limit.settle(self.model_name, estimate, 0)
+            raise
+        rate_limit.settle(self.model_name, estimate, _total_tokens(result))
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate(messages, run_manager)
+        await rate_limit.aacquire(self.model_name, estimate, _on_wait(run_manager))
+        try:
+            result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        except Exception:
+            await sync_to_async(rate_limit.settle, thread_sensitive=False)(self.model_name, estimate, 0)
+            raise
+        await sync_to_async(rate_limit.settle, thread_sensitive=False)(
+            self.model_name, estimate, _total_tokens(result)
+        )
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate(messages, run_manager)
+        rate_limit.acquire(self.model_name, estimate, _on_wait(run_manager))
+        usage = None
+        try:
+            for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                usage = getattr(chunk.message, "usage_metadata", None) or usage
+                yield chunk
+        except Exception:
+            rate_limit.settle(self.model_name, estimate, 0)
+            raise
+        rate_limit.settle(self.model_name, estimate, usage and usage.get("total_tokens"))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate(messages, run_manager)
+        await rate_limit.aacquire(self.model_name, estimate, _on_wait(run_manager))
+        usage = None
+        try:
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                usage = getattr(chunk.message, "usage_metadata", None) or usage
+                yield chunk
+        except Exception:
+            await sync_to_async(rate_limit.settle, thread_sensitive=False)(self.model_name, estimate, 0)
+            raise
+        await sync_to_async(rate_limit.settle, thread_sensitive=False)(
+            self.model_name, estimate, usage and usage.get("total_tokens")
+        )
+
+
+def _on_wait(run_manager):
+    # Hedged calls pass a run manager that wants to know (see hedging)
+    return getattr(run_manager, "on_rate_limit_wait", None)
+
+
+def _total_tokens(result):
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+_clients = {}
+_clients_lock = threading.RLock()
+
+
+def get_llm(model_name: str = MODEL_70B, temperature: float = None) -> BaseChatModel:
+    """
+    Return a shared ChatGroq client for the given model and temperature.
+    Clients are safe to share between threads (the underlying httpx
+    client pools connections), so each process builds each one once.
+    Every call is timed and its token usage recorded (see metrics), and
+    draws on the account's shared rate limit (see rate_limit). With
+    LLM_HEDGE_ENABLED, models listed in LLM_HEDGE_BACKUPS are wrapped in
+    a HedgedChatModel (see hedging).
+    """
+    if temperature is None:
+        temperature = LLM_TEMPERATURE
+
+    backup_model = settings.LLM_HEDGE_BACKUPS.get(model_name) if settings.LLM_HEDGE_ENABLED else None
+    if not backup_model:
+        return _get_client(model_name, temperature)
+
+    key = (model_name, temperature, "hedged")
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = HedgedChatModel(
+                primary=_get_client(model_name, temperature),
+                backup=_get_client(backup_model, temperature),
+                callbacks=[llm_metrics]
+            )
+    return _clients[key]
+
+
+def _get_client(model_name: str, temperature: float) -> ChatGroq:
+    key = (model_name, temperature)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = RateLimitedChatGroq(
+                temperature=temperature,
+                max_tokens=None,
+                groq_api_key=groq_api_key,
+                model_name=model_name,
+                request_timeout=LLM_REQUEST_TIMEOUT,
+                max_retries=LLM_MAX_RETRIES,
+                callbacks=[llm_metrics]
+            )
+    return _clients[key]
+
+
+# ===========================
+#  MODEL ROUTER
+# ===========================
+# Each request gets a complexity score from its level (difficulty, depth
+# or summary type) plus its size (questions to generate, or words of text
+# to summarize). At or above the generator's threshold it goes to the 70B
+# model, below it to 8B. A request exactly at the threshold is moved to 8B
+# when the 70B model's recent speed in this process means it would take
+# longer than LLM_ROUTER_LATENCY_BUDGET seconds.
+#
+# Levels are weighed by level_label(), so tutorial depth "1"/"2"/"3" counts
+# as short/medium/full: depth 1 goes to 8B, depth 3 to 70B.
+LEVEL_WEIGHTS = {
+    "easy": 0, "short": 0, "bullet": 0,
+    "medium": 1,
+    "hard": 2, "detailed": 2, "full": 2,
+}
+SIZE_STEPS = {"mcq": (10, 30), "quiz": (10, 30), "summary": (800, 3000)}
+ROUTE_THRESHOLDS = {"mcq": 3, "quiz": 2, "tutorial": 1, "summary": 3}
+
+# The models each generator used before routing (LLM_ROUTER_ENABLED=0)
+DEFAULT_MODELS = {"mcq": MODEL_8B, "quiz": MODEL_70B, "tutorial": MODEL_70B, "summary": MODEL_8B}
+ROUTABLE_MODELS = (MODEL_70B, MODEL_8B)
+
+
+def complexity(generator: str, level=None, size: int = None) -> int:
+    score = LEVEL_WEIGHTS.get(level_label(level), 1)
+    if size:
+        score += sum(int(size) > step for step in SIZE_STEPS.get(generator, ()))
+    return score
+
+
+def route_model(generator: str, level=None, size: int = None) -> str:
+    """
+    Pick the model for one request and record the decision. Pass the
+    result to model_config() when running a chain built on routable_llm().
+    """
+    level = level_label(level)
+    if not settings.LLM_ROUTER_ENABLED:
+        model_name, reason = DEFAULT_MODELS[generator], "fixed"
+    else:
+        score = complexity(generator, level, size)
+        threshold = ROUTE_THRESHOLDS[generator]
+        if score < threshold:
+            model_name, reason = MODEL_8B, "simple"
+        elif score == threshold and _too_slow(MODEL_70B, generator, level, size):
+            model_name, reason = MODEL_8B, "latency"
+        else:
+            model_name, reason = MODEL_70B, "complex"
+
+    LLM_ROUTES.inc(generator=generator, level=level, model=model_name, reason=reason)
+    logger.info("[ROUTER] %s level=%s size=%s -> %s (%s)", generator, level, size, model_name, reason)
+    return model_name
+
+
+def _too_slow(model_name: str, generator: str, level, size) -> bool:
+    speed = seconds_per_token(model_name)
+    if speed is None:
+        return False
+    expected = speed * rate_limit.expected_completion_tokens(generator, level, size)
+    return expected > settings.LLM_ROUTER_LATENCY_BUDGET
+
+
+def routable_llm(default_model: str):
+    """
+    The shared client for `default_model`, switchable to any other
+    routable model per call through model_config().
+    """
+    return get_llm(default_model).configurable_alternatives(
+        ConfigurableField(id="model"),
+        default_key=default_model,
+        **{name: get_llm(name) for name in ROUTABLE_MODELS if name != default_model}
+    )
+
+
+def model_config(model_name: str) -> dict:
+    return {"configurable": {"model": model_name}}
+
+
+llm = get_llm(MODEL_70B)
+
+llm2 = get_llm(MODEL_70B)
+
+llm3 = get_llm(MODEL_8B)
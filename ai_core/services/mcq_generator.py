@@ -1,22 +1,27 @@
-import os
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from fpdf import FPDF
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+
+from .cache import cached_generation, acached_generation
+from .question_bank import fill_from_bank, afill_from_bank
+from .fanout import fan_out, afan_out, batch_config, chunk_inputs, run_concurrently
+from .json_stream import JsonItemStream
+from .llm_config import get_llm, MODEL_8B, model_config, routable_llm, route_model
+from .metrics import PARSE_SECONDS, level_label, run_labels, timed_parser
+from .pdf_engine import LayoutPDF
 
-load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
+logger = logging.getLogger(__name__)
 
 
 # ===========================
 #  LLM CONFIG
 # ===========================
-llm = ChatGroq(
-    temperature=0.7,
-    groq_api_key=groq_api_key,
-    model_name="llama-3.1-8b-instant"
-)
+# 8B unless the router picks 70B for a request (see route_model)
+llm = routable_llm(MODEL_8B)
 
 
 # ===========================
@@ -54,49 +59,172 @@ STRICT RULES:
 
 If you do not follow the rules, the output will break.  
 Return ONLY the final JSON.
+{focus}
 """,
-    input_variables=["topic", "num_ques", "difficulty"],
+    input_variables=["topic", "num_ques", "difficulty", "focus"],
 )
 
 
 
-mcq_chain = prompt_mcq | llm | parser
+mcq_chain = prompt_mcq | llm | timed_parser(parser, "mcq")
+
+# Same prompt, raw text: parsed incrementally by JsonItemStream
+mcq_stream_chain = prompt_mcq | llm | StrOutputParser()
 
 
 # ===========================
 # GENERATE MCQs
 # ===========================
-def generate_mcqs(topic: str, num_ques: int, difficulty: str):
-    try:
-        result = mcq_chain.invoke({
+def generate_mcqs(topic: str, num_ques: int, difficulty: str, on_mcqs=None):
+    """
+    Serve MCQs from the question bank first; only the shortfall is generated.
+    With `on_mcqs`, MCQs are handed to it as they become available: banked
+    and cached ones at once, generated ones as each object is streamed.
+    """
+    def generate(count: int, fresh: bool):
+        inputs = {
             "topic": topic,
-            "num_ques": num_ques,
+            "num_ques": count,
             "difficulty": difficulty
-        })
-        
-        print(f"[DEBUG] LLM Response: {result}")  # Debug output
-        
-        # Handle both direct list and nested dict response
-        if isinstance(result, dict) and "mcqs" in result:
-            return result["mcqs"]
-        elif isinstance(result, list):
-            return result
-        else:
-            print(f"[ERROR] Unexpected response format: {type(result)}")
-            return []
-            
+        }
+        model_name = route_model("mcq", difficulty, count)
+        computed = []
+
+        def compute():
+            computed.append(True)
+            return _generate_mcqs(inputs, model_name, on_mcqs)
+
+        if fresh:
+            return compute()
+        mcqs = cached_generation(
+            "mcq", inputs, prompt_mcq, get_llm(model_name), compute,
+            similar_topics=True
+        )
+        if on_mcqs is not None and not computed:
+            on_mcqs(mcqs)
+        return mcqs
+
+    return fill_from_bank("mcq", topic, difficulty, num_ques, generate, on_banked=on_mcqs)
+
+
+def _mcqs_from_result(result):
+    # Handle both direct list and nested dict response
+    if isinstance(result, dict) and "mcqs" in result:
+        return result["mcqs"]
+    elif isinstance(result, list):
+        return result
+    else:
+        logger.error("[ERROR] Unexpected response format: %s", type(result))
+        return []
+
+
+def _run_config(inputs: dict, model_name: str) -> dict:
+    return {
+        **run_labels("mcq", inputs["difficulty"], size=inputs["num_ques"]),
+        **model_config(model_name),
+    }
+
+
+def _is_mcq(item) -> bool:
+    return (
+        isinstance(item, dict)
+        and bool(item.get("question"))
+        and isinstance(item.get("options"), list)
+        and "answer" in item
+    )
+
+
+def _stream_mcqs(inputs: dict, model_name: str, on_mcqs) -> list:
+    """
+    Generate one chunk as a stream, handing each MCQ to `on_mcqs` as soon
+    as its JSON object closes. If the output breaks off or turns malformed,
+    the MCQs completed before that point are kept.
+    """
+    scanner = JsonItemStream()
+    mcqs = []
+    parse_time = 0.0
+    try:
+        for text in mcq_stream_chain.stream(inputs, config=_run_config(inputs, model_name)):
+            start = time.perf_counter()
+            completed = [item for item in scanner.feed(text) if _is_mcq(item)]
+            parse_time += time.perf_counter() - start
+            if completed:
+                mcqs.extend(completed)
+                on_mcqs(completed)
+    except Exception:
+        if not mcqs:
+            raise
+        logger.warning("[MCQ GEN] Stream broke off after %d MCQs", len(mcqs), exc_info=True)
+    finally:
+        PARSE_SECONDS.observe(parse_time, generator="mcq", level=level_label(inputs["difficulty"]))
+    return mcqs
+
+
+def _generate_mcqs(inputs: dict, model_name: str, on_mcqs=None):
+    """
+    Large counts are split into chunks generated concurrently, then merged,
+    deduplicated and topped up to the requested number.
+    """
+    def run_batch(chunks):
+        batch = chunk_inputs(inputs, "num_ques", chunks)
+        configs = [{**batch_config(), **_run_config(chunk, model_name)} for chunk in batch]
+        results = mcq_chain.batch(batch, config=configs, return_exceptions=True)
+        return [r if isinstance(r, Exception) else _mcqs_from_result(r) for r in results]
+
+    def run_streamed(chunks):
+        batch = chunk_inputs(inputs, "num_ques", chunks)
+        return run_concurrently(lambda chunk: _stream_mcqs(chunk, model_name, on_mcqs), batch)
+
+    try:
+        return fan_out(
+            run_batch if on_mcqs is None else run_streamed,
+            int(inputs["num_ques"]), settings.MCQ_CHUNK_SIZE, "mcq"
+        )
     except Exception as e:
-        print(f"[ERROR] generate_mcqs failed: {str(e)}")
+        logger.exception("[MCQ GEN] MCQ generation failed: %s", e)
         return []
 
 
+async def agenerate_mcqs(topic: str, num_ques: int, difficulty: str):
+    """
+    generate_mcqs for async views: awaits the chain instead of blocking.
+    """
+    async def agenerate(count: int, fresh: bool):
+        inputs = {
+            "topic": topic,
+            "num_ques": count,
+            "difficulty": difficulty
+        }
+        model_name = await sync_to_async(route_model, thread_sensitive=False)("mcq", difficulty, count)
+        if fresh:
+            return await _agenerate_mcqs(inputs, model_name)
+        return await acached_generation(
+            "mcq", inputs, prompt_mcq, get_llm(model_name), lambda: _agenerate_mcqs(inputs, model_name),
+            similar_topics=True
+        )
+
+    return await afill_from_bank("mcq", topic, difficulty, num_ques, agenerate)
+
+
+async def _agenerate_mcqs(inputs: dict, model_name: str):
+    async def arun_batch(chunks):
+        batch = chunk_inputs(inputs, "num_ques", chunks)
+        configs = [{**batch_config(), **_run_config(chunk, model_name)} for chunk in batch]
+        results = await mcq_chain.abatch(batch, config=configs, return_exceptions=True)
+        return [r if isinstance(r, Exception) else _mcqs_from_result(r) for r in results]
+
+    try:
+        return await afan_out(arun_batch, int(inputs["num_ques"]), settings.MCQ_CHUNK_SIZE, "mcq")
+    except Exception as e:
+        logger.exception("[MCQ GEN] MCQ generation failed: %s", e)
+        return []
+
 
 
-from fpdf import FPDF
 
 def generate_styled_mcq_pdf(mcqs: list, title: str) -> bytes:
     try:
-        pdf = FPDF()
+        pdf = LayoutPDF()
         pdf.add_page()
         pdf.set_auto_page_break(auto=True, margin=15)
 
@@ -130,5 +258,5 @@ def generate_styled_mcq_pdf(mcqs: list, title: str) -> bytes:
         return pdf_str.encode("latin-1")
 
     except Exception as e:
-        print(f"[ERROR] PDF generation failed: {str(e)}")
+        logger.exception("[ERROR] PDF generation failed: %s", e)
         raise
@@ -0,0 +1,327 @@
+import bisect
+import collections
+import logging
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+import redis
+from django.conf import settings
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
+
+from .redis_client import get_redis, make_key
+
+logger = logging.getLogger(__name__)
+
+# ===========================
+#  HISTOGRAMS IN REDIS
+# ===========================
+# Every process (web and each Celery worker) increments the same Redis
+# hashes, so /metrics reports totals across the whole deployment.
+# One hash per metric; fields are "<label values>|<bucket>", "|sum", "|count".
+# Buckets hold plain (non-cumulative) counts; render() accumulates them.
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+# difficulty (MCQ/quiz), depth (tutorial) and summary type share one label.
+# They come from form input, so anything else is folded into "other" to
+# keep the number of series bounded.
+KNOWN_LEVELS = {"easy", "medium", "hard", "short", "detailed", "bullet", "full"}
+# Tutorial depth reaches the generator as the prompt's "1"/"2"/"3"; it is
+# labelled with the name the tutorial form uses
+TUTORIAL_DEPTHS = {"1": "short", "2": "medium", "3": "full"}
+
+
+def level_label(value) -> str:
+    """
+    The one vocabulary for levels, shared by metric labels, the rate
+    limiter's estimates and the model router.
+    """
+    if value is None or value == "":
+        return ""
+    value = str(value).strip().lower()
+    value = TUTORIAL_DEPTHS.get(value, value)
+    return value if value in KNOWN_LEVELS else "other"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.key = make_key("metrics", name)
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        record([(self, value, labels)])
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _stage(self, pipe, value: float, labels: dict):
+        series = "|".join(str(labels.get(name) or "").replace("|", "_") for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        bucket = str(self.buckets[index]) if index < len(self.buckets) else "+Inf"
+        pipe.hincrby(self.key, f"{series}|{bucket}", 1)
+        pipe.hincrby(self.key, f"{series}|count", 1)
+        pipe.hincrbyfloat(self.key, f"{series}|sum", value)
+
+    def render(self, fields: dict) -> list:
+        series = {}
+        for field, raw in fields.items():
+            name, _, suffix = field.decode().rpartition("|")
+            series.setdefault(name, {})[suffix] = raw.decode()
+
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for name in sorted(series):
+            values = series[name]
+            pairs = [f'{label}="{_escape(v)}"'
+                     for label, v in zip(self.labels, name.split("|"))]
+            cumulative = 0
+            for bucket in (*map(str, self.buckets), "+Inf"):
+                cumulative += int(values.get(bucket, 0))
+                le = ",".join(pairs + [f'le="{bucket}"'])
+                lines.append(f"{self.name}_bucket{{{le}}} {cumulative}")
+            label_str = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}_sum{label_str} {values.get('sum', '0')}")
+            lines.append(f"{self.name}_count{label_str} {values.get('count', '0')}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.key = make_key("metrics", name)
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        record([(self, amount, labels)])
+
+    def _stage(self, pipe, value: float, labels: dict):
+        series = "|".join(str(labels.get(name) or "").replace("|", "_") for name in self.labels)
+        pipe.hincrbyfloat(self.key, series, value)
+
+    def render(self, fields: dict) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for field in sorted(fields):
+            pairs = [f'{label}="{_escape(v)}"'
+                     for label, v in zip(self.labels, field.decode().split("|"))]
+            label_str = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}{label_str} {fields[field].decode()}")
+        return lines
+
+
+REGISTRY = []
+
+
+def record(observations):
+    """
+    Write several (metric, value, labels) observations in one round trip.
+    Metrics are best effort: a Redis failure is logged and ignored.
+    """
+    if not settings.METRICS_ENABLED or not observations:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for histogram, value, labels in observations:
+            histogram._stage(pipe, value, labels)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.debug("[METRICS] Write failed: %s", e)
+
+
+def render_metrics() -> str:
+    """
+    All registered metrics in the Prometheus text exposition format.
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    for histogram in REGISTRY:
+        pipe.hgetall(histogram.key)
+    lines = []
+    for histogram, fields in zip(REGISTRY, pipe.execute()):
+        lines.extend(histogram.render(fields))
+    return "\n".join(lines) + "\n"
+
+
+LLM_LABELS = ("generator", "model", "level")
+
+QUEUE_WAIT = Histogram(
+    "examprep_queue_wait_seconds", "Time from task publish until a worker starts it.",
+    ("generator",), LATENCY_BUCKETS,
+)
+LLM_TTFT = Histogram(
+    "examprep_llm_ttft_seconds", "Time to the first token of a streamed LLM call.",
+    LLM_LABELS, LATENCY_BUCKETS,
+)
+LLM_DURATION = Histogram(
+    "examprep_llm_duration_seconds", "Total duration of one LLM call.",
+    LLM_LABELS, LATENCY_BUCKETS,
+)
+LLM_PROMPT_TOKENS = Histogram(
+    "examprep_llm_prompt_tokens", "Prompt tokens per LLM call.",
+    LLM_LABELS, TOKEN_BUCKETS,
+)
+LLM_COMPLETION_TOKENS = Histogram(
+    "examprep_llm_completion_tokens", "Completion tokens per LLM call.",
+    LLM_LABELS, TOKEN_BUCKETS,
+)
+PARSE_SECONDS = Histogram(
+    "examprep_parse_seconds", "Time spent parsing LLM output into questions.",
+    ("generator", "level"), FAST_BUCKETS,
+)
+RATE_LIMIT_WAIT = Histogram(
+    "examprep_llm_rate_limit_wait_seconds", "Time an LLM call queued for the shared Groq budget.",
+    ("model",), (0,) + LATENCY_BUCKETS,
+)
+LLM_HEDGES = Counter(
+    "examprep_llm_hedge_calls_total",
+    "Calls to hedged models by outcome: not_hedged, primary_won or backup_won.",
+    ("model", "backup_model", "outcome"),
+)
+LLM_HEDGE_LATENCY = Histogram(
+    "examprep_llm_hedge_latency_seconds",
+    "Latency of hedged-model calls by outcome, until the winning response was complete.",
+    ("model", "outcome"), LATENCY_BUCKETS,
+)
+LLM_ROUTES = Counter(
+    "examprep_llm_routes_total",
+    "Model routing decisions by generator, level, chosen model and reason.",
+    ("generator", "level", "model", "reason"),
+)
+PDF_RENDER_SECONDS = Histogram(
+    "examprep_pdf_render_seconds", "Time to render a PDF download.",
+    ("generator",), FAST_BUCKETS + (2.5, 5, 10),
+)
+
+
+# ===========================
+#  LLM CALLS
+# ===========================
+def run_labels(generator: str, level=None, size: int = None) -> dict:
+    """
+    Runnable config naming the generator and level of a chain run, plus the
+    number of items requested. LLMMetricsHandler and timed_parser label
+    their observations with it; the rate limiter estimates token cost from it.
+    """
+    metadata = {"generator": generator, "level": level_label(level)}
+    if size is not None:
+        metadata["size"] = int(size)
+    return {"metadata": metadata}
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Callback handler attached to every shared LLM client: records TTFT
+    (streamed calls only), total call time and token usage.
+    """
+
+    def __init__(self):
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        labels = {
+            "generator": metadata.get("generator", ""),
+            "model": metadata.get("ls_model_name", ""),
+            "level": metadata.get("level", ""),
+        }
+        with self._lock:
+            self._runs[run_id] = [time.perf_counter(), None, labels]
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if not token:
+            return
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None and run[1] is None:
+                run[1] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        start, first_token, labels = run
+        observations = [(LLM_DURATION, time.perf_counter() - start, labels)]
+        if first_token is not None:
+            observations.append((LLM_TTFT, first_token - start, labels))
+
+        prompt_tokens, completion_tokens = _token_usage(response)
+        if completion_tokens:
+            observe_speed(labels["model"], time.perf_counter() - start, completion_tokens)
+        if prompt_tokens is not None:
+            observations.append((LLM_PROMPT_TOKENS, prompt_tokens, labels))
+        if completion_tokens is not None:
+            observations.append((LLM_COMPLETION_TOKENS, completion_tokens, labels))
+        record(observations)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+
+def _token_usage(response):
+    # Streamed calls carry usage on the message; invoke() also reports it
+    # in llm_output["token_usage"]
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens"), usage.get("output_tokens")
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+
+llm_metrics = LLMMetricsHandler()
+
+
+# Recent seconds per completion token of each model in this process; the
+# model router compares expected latency with it
+_speeds = collections.defaultdict(lambda: collections.deque(maxlen=100))
+_speeds_lock = threading.Lock()
+MIN_SPEED_SAMPLES = 10
+
+
+def observe_speed(model_name: str, seconds: float, completion_tokens: int):
+    if model_name and completion_tokens:
+        with _speeds_lock:
+            _speeds[model_name].append(seconds / completion_tokens)
+
+
+def seconds_per_token(model_name: str):
+    """Median over recent calls, or None until MIN_SPEED_SAMPLES calls."""
+    with _speeds_lock:
+        samples = list(_speeds[model_name])
+    if len(samples) < MIN_SPEED_SAMPLES:
+        return None
+    return statistics.median(samples)
+
+
+def timed_parser(parser, generator: str):
+    """
+    Wrap an output parser so each parse is recorded in PARSE_SECONDS,
+    labelled with the level from the run's run_labels().
+    """
+    def parse(output, config):
+        level = (config.get("metadata") or {}).get("level", "")
+        with PARSE_SECONDS.time(generator=generator, level=level):
+            return parser.invoke(output)
+
+    return RunnableLambda(parse, name=f"{generator}_parser")
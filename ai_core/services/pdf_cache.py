@@ -0,0 +1,138 @@
+import hashlib
+import inspect
+import json
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from . import document_tree, pdf_engine
+from .cache import SingleFlight, _record
+from .metrics import PDF_RENDER_SECONDS
+from .redis_client import get_redis, make_key
+
+logger = logging.getLogger(__name__)
+
+# ===========================
+#  RENDERED PDF CACHE
+# ===========================
+# Rendered PDFs are stored in Redis under a hash of the renderer's
+# version and its arguments (content and title), so identical downloads,
+# from any user, render once. Entries carry no TTL; instead the cache is
+# an LRU bounded to PDF_CACHE_MAX_MB: a sorted set orders entries by last
+# access and a hash tracks their sizes, and storing an entry evicts the
+# least recently used ones until the total fits.
+INDEX_KEY = make_key("pdf", "lru")
+SIZES_KEY = make_key("pdf", "sizes")
+TOTAL_FIELD = "__total__"
+
+_STORE = """
+local size = string.len(ARGV[3])
+local old = tonumber(redis.call('HGET', KEYS[2], KEYS[3])) or 0
+redis.call('SET', KEYS[3], ARGV[3])
+redis.call('ZADD', KEYS[1], ARGV[1], KEYS[3])
+redis.call('HSET', KEYS[2], KEYS[3], size)
+local total = redis.call('HINCRBY', KEYS[2], ARGV[4], size - old)
+local evicted = 0
+while total > tonumber(ARGV[2]) do
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0)[1]
+    if not oldest or oldest == KEYS[3] then
+        break
+    end
+    redis.call('ZREM', KEYS[1], oldest)
+    redis.call('DEL', oldest)
+    total = redis.call('HINCRBY', KEYS[2], ARGV[4], -(tonumber(redis.call('HGET', KEYS[2], oldest)) or 0))
+    redis.call('HDEL', KEYS[2], oldest)
+    evicted = evicted + 1
+end
+return evicted
+"""
+
+_store_scripts = {}
+_renderer_versions = {}
+_flights = SingleFlight()
+
+
+def renderer_version(render) -> str:
+    """
+    Short hash of the source of the module defining `render` (the render
+    function and its PDF class), of the shared layout engine and of the
+    document tree parser. Editing any of them changes the version, so
+    stale PDFs are never served.
+    """
+    module = inspect.getmodule(render)
+    if module not in _renderer_versions:
+        source = (inspect.getsource(module) + inspect.getsource(pdf_engine)
+                  + inspect.getsource(document_tree))
+        _renderer_versions[module] = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+    return _renderer_versions[module]
+
+
+def pdf_digest(generator: str, render, *args) -> str:
+    payload = {
+        "generator": generator,
+        "renderer": renderer_version(render),
+        "optimize": settings.PDF_OPTIMIZE,
+        "args": args,
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def pdf_etag(digest: str) -> str:
+    return f'"{digest[:32]}"'
+
+
+def _store(key: str, pdf_bytes: bytes):
+    client = get_redis()
+    script = _store_scripts.get(id(client))
+    if script is None:
+        script = _store_scripts[id(client)] = client.register_script(_STORE)
+    evicted = script(
+        keys=[INDEX_KEY, SIZES_KEY, key],
+        args=[time.time(), settings.PDF_CACHE_MAX_MB * 1024 * 1024, pdf_bytes, TOTAL_FIELD],
+    )
+    if evicted:
+        logger.info("[PDF CACHE] Evicted %d least recently used PDFs", evicted)
+
+
+def _load(key: str):
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.get(key)
+    pipe.zadd(INDEX_KEY, {key: time.time()}, xx=True)
+    return pipe.execute()[0]
+
+
+def _render(generator: str, key: str, render, args) -> bytes:
+    try:
+        pdf_bytes = _load(key)
+    except redis.RedisError as e:
+        logger.warning("[PDF CACHE] Redis unavailable on read: %s", e)
+        pdf_bytes = None
+    if pdf_bytes is not None:
+        _record(f"pdf_{generator}", "hit")
+        return pdf_bytes
+
+    _record(f"pdf_{generator}", "miss")
+    with PDF_RENDER_SECONDS.time(generator=generator):
+        pdf_bytes = render(*args)
+    try:
+        _store(key, pdf_bytes)
+    except redis.RedisError as e:
+        logger.warning("[PDF CACHE] Redis unavailable on write: %s", e)
+    return pdf_bytes
+
+
+def cached_pdf(generator: str, render, *args, digest: str = None) -> bytes:
+    """
+    `render(*args)`, served from the PDF cache when possible. Concurrent
+    requests for the same PDF in this process share one render.
+    """
+    if not settings.PDF_CACHE_ENABLED:
+        with PDF_RENDER_SECONDS.time(generator=generator):
+            return render(*args)
+    digest = digest or pdf_digest(generator, render, *args)
+    key = make_key("pdf", generator, digest)
+    return _flights.do(key, lambda: _render(generator, key, render, args))
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import random
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+
+from .metrics import KNOWN_LEVELS, level_label
+from .topic_index import canonicalize_topic
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(kind: str, item: dict) -> str:
+    """
+    Identity of a question: its kind, normalized text and options.
+    The same question generated twice is only stored once.
+    """
+    options = item.get("options") or []
+    if isinstance(options, dict):
+        options = [f"{k}. {v}" for k, v in sorted(options.items())]
+    payload = {
+        "kind": kind,
+        "question": " ".join(str(item.get("question", "")).casefold().split()),
+        "options": [" ".join(str(o).casefold().split()) for o in options],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _difficulty_key(difficulty) -> str:
+    """
+    The difficulty questions are banked under ("Hard " is "hard"), or ""
+    for a level outside KNOWN_LEVELS: those are neither stored nor served.
+    """
+    label = level_label(difficulty)
+    return label if label in KNOWN_LEVELS else ""
+
+
+def _to_item(kind: str, question) -> dict:
+    item = {
+        "question": question.question,
+        "options": question.options,
+        "answer": question.answer,
+    }
+    if kind == question.KIND_QUIZ:
+        item["explanation"] = question.explanation
+        item["improvement"] = question.improvement
+    return item
+
+
+def sample_questions(kind: str, topic: str, difficulty: str, count: int) -> list:
+    """
+    Up to `count` distinct stored questions for this topic and difficulty,
+    in random order. Returns [] if the bank is disabled or unreachable.
+    """
+    from ai_core.models import Question
+
+    difficulty = _difficulty_key(difficulty)
+    if not settings.QUESTION_BANK_ENABLED or count <= 0 or not difficulty:
+        return []
+
+    try:
+        ids = list(
+            Question.objects.filter(
+                kind=kind,
+                topic_key=canonicalize_topic(topic),
+                difficulty=difficulty,
+            ).values_list("id", flat=True)
+        )
+        if not ids:
+            return []
+
+        chosen = random.sample(ids, min(count, len(ids)))
+        by_id = Question.objects.in_bulk(chosen)
+        return [_to_item(kind, by_id[i]) for i in chosen if i in by_id]
+
+    except DatabaseError as e:
+        logger.warning("[QUESTION BANK] Sampling failed: %s", e)
+        return []
+
+
+def store_questions(kind: str, topic: str, difficulty: str, items: list):
+    """
+    Add freshly generated questions to the bank; duplicates are skipped.
+    """
+    from ai_core.models import Question
+
+    difficulty = _difficulty_key(difficulty)
+    if not settings.QUESTION_BANK_ENABLED or not items or not difficulty:
+        return
+
+    topic_key = canonicalize_topic(topic)
+    rows = [
+        Question(
+            kind=kind,
+            topic=topic[:255],
+            topic_key=topic_key[:255],
+            difficulty=difficulty,
+            question=item.get("question", ""),
+            options=item.get("options", []),
+            answer=str(item.get("answer", ""))[:8],
+            explanation=item.get("explanation", ""),
+            improvement=item.get("improvement", ""),
+            content_hash=content_hash(kind, item),
+        )
+        for item in items
+        if isinstance(item, dict) and item.get("question")
+    ]
+
+    try:
+        Question.objects.bulk_create(rows, ignore_conflicts=True)
+    except DatabaseError as e:
+        logger.warning("[QUESTION BANK] Storing %d questions failed: %s", len(rows), e)
+
+
+def _merge_generated(kind: str, banked: list, generated: list, count: int) -> list:
+    seen = {content_hash(kind, q) for q in banked}
+    for item in generated:
+        if len(banked) >= count:
+            break
+        if not isinstance(item, dict):
+            continue
+        item_hash = content_hash(kind, item)
+        if item_hash not in seen:
+            seen.add(item_hash)
+            banked.append(item)
+    return banked
+
+
+def fill_from_bank(kind: str, topic: str, difficulty: str, count: int, generate,
+                   on_banked=None) -> list:
+    """
+    Serve `count` questions: first from the bank, then `generate(shortfall, fresh)`
+    for whatever is missing. `fresh` is True when banked questions were used,
+    meaning the caller must not return cached output (it would repeat them).
+    New questions are stored for future requests. `on_banked`, if given,
+    receives the banked questions before generation starts.
+    """
+    banked = sample_questions(kind, topic, difficulty, count)
+    if banked and on_banked is not None:
+        on_banked(list(banked))
+    shortfall = count - len(banked)
+    logger.info("[QUESTION BANK] %s '%s' (%s): %d banked, %d to generate",
+                kind, topic, difficulty, len(banked), shortfall)
+    if shortfall <= 0:
+        return banked
+
+    generated = generate(shortfall, bool(banked)) or []
+    store_questions(kind, topic, difficulty, generated)
+    return _merge_generated(kind, banked, generated, count)
+
+
+async def afill_from_bank(kind: str, topic: str, difficulty: str, count: int, agenerate) -> list:
+    """
+    fill_from_bank for async views: `agenerate(shortfall, fresh)` is awaited.
+    """
+    banked = await sync_to_async(sample_questions)(kind, topic, difficulty, count)
+    shortfall = count - len(banked)
+    logger.info("[QUESTION BANK] %s '%s' (%s): %d banked, %d to generate",
+                kind, topic, difficulty, len(banked), shortfall)
+    if shortfall <= 0:
+        return banked
+
+    generated = await agenerate(shortfall, bool(banked)) or []
+    await sync_to_async(store_questions)(kind, topic, difficulty, generated)
+    return _merge_generated(kind, banked, generated, count)
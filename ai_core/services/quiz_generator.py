@@ -1,12 +1,22 @@
+from django.conf import settings
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from typing import List, Dict
-from .llm_config import llm,llm3
+from asgiref.sync import sync_to_async
+from .llm_config import MODEL_70B, get_llm, model_config, routable_llm, route_model
+from .cache import cached_generation, acached_generation
+from .question_bank import fill_from_bank, afill_from_bank
+from .fanout import fan_out, afan_out, batch_config, chunk_inputs, run_concurrently
+from .metrics import PARSE_SECONDS, level_label, run_labels
+import logging
 import re
+import time
+
+logger = logging.getLogger(__name__)
 
 # === Prompt Template ===
 quiz_prompt_template = PromptTemplate(
-    input_variables=["topic", "num_questions", "difficulty"],
+    input_variables=["topic", "num_questions", "difficulty", "focus"],
     template="""
 You are an expert technical quiz generator.
 
@@ -64,10 +74,13 @@ The "Area of Improvement" MUST be written in TWO bullet points:
 
 If you output a generic phrase like "review the topic", "study more", or similar,
 the response will be considered INVALID.
-
+{focus}
 """
 )
 
+# 70B unless the router picks 8B for a request (see route_model)
+llm = routable_llm(MODEL_70B)
+
 parser = StrOutputParser()
 quiz_chain = quiz_prompt_template | llm | parser
 
@@ -79,147 +92,284 @@ def parse_quiz_response(response: str) -> List[Dict]:
     blocks = response.strip().split("Q:")
     
     for block_idx, block in enumerate(blocks[1:], 1):  # Skip first empty block
-        try:
-            lines = [line.strip() for line in block.strip().splitlines() if line.strip()]
-            if not lines:
+        quiz_item = _parse_block_safely(block, block_idx)
+        if quiz_item:
+            quiz.append(quiz_item)
+
+    return quiz
+
+
+def _parse_block_safely(block: str, block_idx: int):
+    try:
+        return parse_quiz_block(block, block_idx)
+    except Exception as e:
+        logger.exception("[PARSE] Failed to parse quiz block %d: %s", block_idx, e)
+        return None
+
+
+# One precompiled classifier per line. Option lines are case-sensitive
+# ("A. ..."), field labels are not ("answer: b").
+_LINE_RE = re.compile(
+    r"(?P<option>[ABCD])[.):\s]+(?P<option_text>.+)"
+    r"|(?i:answer)\s*[:.\-]?\s*(?P<answer>(?i:[ABCD]))?"
+    r"|(?i:explanation)\s*[:.\-]?\s*(?P<explanation>.*)"
+    r"|(?i:area of improvement)\s*[:.\-]?\s*(?P<improvement>.*)"
+)
+
+_GENERIC_IMPROVEMENTS = frozenset({
+    "review the topic",
+    "review the topic thoroughly",
+    "study more",
+    "practice more",
+    "read more",
+    "learn more",
+    "review this topic",
+    "study this topic",
+    "practice this",
+    "review",
+    "study",
+    "practice",
+    "learn",
+    "read",
+})
+
+# Used when the model gives no usable Area of Improvement: first keyword
+# found in the question wins
+_FALLBACK_IMPROVEMENTS = (
+    (("python",), "Review Python fundamentals and syntax"),
+    (("sql", "database"), "Study database concepts and SQL queries"),
+    (("javascript", "js"), "Review JavaScript core concepts"),
+    (("algorithm",), "Practice algorithm design and analysis"),
+    (("data structure",), "Study data structures implementation"),
+    (("network", "osi"), "Review networking fundamentals"),
+    (("java",), "Study Java programming concepts"),
+)
+DEFAULT_IMPROVEMENT = "Study the fundamental concepts related to this question"
+DEFAULT_EXPLANATION = "The correct answer provides the most accurate solution."
+
+
+def _fallback_improvement(question: str) -> str:
+    question_lower = question.lower()
+    for keywords, improvement in _FALLBACK_IMPROVEMENTS:
+        if any(k in question_lower for k in keywords):
+            return improvement
+    return DEFAULT_IMPROVEMENT
+
+
+def parse_quiz_block(block: str, block_idx: int = 1):
+    """
+    Parse the text after one "Q:" marker into a quiz item, or None if a
+    field is missing.
+
+    Single pass over the lines, each classified once by _LINE_RE. The
+    explanation runs from its label to the Area of Improvement label; the
+    improvement runs to the end of the block.
+    """
+    question = None
+    options = {}
+    answer = ""
+    answer_pending = False
+    explanation_parts = None
+    improvement_parts = None
+    in_explanation = False
+
+    for line in block.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if question is None:
+            question = line
+            continue
+
+        if answer_pending:
+            # "Answer:" with the letter on the next line
+            answer_pending = False
+            if line[0].upper() in "ABCD":
+                answer = line[0].upper()
+
+        match = _LINE_RE.match(line)
+        kind = None
+        if match is not None:
+            if match.group("option"):
+                kind = "option"
+                options[match.group("option")] = match.group("option_text").strip()
+            elif match.group("explanation") is not None:
+                kind = "explanation"
+            elif match.group("improvement") is not None:
+                kind = "improvement"
+            elif not answer:
+                if match.group("answer"):
+                    answer = match.group("answer").upper()
+                elif match.end() == len(line):
+                    answer_pending = True
+
+        if kind == "explanation" and explanation_parts is None:
+            explanation_parts = [match.group("explanation")]
+            in_explanation = True
+            if improvement_parts is not None:
+                improvement_parts.append(line)
+            continue
+        if kind == "improvement":
+            in_explanation = False
+            if improvement_parts is None:
+                improvement_parts = [match.group("improvement")]
                 continue
-                
-            print(f"\n[PARSE BLOCK {block_idx}] Processing block with {len(lines)} lines")
-            
-            question = lines[0].strip()
-            options = {}
-
-            # Extract options A–D
-            for line in lines[1:]:
-                match = re.match(r"^([ABCD])[\.\):\s]+(.+)", line)
-                if match:
-                    key, val = match.groups()
-                    options[key] = val.strip()
-
-            answer = ""
-            explanation = ""
-            improvement = ""
-
-            # More robust extraction using full text parsing
-            full_text = "\n".join(lines)
-            
-            # Extract Answer
-            answer_match = re.search(r"answer\s*[:.\-]?\s*([ABCD])", full_text, re.IGNORECASE)
-            if answer_match:
-                answer = answer_match.group(1).upper()
-            
-            # Extract Explanation (everything between "Explanation:" and "Area of Improvement:")
-            explanation_match = re.search(
-                r"explanation\s*[:.\-]?\s*(.+?)(?=area of improvement|$)",
-                full_text,
-                re.IGNORECASE | re.DOTALL
-            )
-            if explanation_match:
-                explanation = explanation_match.group(1).strip()
-                # Clean up any newlines
-                explanation = " ".join(explanation.split())
-            
-            # Extract Area of Improvement (everything after "Area of Improvement:")
-            improvement_match = re.search(
-                r"area of improvement\s*[:.\-]?\s*(.+?)$",
-                full_text,
-                re.IGNORECASE | re.DOTALL
-            )
-            if improvement_match:
-                improvement = improvement_match.group(1).strip()
-                # Clean up any newlines
-                improvement = " ".join(improvement.split())
-                
-                # FIXED: Only reject if the improvement is TOO GENERIC or TOO SHORT
-                # Check if improvement is EXACTLY a generic phrase (not just containing the words)
-                exact_generic_phrases = [
-                    "review the topic",
-                    "review the topic thoroughly",
-                    "study more",
-                    "practice more",
-                    "read more",
-                    "learn more",
-                    "review this topic",
-                    "study this topic",
-                    "practice this"
-                ]
-                
-                improvement_lower = improvement.lower().strip()
-                
-                # Reject if:
-                # 1. It's exactly a generic phrase, OR
-                # 2. It's too short (less than 15 characters), OR
-                # 3. It's just "review" or "study" or "practice" alone
-                is_too_generic = (
-                    improvement_lower in exact_generic_phrases or
-                    len(improvement) < 15 or
-                    improvement_lower in ["review", "study", "practice", "learn", "read"]
-                )
-                
-                if is_too_generic:
-                    print(f"[WARNING] Generic/short improvement detected: '{improvement}'")
-                    improvement = ""  # Reset to trigger fallback
-                else:
-                    print(f"[VALID] Accepted improvement: '{improvement}'")
-
-            # Debug print
-            print(f"[PARSE] Question: {question[:60]}...")
-            print(f"[PARSE] Options: {list(options.keys())}")
-            print(f"[PARSE] Answer: '{answer}'")
-            print(f"[PARSE] Explanation: '{explanation[:80]}...'" if explanation else "[PARSE] Explanation: NOT FOUND")
-            print(f"[PARSE] Improvement: '{improvement[:80]}...'" if improvement else "[PARSE] Improvement: NOT FOUND")
-
-            # Generate fallback improvement based on question content if not found
-            if not improvement:
-                # Try to extract topic from question
-                question_lower = question.lower()
-                topic_lower = "{topic}".lower() if "{topic}" else ""
-                
-                if "python" in question_lower or "python" in topic_lower:
-                    improvement = "Review Python fundamentals and syntax"
-                elif "sql" in question_lower or "database" in question_lower:
-                    improvement = "Study database concepts and SQL queries"
-                elif "javascript" in question_lower or "js" in question_lower:
-                    improvement = "Review JavaScript core concepts"
-                elif "algorithm" in question_lower:
-                    improvement = "Practice algorithm design and analysis"
-                elif "data structure" in question_lower:
-                    improvement = "Study data structures implementation"
-                elif "network" in question_lower or "osi" in question_lower:
-                    improvement = "Review networking fundamentals"
-                elif "java" in question_lower:
-                    improvement = "Study Java programming concepts"
-                else:
-                    # Last resort fallback
-                    improvement = "Study the fundamental concepts related to this question"
-                
-                print(f"[FALLBACK] Generated improvement: '{improvement}'")
-
-            # Only add if we have all required fields
-            if question and len(options) == 4 and answer:
-                quiz_item = {
-                    "question": question,
-                    "options": options,
-                    "answer": answer,
-                    "explanation": explanation if explanation else "The correct answer provides the most accurate solution.",
-                    "improvement": improvement
-                }
+
+        if in_explanation:
+            explanation_parts.append(line)
+        if improvement_parts is not None:
+            improvement_parts.append(line)
+
+    if question is None:
+        return None
+    if not (len(options) == 4 and answer):
+        logger.info("[PARSE] Skipped question %d - missing fields", block_idx)
+        return None
+
+    explanation = " ".join(" ".join(explanation_parts).split()) if explanation_parts else ""
+    improvement = " ".join(" ".join(improvement_parts).split()) if improvement_parts else ""
+
+    if improvement and (len(improvement) < 15 or improvement.lower() in _GENERIC_IMPROVEMENTS):
+        logger.debug("[PARSE] Q%d generic improvement replaced: %r", block_idx, improvement)
+        improvement = ""
+    if not improvement:
+        improvement = _fallback_improvement(question)
+
+    logger.debug("[PARSE] Q%d answer=%s: %.60s", block_idx, answer, question)
+    return {
+        "question": question,
+        "options": options,
+        "answer": answer,
+        "explanation": explanation or DEFAULT_EXPLANATION,
+        "improvement": improvement,
+    }
+
+
+class QuizBlockStream:
+    """
+    Splits a streamed quiz response into "Q:" blocks as it arrives.
+    A block is complete once the next "Q:" marker appears (or the stream
+    ends), so each question is parsed while later ones are still being
+    generated. Blocks are exactly those parse_quiz_response would see.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._started = False
+        self._block_idx = 0
+
+    def feed(self, text: str) -> List[Dict]:
+        self._buffer += text
+        parts = self._buffer.split("Q:")
+        if len(parts) == 1:
+            return []
+
+        first, rest = parts[0], parts[1:]
+        complete = ([first] if self._started else []) + rest[:-1]
+        self._started = True
+        self._buffer = rest[-1]
+        return self._parse(complete)
+
+    def close(self) -> List[Dict]:
+        if not self._started:
+            return []
+        block, self._buffer = self._buffer, ""
+        return self._parse([block])
+
+    def _parse(self, blocks) -> List[Dict]:
+        quiz = []
+        for block in blocks:
+            self._block_idx += 1
+            quiz_item = _parse_block_safely(block, self._block_idx)
+            if quiz_item:
                 quiz.append(quiz_item)
-                print(f"[PARSE] ✓ Added question {block_idx}")
-            else:
-                print(f"[PARSE] ✗ Skipped question {block_idx} - Missing fields")
-
-        except Exception as e:
-            print(f"[ERROR] Failed to parse quiz block {block_idx}: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            continue
+        return quiz
 
+
+def _stream_quiz(inputs: dict, model_name: str, on_questions) -> List[Dict]:
+    """
+    Generate one chunk as a stream, handing each question to `on_questions`
+    as soon as its block is complete. If the stream breaks off, the
+    questions completed before that point are kept.
+    """
+    blocks = QuizBlockStream()
+    quiz = []
+    parse_time = 0.0
+    try:
+        for text in quiz_chain.stream(inputs, config=_run_config(inputs, model_name)):
+            start = time.perf_counter()
+            completed = blocks.feed(text)
+            parse_time += time.perf_counter() - start
+            if completed:
+                quiz.extend(completed)
+                on_questions(completed)
+    except Exception:
+        PARSE_SECONDS.observe(parse_time, generator="quiz", level=level_label(inputs["difficulty"]))
+        if not quiz:
+            raise
+        logger.warning("[QUIZ GEN] Stream broke off after %d questions", len(quiz), exc_info=True)
+        return quiz
+
+    start = time.perf_counter()
+    completed = blocks.close()
+    parse_time += time.perf_counter() - start
+    PARSE_SECONDS.observe(parse_time, generator="quiz", level=level_label(inputs["difficulty"]))
+    if completed:
+        quiz.extend(completed)
+        on_questions(completed)
     return quiz
 
 
+def _run_config(inputs: dict, model_name: str) -> dict:
+    return {
+        **run_labels("quiz", inputs["difficulty"], size=inputs["num_questions"]),
+        **model_config(model_name),
+    }
+
+
+def _timed_parse(response: str, difficulty: str) -> List[Dict]:
+    with PARSE_SECONDS.time(generator="quiz", level=level_label(difficulty)):
+        return parse_quiz_response(response)
+
+
+def _run_quiz_chain(inputs: dict, model_name: str, on_questions=None) -> List[Dict]:
+    """
+    Large quizzes are split into chunks generated concurrently, then merged,
+    deduplicated and topped up to the requested number.
+    """
+    def run_batch(chunks):
+        batch = chunk_inputs(inputs, "num_questions", chunks)
+        configs = [{**batch_config(), **_run_config(chunk, model_name)} for chunk in batch]
+        responses = quiz_chain.batch(batch, config=configs, return_exceptions=True)
+        for response in responses:
+            if not isinstance(response, Exception):
+                logger.debug("[QUIZ GEN] LLM response received - length: %d chars", len(response))
+        return [r if isinstance(r, Exception) else _timed_parse(r, inputs["difficulty"])
+                for r in responses]
+
+    def run_streamed(chunks):
+        batch = chunk_inputs(inputs, "num_questions", chunks)
+        return run_concurrently(lambda chunk: _stream_quiz(chunk, model_name, on_questions), batch)
+
+    return fan_out(
+        run_batch if on_questions is None else run_streamed,
+        int(inputs["num_questions"]), settings.QUIZ_CHUNK_SIZE, "quiz"
+    )
+
+
+async def _arun_quiz_chain(inputs: dict, model_name: str) -> List[Dict]:
+    async def arun_batch(chunks):
+        batch = chunk_inputs(inputs, "num_questions", chunks)
+        configs = [{**batch_config(), **_run_config(chunk, model_name)} for chunk in batch]
+        responses = await quiz_chain.abatch(batch, config=configs, return_exceptions=True)
+        return [r if isinstance(r, Exception) else _timed_parse(r, inputs["difficulty"])
+                for r in responses]
+
+    return await afan_out(arun_batch, int(inputs["num_questions"]), settings.QUIZ_CHUNK_SIZE, "quiz")
+
+
 # === Quiz Generator ===
-def generate_quiz(topic: str, num_questions: int, difficulty: str) -> List[Dict]:
+def generate_quiz(topic: str, num_questions: int, difficulty: str, on_questions=None) -> List[Dict]:
     """
     Generate quiz questions using LLM.
     
@@ -227,40 +377,74 @@ def generate_quiz(topic: str, num_questions: int, difficulty: str) -> List[Dict]
         topic: Quiz topic
         num_questions: Number of questions
         difficulty: 'easy', 'medium', or 'hard'
+        on_questions: Optional callback receiving questions as they become
+            available (banked and cached ones at once, generated ones
+            block by block)
     
     Returns:
         List of quiz question dictionaries
     """
     try:
-        print(f"\n[QUIZ GEN] Starting quiz generation")
-        print(f"[QUIZ GEN] Topic: {topic}")
-        print(f"[QUIZ GEN] Questions: {num_questions}")
-        print(f"[QUIZ GEN] Difficulty: {difficulty}")
-        
-        response = quiz_chain.invoke({
-            "topic": topic,
-            "num_questions": num_questions,
-            "difficulty": difficulty
-        })
-        
-        print(f"\n[QUIZ GEN] LLM response received - length: {len(response)} chars")
-        print(f"[QUIZ GEN] First 1000 chars of response:\n{response[:1000]}\n")
-        
-        quiz = parse_quiz_response(response)
-        print(f"\n[QUIZ GEN] ✓ Successfully parsed {len(quiz)} questions")
-        
-        # Print final structure
-        for idx, q in enumerate(quiz, 1):
-            print(f"\n[FINAL Q{idx}]")
-            print(f"  - Question: {q['question'][:50]}...")
-            print(f"  - Answer: {q['answer']}")
-            print(f"  - Explanation: {q['explanation'][:50]}...")
-            print(f"  - Improvement: {q['improvement']}")
-        
+        logger.info("[QUIZ GEN] Starting quiz generation: %r, %d questions, %s",
+                    topic, num_questions, difficulty)
+
+        def generate(count: int, fresh: bool):
+            inputs = {
+                "topic": topic,
+                "num_questions": count,
+                "difficulty": difficulty
+            }
+            model_name = route_model("quiz", difficulty, count)
+            computed = []
+
+            def compute():
+                computed.append(True)
+                return _run_quiz_chain(inputs, model_name, on_questions)
+
+            if fresh:
+                return compute()
+            quiz = cached_generation(
+                "quiz", inputs, quiz_prompt_template, get_llm(model_name), compute,
+                similar_topics=True
+            )
+            if on_questions is not None and not computed:
+                on_questions(quiz)
+            return quiz
+
+        quiz = fill_from_bank("quiz", topic, difficulty, num_questions, generate,
+                              on_banked=on_questions)
+        logger.info("[QUIZ GEN] Parsed %d questions", len(quiz))
         return quiz
         
     except Exception as e:
-        print(f"\n[ERROR] Quiz generation failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return []
\ No newline at end of file
+        logger.exception("[QUIZ GEN] Quiz generation failed: %s", e)
+        return []
+
+
+async def agenerate_quiz(topic: str, num_questions: int, difficulty: str) -> List[Dict]:
+    """
+    generate_quiz for async views: awaits the chain instead of blocking.
+    """
+    try:
+        async def agenerate(count: int, fresh: bool):
+            inputs = {
+                "topic": topic,
+                "num_questions": count,
+                "difficulty": difficulty
+            }
+            model_name = await sync_to_async(route_model, thread_sensitive=False)("quiz", difficulty, count)
+            if fresh:
+                return await _arun_quiz_chain(inputs, model_name)
+            return await acached_generation(
+                "quiz", inputs, quiz_prompt_template, get_llm(model_name),
+                lambda: _arun_quiz_chain(inputs, model_name),
+                similar_topics=True
+            )
+
+        quiz = await afill_from_bank("quiz", topic, difficulty, num_questions, agenerate)
+        logger.info("[QUIZ GEN] Parsed %d questions", len(quiz))
+        return quiz
+
+    except Exception as e:
+        logger.exception("[QUIZ GEN] Quiz generation failed: %s", e)
+        return []
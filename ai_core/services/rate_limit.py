@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import time
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .metrics import RATE_LIMIT_WAIT, level_label
+from .redis_client import get_redis, make_key
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """The shared LLM budget is booked further ahead than LLM_RATE_MAX_WAIT."""
+
+
+# ===========================
+#  SHARED TOKEN BUCKETS
+# ===========================
+# One requests bucket and one tokens bucket per model, in Redis, so every
+# web and worker process draws on the same Groq account budget.
+#
+# A caller always books its cost, even when the bucket cannot cover it:
+# the balance goes negative and the caller sleeps until refill brings it
+# back to zero. Bookings are made in the order they reach Redis, so calls
+# are served first come, first served and a large request cannot be
+# starved by a stream of small ones.
+_RESERVE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local costs = {1, tonumber(ARGV[5])}
+local balances = {}
+local wait = 0
+for i = 1, 2 do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local capacity = tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - costs[i]
+    balances[i] = tokens
+    if tokens < 0 then
+        wait = math.max(wait, -tokens / rate)
+    end
+end
+if wait > tonumber(ARGV[6]) then
+    return {0, tostring(wait)}
+end
+for i = 1, 2 do
+    redis.call('HSET', KEYS[i], 'tokens', tostring(balances[i]), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[i], 3600)
+end
+return {1, tostring(wait)}
+"""
+
+# Return (or charge) the difference between the estimated and the actual
+# token count once a call has finished.
+_SETTLE = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    tokens = math.min(tonumber(ARGV[2]), tokens + tonumber(ARGV[1]))
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens))
+end
+return 1
+"""
+
+_scripts = {}
+
+
+def _script(source: str):
+    client = get_redis()
+    script = _scripts.get((id(client), source))
+    if script is None:
+        script = _scripts[(id(client), source)] = client.register_script(source)
+    return script
+
+
+def _bucket_keys(model_name: str):
+    return make_key("ratelimit", model_name, "rpm"), make_key("ratelimit", model_name, "tpm")
+
+
+def _buckets(model_name: str):
+    """(rate per second, capacity) of the requests and tokens buckets, or None."""
+    if not settings.LLM_RATE_LIMIT_ENABLED:
+        return None
+    limits = settings.LLM_RATE_LIMITS.get(model_name)
+    if not limits:
+        return None
+    burst = settings.LLM_RATE_BURST_SECONDS
+    rpm, tpm = limits["rpm"] / 60, limits["tpm"] / 60
+    return (rpm, max(1.0, rpm * burst)), (tpm, tpm * burst)
+
+
+# ===========================
+#  TOKEN ESTIMATES
+# ===========================
+# Completion size follows from what was asked for: tokens per question for
+# MCQs and quizzes, a length per depth or summary type otherwise. Calls are
+# settled against the real usage afterwards, so estimates only need to be
+# in the right range.
+CHARS_PER_TOKEN = 4
+TOKENS_PER_ITEM = {"mcq": 90, "quiz": 220}
+# Keyed by level_label(): tutorial depth "1"/"2"/"3" is short/medium/full
+TOKENS_PER_LEVEL = {
+    "tutorial": {"short": 4000, "medium": 7000, "full": 10000},
+    "summary": {"short": 400, "bullet": 600, "detailed": 1200},
+}
+TOKENS_PER_CALL = {"summary_map": 500}
+DEFAULT_COMPLETION_TOKENS = 1500
+
+
+def expected_completion_tokens(generator: str, level=None, size: int = None) -> int:
+    if generator in TOKENS_PER_CALL:
+        return TOKENS_PER_CALL[generator]
+    if generator in TOKENS_PER_ITEM and size:
+        return TOKENS_PER_ITEM[generator] * int(size)
+    if generator in TOKENS_PER_LEVEL:
+        return TOKENS_PER_LEVEL[generator].get(level_label(level), DEFAULT_COMPLETION_TOKENS)
+    return DEFAULT_COMPLETION_TOKENS
+
+
+def estimate_tokens(messages, metadata: dict = None) -> int:
+    """
+    Prompt tokens from the message text plus the expected completion,
+    using the generator, level and size set by metrics.run_labels().
+    """
+    metadata = metadata or {}
+    prompt_chars = sum(len(str(m.content)) for m in messages)
+    completion = expected_completion_tokens(
+        metadata.get("generator"), metadata.get("level"), metadata.get("size")
+    )
+    return prompt_chars // CHARS_PER_TOKEN + completion
+
+
+# ===========================
+#  ACQUIRE / SETTLE
+# ===========================
+def reserve(model_name: str, tokens: int) -> float:
+    """
+    Book one request and `tokens` tokens; returns how long to wait before
+    sending. Fails open (no wait) when Redis is unavailable.
+    """
+    buckets = _buckets(model_name)
+    if buckets is None:
+        return 0.0
+    (rpm_rate, rpm_cap), (tpm_rate, tpm_cap) = buckets
+    try:
+        booked, wait = _script(_RESERVE)(
+            keys=_bucket_keys(model_name),
+            args=[rpm_rate, rpm_cap, tpm_rate, tpm_cap, tokens, settings.LLM_RATE_MAX_WAIT],
+        )
+    except redis.RedisError as e:
+        logger.warning("[RATE LIMIT] Reserve failed for %s: %s", model_name, e)
+        return 0.0
+    wait = float(wait)
+    if not int(booked):
+        raise RateLimitExceeded(
+            f"{model_name}: budget booked {wait:.0f}s ahead (limit {settings.LLM_RATE_MAX_WAIT:.0f}s)"
+        )
+    return wait
+
+
+def _book(model_name: str, tokens: int) -> float:
+    wait = reserve(model_name, tokens)
+    RATE_LIMIT_WAIT.observe(wait, model=model_name)
+    if wait > 0:
+        logger.debug("[RATE LIMIT] %s: waiting %.2fs for %d tokens", model_name, wait, tokens)
+    return wait
+
+
+def acquire(model_name: str, tokens: int, on_wait=None):
+    """
+    Block until the call fits the shared budget. `on_wait`, if given, is
+    told the wait before it starts.
+    """
+    wait = _book(model_name, tokens)
+    if on_wait is not None:
+        on_wait(wait)
+    if wait > 0:
+        time.sleep(wait)
+
+
+async def aacquire(model_name: str, tokens: int, on_wait=None):
+    wait = await sync_to_async(_book, thread_sensitive=False)(model_name, tokens)
+    if on_wait is not None:
+        on_wait(wait)
+    if wait > 0:
+        await asyncio.sleep(wait)
+
+
+def settle(model_name: str, estimated: int, actual: int):
+    buckets = _buckets(model_name)
+    if buckets is None or actual is None or actual == estimated:
+        return
+    _, tpm_key = _bucket_keys(model_name)
+    try:
+        _script(_SETTLE)(keys=[tpm_key], args=[estimated - actual, buckets[1][1]])
+    except redis.RedisError as e:
+        logger.warning("[RATE LIMIT] Settle failed for %s: %s", model_name, e)
+
+
+def budget_status() -> dict:
+    """
+    Current balance of every configured model's buckets. A negative
+    balance is budget already booked by queued calls; backlog_seconds is
+    how long a new call would wait.
+    """
+    client = get_redis()
+    seconds, microseconds = client.time()
+    now = seconds + microseconds / 1_000_000
+    status = {}
+    for model_name, limits in settings.LLM_RATE_LIMITS.items():
+        buckets = _buckets(model_name)
+        if buckets is None:
+            continue
+        status[model_name] = {}
+        for name, key, (rate, capacity) in zip(("rpm", "tpm"), _bucket_keys(model_name), buckets):
+            tokens, ts = client.hmget(key, "tokens", "ts")
+            balance = capacity if tokens is None else min(
+                capacity, float(tokens) + max(0.0, now - float(ts)) * rate
+            )
+            status[model_name][name] = {
+                "limit": limits[name],
+                "available": round(balance, 1),
+                "capacity": round(capacity, 1),
+                "backlog_seconds": round(max(0.0, -balance / rate), 2),
+            }
+    return status
@@ -0,0 +1,47 @@
+import asyncio
+import weakref
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+KEY_PREFIX = "examprep"
+
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis() -> redis.Redis:
+    """
+    Shared Redis client for the web process and Celery workers.
+    The connection pool is created lazily on first use.
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=2,
+            socket_timeout=5,
+        )
+    return _client
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """
+    asyncio Redis client for async views. Connections belong to the event
+    loop that opened them, so each running loop gets its own client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = redis.asyncio.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=2,
+            socket_timeout=5,
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def make_key(*parts) -> str:
+    return ":".join([KEY_PREFIX, *[str(p) for p in parts]])
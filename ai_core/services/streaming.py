@@ -0,0 +1,217 @@
+import json
+import logging
+import time
+
+import redis
+from asgiref.sync import sync_to_async
+from celery import states
+from celery.result import AsyncResult
+
+from .redis_client import get_redis, get_async_redis, make_key
+
+logger = logging.getLogger(__name__)
+
+STREAM_TTL = 60 * 60
+KEEPALIVE_SECONDS = 15
+MAX_STREAM_SECONDS = 30 * 60
+
+# Tokens arrive every few milliseconds; publishing each one separately
+# costs two Redis round trips per token. Chunks are coalesced until this
+# much time has passed or this many characters are buffered.
+FLUSH_INTERVAL = 0.05
+FLUSH_CHARS = 256
+
+# A client attached to a task that has no stream (an unknown or expired id,
+# or a task that finished without streaming) is told so with a `done`
+# error instead of being held until MAX_STREAM_SECONDS. The task state is
+# checked every STATE_CHECK_SECONDS until the stream shows activity.
+# Celery reports unknown ids as PENDING, like queued tasks, so a PENDING
+# task whose stream stays silent for PENDING_STREAM_SECONDS is given up too.
+STATE_CHECK_SECONDS = 5
+PENDING_STREAM_SECONDS = 5 * 60
+
+
+def _keys(task_id: str):
+    return (
+        make_key("stream", task_id, "chunks"),
+        make_key("stream", task_id, "done"),
+        make_key("stream", task_id, "channel"),
+    )
+
+
+class StreamPublisher:
+    """
+    Publishes generated text for one task.
+
+    Every chunk is appended to a Redis list (so late or reconnecting
+    clients can replay from any offset) and announced on a pub/sub
+    channel (so connected clients get it immediately).
+    """
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.chunks_key, self.done_key, self.channel = _keys(task_id)
+        self._buffer = []
+        self._buffered_chars = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, text: str):
+        if not text:
+            return
+        self._buffer.append(text)
+        self._buffered_chars += len(text)
+        if (self._buffered_chars >= FLUSH_CHARS
+                or time.monotonic() - self._last_flush >= FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer, self._buffered_chars = [], 0
+        self._last_flush = time.monotonic()
+        try:
+            r = get_redis()
+            index = r.rpush(self.chunks_key, text) - 1
+            pipe = r.pipeline()
+            pipe.expire(self.chunks_key, STREAM_TTL)
+            pipe.publish(self.channel, json.dumps({"i": index, "text": text}))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("[STREAM] Publish failed for %s: %s", self.task_id, e)
+
+    def status(self, message: str):
+        try:
+            get_redis().publish(self.channel, json.dumps({"status": message}))
+        except redis.RedisError as e:
+            logger.warning("[STREAM] Status publish failed for %s: %s", self.task_id, e)
+
+    def finish(self, error: str = None):
+        self.flush()
+        payload = {"done": True, "error": error}
+        try:
+            pipe = get_redis().pipeline()
+            pipe.set(self.done_key, json.dumps(payload), ex=STREAM_TTL)
+            pipe.publish(self.channel, json.dumps(payload))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("[STREAM] Finish failed for %s: %s", self.task_id, e)
+
+
+def stream_text(chain, inputs: dict, on_chunk, config: dict = None) -> str:
+    """
+    Run `chain` with .stream(), handing every chunk to `on_chunk`.
+    Returns the full text, exactly as .invoke() would have.
+    """
+    parts = []
+    for chunk in chain.stream(inputs, config=config):
+        parts.append(chunk)
+        on_chunk(chunk)
+    return "".join(parts)
+
+
+# ===========================
+#  SERVER-SENT EVENTS
+# ===========================
+def _sse(data: dict, event: str = None, event_id=None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _task_state(task_id: str) -> str:
+    return AsyncResult(task_id).state
+
+
+async def _missing_stream_error(task_id: str, waited: float):
+    """
+    Why a task with no stream yet will never get one, or None while one may
+    still start.
+    """
+    state = await sync_to_async(_task_state)(task_id)
+    if state in states.READY_STATES:
+        return "no stream for this task"
+    if state == states.PENDING and waited >= PENDING_STREAM_SECONDS:
+        return "stream not found"
+    return None
+
+
+async def sse_events(task_id: str, offset: int = 0):
+    """
+    Yield SSE frames for a task's text stream, starting at chunk `offset`.
+
+    Subscribes before reading the backlog so nothing published in between
+    is lost; chunks are deduplicated by index. Each chunk's index is its
+    event id, so EventSource resumes via Last-Event-ID on reconnect. A task
+    with no stream ends with a `done` event carrying an error.
+    """
+    chunks_key, done_key, channel = _keys(task_id)
+    r = get_async_redis()
+    pubsub = r.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(channel)
+    next_index = max(0, offset)
+
+    try:
+        for text in await r.lrange(chunks_key, next_index, -1):
+            yield _sse({"text": text.decode("utf-8")}, event_id=next_index)
+            next_index += 1
+
+        done = await r.get(done_key)
+        if done is not None:
+            yield _sse(json.loads(done), event="done")
+            return
+
+        active = bool(await r.exists(chunks_key))
+        started = last_sent = time.monotonic()
+        last_check = None
+        while time.monotonic() - started < MAX_STREAM_SECONDS:
+            message = await pubsub.get_message(timeout=1.0)
+            if message is None:
+                if not active and (last_check is None or time.monotonic() - last_check >= STATE_CHECK_SECONDS):
+                    last_check = time.monotonic()
+                    error = await _missing_stream_error(task_id, last_check - started)
+                    # A stream finished since the backlog read has its done
+                    # message waiting in the subscription
+                    if error is not None and not await r.exists(done_key):
+                        yield _sse({"done": True, "error": error}, event="done")
+                        return
+                if time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+                    last_sent = time.monotonic()
+                    yield ": keepalive\n\n"
+                continue
+
+            data = json.loads(message["data"])
+            last_sent = time.monotonic()
+            active = True
+
+            if data.get("done"):
+                # Catch anything flushed between the backlog read and now
+                for text in await r.lrange(chunks_key, next_index, -1):
+                    yield _sse({"text": text.decode("utf-8")}, event_id=next_index)
+                    next_index += 1
+                yield _sse(data, event="done")
+                return
+
+            if "status" in data:
+                yield _sse(data, event="status")
+                continue
+
+            if data["i"] < next_index:
+                continue
+            if data["i"] > next_index:
+                # Missed messages: replay the gap from the list
+                for text in await r.lrange(chunks_key, next_index, data["i"] - 1):
+                    yield _sse({"text": text.decode("utf-8")}, event_id=next_index)
+                    next_index += 1
+            yield _sse({"text": data["text"]}, event_id=next_index)
+            next_index += 1
+
+    except redis.RedisError as e:
+        logger.warning("[STREAM] SSE relay failed for %s: %s", task_id, e)
+        yield _sse({"done": True, "error": "stream unavailable"}, event="done")
+    finally:
+        await pubsub.aclose()
@@ -1,9 +1,23 @@
+import hashlib
+import logging
 import os
+import re
+from django.conf import settings
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from asgiref.sync import sync_to_async
+from .llm_config import MODEL_70B, MODEL_8B, get_llm, model_config, routable_llm, route_model
+from .cache import cached_generation, acached_generation, cached_map, acached_map, cached_value
+from .streaming import stream_text
+from .metrics import run_labels
+from .fanout import batch_config
+from .rate_limit import CHARS_PER_TOKEN
+from .document_tree import document_tree
+from .pdf_engine import ExamPrepPDF, sanitize_text
 
-from fpdf import FPDF
-from .llm_config import llm, llm2,llm3
+logger = logging.getLogger(__name__)
 
 
 
@@ -144,175 +158,281 @@ prompt_summary = PromptTemplate(
     ),
 )
 
+# -------------------------------
+#  2b) CHUNK NOTES PROMPT (LONG DOCUMENTS)
+# -------------------------------
+
+prompt_chunk_notes = PromptTemplate(
+    input_variables=["chunk", "context"],
+    template=(
+        "You are taking revision notes on a long document, one part at a time.\n\n"
+        "End of the previous part, for context only (may be empty):\n"
+        "{context}\n\n"
+        "Part text:\n"
+        "{chunk}\n\n"
+        "Write compact notes on this part only:\n"
+        "1. Key concepts and definitions\n"
+        "2. Important subtopics, steps or components\n"
+        "3. Use cases, examples, formulas and facts worth keeping\n\n"
+        "Use plain numbered lines, no markdown, no introduction or conclusion.\n"
+        "Keep every fact from the text that a student would need; drop repetition.\n"
+    ),
+)
+
 # -------------------------------
 #  3) CHAINS
 # -------------------------------
 parser = StrOutputParser()
-explanation_chain = prompt_explanation | llm | parser
-summary_chain = prompt_summary | llm3 | parser
+explanation_llm = get_llm(MODEL_70B)
+explanation_chain = prompt_explanation | explanation_llm | parser
+summary_chain = prompt_summary | routable_llm(MODEL_8B) | parser
+chunk_notes_llm = get_llm(MODEL_8B)
+chunk_notes_chain = prompt_chunk_notes | chunk_notes_llm | parser
+
+
+# The explanation of a topic does not depend on summary type or tone, so
+# it is cached per topic on its own: every summary variant of a topic
+# reuses it, and tutorials on the topic are grounded in it. Lookups are
+# by exact topic only: an explanation of a merely similar topic ("World
+# War I" for "World War II") would ground the tutorial in the wrong facts.
+def generate_explanation(topic: str) -> str:
+    """
+    The explanation of `topic`, generated once and cached. Concurrent
+    requests for the same topic share one generation.
+    """
+    inputs = {"topic": topic}
+    return cached_generation(
+        "explanation", inputs, prompt_explanation, explanation_llm,
+        lambda: explanation_chain.invoke(inputs, config=run_labels("explanation")),
+        single_flight=True
+    )
 
-from io import BytesIO
-from fpdf import FPDF
-import re
 
+def cached_explanation(topic: str):
+    """The cached explanation of `topic`, or None."""
+    return cached_value("explanation", {"topic": topic}, prompt_explanation, explanation_llm)
+
+
+# -------------------------------
+#  4) LONG DOCUMENTS (MAP-REDUCE)
+# -------------------------------
+# Text estimated above SUMMARY_MAP_REDUCE_TOKENS is split into chunks,
+# each chunk is condensed into notes by the 8B model in parallel (map),
+# and the joined notes go through summary_chain like any other text
+# (reduce), which gives them the usual section structure. Notes still
+# too long for one prompt are condensed again.
+#
+# Chunk notes are cached by the chunk's own text, so a re-submitted
+# document with a few edits only pays for the chunks that changed. For
+# that, chunk boundaries are content-defined: the text is cut into
+# paragraphs, and whether a chunk ends after a paragraph depends only on
+# that paragraph's hash (and the chunk size limits), never on its
+# position. An edit moves at most the boundaries next to it.
+MAX_CONDENSE_ROUNDS = 3
 
-def strip_markdown(text: str) -> str:
-    """
-    Remove all markdown symbols from text.
-    """
-    text = re.sub(r'^###\s*', '', text)
-    text = re.sub(r'^##\s*', '', text)
-    text = re.sub(r'^#\s*', '', text)
-    text = text.replace('**', '')
-    text = text.replace('__', '')
-    text = text.replace('*', '')
-    text = text.replace('_', '')
-    return text.strip()
 
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
 
-def sanitize_text(text: str) -> str:
+
+def needs_map_reduce(text: str) -> bool:
+    return estimate_tokens(text) > settings.SUMMARY_MAP_REDUCE_TOKENS
+
+
+def _pieces(text: str, max_chars: int):
+    """Paragraphs, with paragraphs over `max_chars` split further."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=max_chars, chunk_overlap=0)
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if len(paragraph) > max_chars:
+            yield from splitter.split_text(paragraph)
+        elif paragraph:
+            yield paragraph
+
+
+def _ends_chunk(piece: str, mean_chars: int) -> bool:
+    # True with probability len(piece) / mean_chars, decided by the hash
+    digest = hashlib.blake2b(piece.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < len(piece) / mean_chars
+
+
+def split_document(text: str) -> list:
+    """
+    Content-defined chunks of about SUMMARY_CHUNK_TOKENS: dicts of the
+    chunk text and, as context, the last SUMMARY_CHUNK_OVERLAP_TOKENS of
+    the chunk before it.
+    """
+    target = settings.SUMMARY_CHUNK_TOKENS * CHARS_PER_TOKEN
+    min_chars, max_chars = target // 4, target * 2
+    bodies, current, size = [], [], 0
+    for piece in _pieces(text, target // 4):
+        if current and size + len(piece) > max_chars:
+            bodies.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+        if size >= min_chars and _ends_chunk(piece, target - min_chars):
+            bodies.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        bodies.append("\n\n".join(current))
+
+    overlap = settings.SUMMARY_CHUNK_OVERLAP_TOKENS * CHARS_PER_TOKEN
+    return [
+        {"chunk": body, "context": bodies[i - 1][-overlap:] if i and overlap else ""}
+        for i, body in enumerate(bodies)
+    ]
+
+
+def _chunk_key(item: dict) -> dict:
+    # Notes are keyed on the chunk alone: the context only helps the model
+    # read the start of the chunk, so a change before it does not count
+    return {"chunk": item["chunk"]}
+
+
+def _map_config(summary_type: str) -> dict:
+    return {**batch_config(), **run_labels("summary_map", summary_type)}
+
+
+def condense(text: str, summary_type: str) -> str:
     """
-    Convert Unicode text to FPDF-safe latin-1.
+    Map stage: `text` itself when it fits one prompt, otherwise the joined
+    per-chunk notes.
     """
-    replacements = {
-        "\u2013": "-",
-        "\u2014": "-",
-        "\u2018": "'",
-        "\u2019": "'",
-        "\u201c": '"',
-        "\u201d": '"',
-        "\u2022": "-",
-        "\xa0": " ",
+    def compute_many(chunks):
+        return chunk_notes_chain.batch(chunks, config=_map_config(summary_type))
+
+    for _ in range(MAX_CONDENSE_ROUNDS):
+        if not needs_map_reduce(text):
+            break
+        notes = cached_map(
+            "summary_map", split_document(text), prompt_chunk_notes, chunk_notes_llm,
+            compute_many, _chunk_key
+        )
+        text = "\n\n".join(notes)
+    return text
+
+
+async def acondense(text: str, summary_type: str) -> str:
+    async def acompute_many(chunks):
+        return await chunk_notes_chain.abatch(chunks, config=_map_config(summary_type))
+
+    for _ in range(MAX_CONDENSE_ROUNDS):
+        if not needs_map_reduce(text):
+            break
+        notes = await acached_map(
+            "summary_map", split_document(text), prompt_chunk_notes, chunk_notes_llm, acompute_many, _chunk_key
+        )
+        text = "\n\n".join(notes)
+    return text
+
+
+def generate_summary(sum_content: str, summary_type: str, tone_style: str, on_chunk=None) -> str:
+    """
+    Summarize `sum_content`, map-reducing long documents (see condense).
+    With `on_chunk`, the final summary is streamed to it.
+    """
+    inputs = {
+        "sum_content": sum_content,
+        "summary_type": summary_type,
+        "tone_style": tone_style
     }
+    model_name = route_model("summary", summary_type, len(sum_content.split()))
+    config = {**run_labels("summary", summary_type), **model_config(model_name)}
+    streamed = []
+
+    def compute():
+        chain_inputs = {**inputs, "sum_content": condense(sum_content, summary_type)}
+        if on_chunk is None:
+            return summary_chain.invoke(chain_inputs, config=config)
+        streamed.append(True)
+        return stream_text(summary_chain, chain_inputs, on_chunk, config=config)
+
+    text = cached_generation("summary", inputs, prompt_summary, get_llm(model_name), compute)
+    if on_chunk is not None and not streamed:
+        on_chunk(text)
+    return text
 
-    for k, v in replacements.items():
-        text = text.replace(k, v)
 
-    return text.encode("latin-1", "ignore").decode("latin-1")
+# -------------------------------
+#  5) INPUT MODE
+# -------------------------------
+# "topic": the input names a subject, which is explained first and the
+# explanation summarized. "text": the input is the material itself and
+# goes straight to the summary chain. "auto" treats a single line of at
+# most SUMMARY_TOPIC_MAX_WORDS words as a topic and anything else as text.
+SUMMARY_MODES = ("auto", "topic", "text")
+
+
+def resolve_summary_mode(content: str, mode: str = "auto") -> str:
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"Unknown summary mode {mode!r}, expected one of {SUMMARY_MODES}")
+    if mode != "auto":
+        return mode
+    content = content.strip()
+    if "\n" not in content and len(content.split()) <= settings.SUMMARY_TOPIC_MAX_WORDS:
+        return "topic"
+    return "text"
+
+
+def summarize(content: str, summary_type: str, tone_style: str, mode: str = "auto",
+              on_chunk=None, on_status=None) -> str:
+    """
+    Summarize `content` according to its input mode. `on_chunk` streams
+    the summary as in generate_summary(); `on_status` is told which stage
+    is running.
+    """
+    if resolve_summary_mode(content, mode) == "topic":
+        if on_status is not None:
+            on_status("Preparing explanation")
+        content = generate_explanation(content)
+    if on_status is not None:
+        on_status("Writing summary")
+    return generate_summary(content, summary_type, tone_style, on_chunk=on_chunk)
 
 
-class CustomPDF(FPDF):
+async def agenerate_summary(sum_content: str, summary_type: str, tone_style: str) -> str:
+    """
+    generate_summary for async views: awaits the chain instead of blocking.
+    """
+    inputs = {
+        "sum_content": sum_content,
+        "summary_type": summary_type,
+        "tone_style": tone_style
+    }
+    model_name = await sync_to_async(route_model, thread_sensitive=False)(
+        "summary", summary_type, len(sum_content.split())
+    )
+    config = {**run_labels("summary", summary_type), **model_config(model_name)}
+
+    async def acompute():
+        chain_inputs = {**inputs, "sum_content": await acondense(sum_content, summary_type)}
+        return await summary_chain.ainvoke(chain_inputs, config=config)
+
+    return await acached_generation(
+        "summary", inputs, prompt_summary, get_llm(model_name), acompute
+    )
+
+# ===========================
+#  SUMMARY PDF
+# ===========================
+class CustomPDF(ExamPrepPDF):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.topic_title = ""
-        self.first_page = True
-
-    def header(self):
-        if self.page_no() == 1 and self.first_page:
-            self.set_fill_color(255, 153, 51)
-            self.set_text_color(255, 255, 255)
-            self.set_font("helvetica", "B", 11)
-            self.cell(0, 12, "EXAMPREP DOST", ln=True, align="C", fill=True)
-            self.ln(2)
-            self.first_page = False
-        elif self.page_no() > 1:
-            self.set_font("helvetica", "I", 9)
-            self.set_text_color(120, 120, 120)
-            self.cell(0, 8, sanitize_text(self.topic_title), ln=True, align="L")
-            self.set_draw_color(200, 200, 200)
-            self.line(10, self.get_y(), 200, self.get_y())
-            self.ln(4)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("helvetica", "I", 8)
-        self.set_text_color(150, 150, 150)
-        self.cell(0, 10, f"Page {self.page_no()}", align="C")
+
+    def running_title(self) -> str:
+        return self.topic_title
 
     def draw_title_block(self, topic: str):
-        self.set_font("helvetica", "B", 22)
-        self.set_text_color(30, 30, 30)
-        self.cell(0, 14, sanitize_text(topic.upper()), ln=True, align="C")
-        
-        self.set_font("helvetica", "", 11)
-        self.set_text_color(100, 100, 100)
-        self.cell(0, 6, "Quick Revision Notes", ln=True, align="C")
-        
-        self.set_draw_color(255, 153, 51)
-        self.set_line_width(0.6)
-        self.line(50, self.get_y() + 2, 160, self.get_y() + 2)
+        super().draw_title_block(topic, "Quick Revision Notes")
         self.ln(10)
 
-    def rounded_rect(self, x, y, w, h, r, style=''):
-        k = self.k
-        hp = self.h
-        if style == 'F':
-            op = 'f'
-        elif style == 'FD' or style == 'DF':
-            op = 'B'
-        else:
-            op = 'S'
-        
-        my_arc = 4/3 * (2**0.5 - 1)
-        self._out(f'{(x+r)*k:.2f} {(hp-y)*k:.2f} m')
-        
-        xc = x + w - r
-        yc = y + r
-        self._out(f'{xc*k:.2f} {(hp-y)*k:.2f} l')
-        self._arc(xc + r * my_arc, yc - r, xc + r, yc - r * my_arc, xc + r, yc)
-        
-        xc = x + w - r
-        yc = y + h - r
-        self._out(f'{(x+w)*k:.2f} {(hp-yc)*k:.2f} l')
-        self._arc(xc + r, yc + r * my_arc, xc + r * my_arc, yc + r, xc, yc + r)
-        
-        xc = x + r
-        yc = y + h - r
-        self._out(f'{xc*k:.2f} {(hp-(y+h))*k:.2f} l')
-        self._arc(xc - r * my_arc, yc + r, xc - r, yc + r * my_arc, xc - r, yc)
-        
-        xc = x + r
-        yc = y + r
-        self._out(f'{x*k:.2f} {(hp-yc)*k:.2f} l')
-        self._arc(xc - r, yc - r * my_arc, xc - r * my_arc, yc - r, xc, yc - r)
-        
-        self._out(op)
-    
-    def _arc(self, x1, y1, x2, y2, x3, y3):
-        h = self.h
-        self._out(f'{x1*self.k:.2f} {(h-y1)*self.k:.2f} {x2*self.k:.2f} {(h-y2)*self.k:.2f} {x3*self.k:.2f} {(h-y3)*self.k:.2f} c')
-
-    def draw_section_header(self, section_title: str):
-        if self.get_y() > 250:
-            self.add_page()
-        
-        self.ln(4)
-        
-        x = self.get_x()
-        y = self.get_y()
-        
-        self.set_fill_color(255, 153, 51)
-        self.rounded_rect(x, y, self.w - 2*x, 10, 2, 'F')
-        
-        self.set_text_color(255, 255, 255)
-        self.set_font("helvetica", "B", 12)
-        self.cell(0, 10, sanitize_text(f"  {section_title}  "), ln=True, align="L")
-        self.ln(3)
-
-    def draw_subheading(self, subheading: str):
-        self.ln(2)
-        
-        sanitized = sanitize_text(strip_markdown(subheading))
-        self.set_font("helvetica", "B", 11)
-        
-        nb_lines = len(self.multi_cell(0, 8, f"  {sanitized}", split_only=True))
-        cell_height = 8 * nb_lines
-        
-        x = self.get_x()
-        y = self.get_y()
-        
-        self.set_fill_color(245, 245, 245)
-        self.rounded_rect(x, y, self.w - 2*x, cell_height, 1.5, 'F')
-        
-        self.set_text_color(50, 50, 50)
-        self.multi_cell(0, 8, f"  {sanitized}")
-        self.ln(2)
-
     def write_content_line(self, text: str, indent: int = 0, is_numbered: bool = False):
         self.set_font("helvetica", "", 10)
         self.set_text_color(60, 60, 60)
         
-        clean_text = sanitize_text(strip_markdown(text))
+        clean_text = sanitize_text(text)
         
         left_margin = 10 + indent
         self.set_left_margin(left_margin)
@@ -322,62 +442,35 @@ class CustomPDF(FPDF):
 
 
 def generate_summary_pdf(summary_text: str, topic: str) -> bytes:
+    """
+    Render summary notes to PDF from their document tree (see document_tree)
+    """
     try:
-        pdf = CustomPDF()
-        pdf.topic_title = topic
-        pdf.add_page()
-        pdf.set_auto_page_break(auto=True, margin=20)
-
-        pdf.draw_title_block(topic)
-
-        lines = summary_text.strip().split("\n")
-        current_section = None
-        point_counter = 0
-        in_numbered_section = False
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            line_clean = strip_markdown(line)
-
-            if line_clean.endswith(":") and len(line_clean) > 3:
-                cleaned_title = line_clean[:-1].strip()
-                
-                if cleaned_title.replace(" ", "").isupper() and len(cleaned_title) > 8:
-                    current_section = cleaned_title
-                    pdf.draw_section_header(current_section)
-                    point_counter = 0
-                    
-                    in_numbered_section = any(keyword in current_section.lower() for keyword in 
-                        ["step", "stage", "phase", "process", "principle", "rule", "law", "type"])
-                    continue
-                
-                elif cleaned_title[0].isupper():
-                    pdf.draw_subheading(cleaned_title)
-                    continue
-
-            clean_line = line_clean.lstrip("-").lstrip("*").strip()
-            if not clean_line:
-                continue
-
-            if clean_line[0].isdigit() and len(clean_line) > 2 and clean_line[1:3] in ['. ', ') ']:
-                pdf.write_content_line(clean_line, indent=8, is_numbered=True)
-                continue
-
-            if in_numbered_section:
-                point_counter += 1
-                formatted_line = f"{point_counter}. {clean_line}"
-                pdf.write_content_line(formatted_line, indent=8, is_numbered=True)
-            else:
-                if ":" in clean_line and clean_line.index(":") < 40:
-                    pdf.write_content_line(f"• {clean_line}", indent=8)
-                else:
-                    pdf.write_content_line(f"• {clean_line}", indent=8)
-
-        return pdf.output(dest="S").encode("latin-1")
+        return render_summary_pdf(document_tree("summary", summary_text), topic)
 
     except Exception as e:
-        print(f"[ERROR] Summary PDF generation failed: {e}")
-        raise
\ No newline at end of file
+        logger.exception("[ERROR] Summary PDF generation failed: %s", e)
+        raise
+
+
+def render_summary_pdf(tree: dict, topic: str) -> bytes:
+    pdf = CustomPDF()
+    pdf.topic_title = topic
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=20)
+
+    pdf.draw_title_block(topic)
+
+    for section in tree["sections"]:
+        if section["title"] is not None:
+            pdf.draw_section_header(section["title"])
+
+        for block_type, text in section["blocks"]:
+            if block_type == "subheading":
+                pdf.draw_subheading(text)
+            elif block_type == "point":
+                pdf.write_content_line(text, indent=8, is_numbered=True)
+            else:
+                pdf.write_content_line(f"• {text}", indent=8)
+
+    return pdf.output(dest="S").encode("latin-1")
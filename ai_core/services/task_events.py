@@ -0,0 +1,215 @@
+import json
+import logging
+import threading
+import time
+
+import redis
+from asgiref.sync import sync_to_async
+from celery import states
+from celery.result import AsyncResult
+from django.conf import settings
+
+from .fanout import question_key
+from .redis_client import get_redis, get_async_redis, make_key
+from .streaming import PENDING_STREAM_SECONDS, STATE_CHECK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_SECONDS = 15
+MAX_SSE_SECONDS = 30 * 60
+
+# Partial results are reported at most this often per task
+PROGRESS_INTERVAL = 0.3
+
+
+def _keys(task_id: str):
+    return (
+        make_key("task", task_id, "result"),
+        make_key("task", task_id, "progress"),
+        make_key("task", task_id, "channel"),
+    )
+
+
+def publish_task_result(task_id: str, payload: dict):
+    """
+    Record a finished task's status payload in Redis and notify waiters.
+    The payload has the same shape task_status_view returns.
+    """
+    result_key, _, channel = _keys(task_id)
+    try:
+        data = json.dumps(payload, default=str)
+        pipe = get_redis().pipeline()
+        pipe.set(result_key, data, ex=settings.CELERY_RESULT_EXPIRES)
+        pipe.publish(channel, data)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("[TASK EVENTS] Publish failed for %s: %s", task_id, e)
+
+
+def publish_task_progress(task_id: str, meta: dict):
+    """
+    Record a running task's latest partial result and notify listeners.
+    """
+    _, progress_key, channel = _keys(task_id)
+    try:
+        data = json.dumps(meta, default=str)
+        pipe = get_redis().pipeline()
+        pipe.set(progress_key, data, ex=settings.CELERY_RESULT_EXPIRES)
+        pipe.publish(channel, json.dumps({"progress": meta}, default=str))
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("[TASK EVENTS] Progress publish failed for %s: %s", task_id, e)
+
+
+class TaskProgress:
+    """
+    Partial results of a running task.
+
+    add() collects items (deduplicated by question text, capped at
+    `total`) and reports them as Celery PROGRESS state, for task-status
+    pollers, and over Redis, for task-events listeners. Reports are
+    throttled to one per PROGRESS_INTERVAL. Safe to call from several
+    threads.
+
+    Create it on the task's own thread: Celery's request context is
+    thread-local, so the task id is captured here for the generator's
+    worker threads to report under.
+    """
+
+    def __init__(self, task, total: int):
+        self.task = task
+        self.task_id = task.request.id
+        self.total = total
+        self.items = []
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._last_report = 0.0
+
+    def add(self, items):
+        with self._lock:
+            for item in items or []:
+                if len(self.items) >= self.total:
+                    break
+                key = question_key(item)
+                if key and key not in self._seen:
+                    self._seen.add(key)
+                    self.items.append(item)
+
+            if time.monotonic() - self._last_report < PROGRESS_INTERVAL:
+                return
+            self._last_report = time.monotonic()
+            self._report({"items": list(self.items), "done": len(self.items), "total": self.total})
+
+    def _report(self, meta: dict):
+        if self.task_id is None:
+            # Created outside a worker (e.g. task.run() in a benchmark)
+            return
+        self.task.update_state(task_id=self.task_id, state="PROGRESS", meta=meta)
+        publish_task_progress(self.task_id, meta)
+
+
+def backend_task_status(task_id: str) -> dict:
+    """
+    The task's status payload, read from the Celery result backend.
+    """
+    result = AsyncResult(task_id)
+    if result.state == states.SUCCESS:
+        return {"ready": True, "successful": True, "result": result.result, "status": result.state}
+    if result.state == states.FAILURE:
+        return {"ready": True, "successful": False, "error": str(result.info), "status": result.state}
+    if result.state == "PROGRESS":
+        return {"ready": False, "successful": False, "progress": result.info, "status": result.state}
+    return {"ready": False, "successful": False, "status": result.state}
+
+
+async def wait_for_task(task_id: str, timeout: float):
+    """
+    Wait until the task finishes or `timeout` seconds pass, without holding
+    a thread. Returns the status payload, or None on timeout. Uses Redis only.
+    """
+    result_key, _, channel = _keys(task_id)
+    r = get_async_redis()
+    pubsub = r.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(channel)
+    try:
+        # Check after subscribing so a result published in between is not missed
+        raw = await r.get(result_key)
+        if raw is not None:
+            return json.loads(raw)
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            message = await pubsub.get_message(timeout=min(remaining, 1.0))
+            if message is None:
+                continue
+            data = json.loads(message["data"])
+            if "progress" not in data:
+                return data
+    finally:
+        await pubsub.aclose()
+
+
+async def sse_task_events(task_id: str):
+    """
+    SSE frames for a task: `progress` events with its partial result (if
+    it reports any), keepalive comments, then one `complete` event
+    carrying the status payload.
+
+    A task that finished without its result being published (a worker
+    without Redis, or an expired result key) is found in the result
+    backend, checked every STATE_CHECK_SECONDS of silence. An id that
+    stays PENDING, with no progress, for PENDING_STREAM_SECONDS is taken
+    to be unknown and given up.
+    """
+    result_key, progress_key, channel = _keys(task_id)
+    r = get_async_redis()
+    pubsub = r.pubsub(ignore_subscribe_messages=True)
+
+    try:
+        await pubsub.subscribe(channel)
+
+        raw = await r.get(result_key)
+        if raw is not None:
+            yield f"event: complete\ndata: {raw.decode('utf-8')}\n\n"
+            return
+        raw = await r.get(progress_key)
+        if raw is not None:
+            yield f"event: progress\ndata: {raw.decode('utf-8')}\n\n"
+
+        started = last_sent = last_progress = time.monotonic()
+        last_check = None
+        while time.monotonic() - started < MAX_SSE_SECONDS:
+            message = await pubsub.get_message(timeout=1.0)
+            if message is None:
+                if last_check is None or time.monotonic() - last_check >= STATE_CHECK_SECONDS:
+                    last_check = time.monotonic()
+                    data = await sync_to_async(backend_task_status)(task_id)
+                    if not data["ready"] and data["status"] == states.PENDING \
+                            and last_check - last_progress >= PENDING_STREAM_SECONDS:
+                        data = {"ready": True, "successful": False, "error": "task not found",
+                                "status": data["status"]}
+                    if data["ready"]:
+                        yield f"event: complete\ndata: {json.dumps(data, default=str)}\n\n"
+                        return
+                if time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+                    last_sent = time.monotonic()
+                    yield ": keepalive\n\n"
+                continue
+
+            last_sent = time.monotonic()
+            data = json.loads(message["data"])
+            if "progress" in data:
+                last_progress = last_sent
+                yield f"event: progress\ndata: {json.dumps(data['progress'])}\n\n"
+                continue
+            yield f"event: complete\ndata: {json.dumps(data)}\n\n"
+            return
+
+    except redis.RedisError as e:
+        logger.warning("[TASK EVENTS] SSE relay failed for %s: %s", task_id, e)
+        yield "event: unavailable\ndata: {}\n\n"
+    finally:
+        await pubsub.aclose()
@@ -0,0 +1,219 @@
+import logging
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+import redis
+from django.conf import settings
+
+from .redis_client import get_redis, make_key
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = make_key("topics", "log")
+STREAM_MAXLEN = 200_000
+
+NUM_PERM = 64
+# Narrow bands: topics are a handful of words, so two topics sharing two of
+# three words must still land in a common bucket
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+
+_MERSENNE = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, (1 << 31) - 1, size=(NUM_PERM, 1), dtype=np.uint64)
+_B = _rng.integers(0, (1 << 31) - 1, size=(NUM_PERM, 1), dtype=np.uint64)
+
+# Words that describe the *kind* of material rather than the subject.
+FILLER_WORDS = {
+    "a", "an", "the", "of", "to", "in", "on", "for", "and",
+    "basic", "basics", "intro", "introduction", "fundamental", "fundamentals",
+    "overview", "concept", "concepts", "tutorial", "guide",
+}
+
+# Words that look plural but are not ("physics" is not many "physic").
+SINGULAR_WORDS = {"series", "species", "news", "aids", "gas", "lens", "bias", "canvas"}
+
+# Words that flip the meaning of what follows ("non linear").
+NEGATION_WORDS = {"non", "not", "no", "un", "anti"}
+
+# Prefixes that negate a word they are fused to ("inorganic", "unsupervised").
+NEGATION_PREFIXES = ("non", "un", "in", "im", "il", "ir")
+
+_NON_WORD = re.compile(r"[^a-z0-9+#]+")
+_NUMERAL = re.compile(r"[0-9]|^(x{0,3})(ix|iv|v?i{0,3})$")
+
+
+# ===========================
+#  CANONICALIZATION
+# ===========================
+def _singular(word: str) -> str:
+    if len(word) <= 3 or word in SINGULAR_WORDS or word.endswith(("ss", "us", "is", "ics")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def canonical_words(topic: str) -> list:
+    words = _NON_WORD.sub(" ", topic.casefold()).split()
+    return [_singular(w) for w in words if w not in FILLER_WORDS]
+
+
+def canonicalize_topic(topic: str) -> str:
+    """
+    "Binary-Trees!" and "binary tree basics" both become "binary tree".
+    """
+    return " ".join(canonical_words(topic))
+
+
+# ===========================
+#  SIMILARITY
+# ===========================
+def _is_marker(word: str) -> bool:
+    return word in NEGATION_WORDS or bool(_NUMERAL.search(word))
+
+
+def _negates(word: str, words: frozenset) -> bool:
+    return any(
+        word.startswith(prefix) and word[len(prefix):] in words
+        for prefix in NEGATION_PREFIXES
+    )
+
+
+def topic_similarity(a: frozenset, b: frozenset) -> float:
+    """
+    Dice coefficient of two canonical word sets, or 0.0 when they differ
+    in a number ("World War I" / "World War II", "Python 2" / "Python 3")
+    or one negates a word of the other ("Organic" / "Inorganic Chemistry").
+    """
+    if not a or not b:
+        return 0.0
+    only_a, only_b = a - b, b - a
+    if any(_is_marker(w) for w in only_a | only_b):
+        return 0.0
+    if any(_negates(w, b) for w in only_a) or any(_negates(w, a) for w in only_b):
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+# ===========================
+#  MINHASH
+# ===========================
+def shingles(words: frozenset) -> np.ndarray:
+    return np.fromiter(
+        (zlib.crc32(w.encode("utf-8")) for w in words),
+        dtype=np.uint64,
+        count=len(words),
+    )
+
+
+def minhash(words: frozenset) -> np.ndarray:
+    hashed = (_A * shingles(words)[None, :] + _B) % _MERSENNE
+    return hashed.min(axis=1)
+
+
+class TopicIndex:
+    """
+    In-memory MinHash/LSH index of previously generated topics.
+
+    MinHash over canonical words only narrows the search to candidates;
+    each candidate is then scored exactly with topic_similarity.
+
+    Entries are grouped by namespace (generator plus every non-topic input),
+    so a 5-question easy MCQ is only ever matched against other 5-question
+    easy MCQs. The index lives in each worker and catches up from a Redis
+    stream, so every process sees topics generated anywhere.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._words = {}        # (namespace, topic) -> canonical word set
+        self._buckets = {}      # (namespace, band, band_bytes) -> set of topics
+        self._last_id = "0"
+        self._last_refresh = 0.0
+
+    def _insert(self, namespace: str, topic: str):
+        words = frozenset(canonical_words(topic))
+        if not words or (namespace, topic) in self._words:
+            return
+        self._words[(namespace, topic)] = words
+        signature = minhash(words)
+        for band in range(BANDS):
+            band_bytes = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+            self._buckets.setdefault((namespace, band, band_bytes), set()).add(topic)
+
+    def refresh(self, force: bool = False):
+        """
+        Apply topics appended to the Redis stream since the last refresh.
+        """
+        interval = settings.TOPIC_INDEX_REFRESH_SECONDS
+        if not force and time.monotonic() - self._last_refresh < interval:
+            return
+        self._last_refresh = time.monotonic()
+
+        try:
+            while True:
+                entries = get_redis().xrange(STREAM_KEY, min=f"({self._last_id}", count=1000)
+                if not entries:
+                    break
+                with self._lock:
+                    for entry_id, fields in entries:
+                        self._insert(fields[b"ns"].decode(), fields[b"topic"].decode())
+                        self._last_id = entry_id.decode()
+        except redis.RedisError as e:
+            logger.warning("[TOPIC INDEX] Redis unavailable on refresh: %s", e)
+
+    def add(self, namespace: str, topic: str):
+        with self._lock:
+            self._insert(namespace, topic)
+        try:
+            get_redis().xadd(
+                STREAM_KEY,
+                {"ns": namespace, "topic": topic},
+                maxlen=STREAM_MAXLEN,
+                approximate=True,
+            )
+        except redis.RedisError as e:
+            logger.warning("[TOPIC INDEX] Redis unavailable on add: %s", e)
+
+    def find_similar(self, namespace: str, topic: str, threshold: float = None):
+        """
+        Return (topic, similarity) for the closest known topic in the
+        namespace with topic_similarity >= threshold, or None.
+        """
+        if threshold is None:
+            threshold = settings.TOPIC_SIMILARITY_THRESHOLD
+
+        self.refresh()
+
+        words = frozenset(canonical_words(topic))
+        if not words:
+            return None
+        signature = minhash(words)
+
+        with self._lock:
+            candidates = set()
+            for band in range(BANDS):
+                band_bytes = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+                candidates |= self._buckets.get((namespace, band, band_bytes), set())
+            candidates.discard(topic)
+
+            best, best_score = None, 0.0
+            for candidate in candidates:
+                score = topic_similarity(self._words[(namespace, candidate)], words)
+                if score > best_score:
+                    best, best_score = candidate, score
+
+        if best is None or best_score < threshold:
+            return None
+        return best, best_score
+
+
+topic_index = TopicIndex()
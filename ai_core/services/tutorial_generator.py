@@ -1,13 +1,21 @@
+import logging
 from datetime import datetime
-from fpdf import FPDF
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from .llm_config import llm
-import re
+from asgiref.sync import sync_to_async
+from .llm_config import MODEL_70B, get_llm, model_config, routable_llm, route_model
+from .cache import cached_generation, acached_generation
+from .streaming import stream_text
+from .metrics import run_labels
+from .summary_generator import cached_explanation
+from .document_tree import document_tree
+from .pdf_engine import ExamPrepPDF, sanitize_text
+
+logger = logging.getLogger(__name__)
 
 
 prompt_tutorial = PromptTemplate(
-    input_variables=["topic", "depth"],
+    input_variables=["topic", "depth", "reference"],
     template=(
         "ROLE & CONTEXT\n"
         "You are a senior computer science professor, textbook author, and academic content architect.\n"
@@ -17,6 +25,13 @@ prompt_tutorial = PromptTemplate(
         "Generate a COMPLETE, SELF-CONTAINED, and PAGE-CONTROLLED tutorial on:\n"
         "'{topic}'.\n\n"
 
+        "====================================================\n"
+        "REFERENCE NOTES\n"
+        "====================================================\n"
+        "{reference}\n\n"
+        "Use the reference notes as grounding: keep definitions and facts consistent\n"
+        "with them, but go far beyond them. Ignore them if they are empty or off-topic.\n\n"
+
         "====================================================\n"
         "STRICT PAGE LENGTH & CONTENT VOLUME CONTROL\n"
         "====================================================\n"
@@ -158,124 +173,84 @@ prompt_tutorial = PromptTemplate(
 
 
 parser = StrOutputParser()
-tutorial_chain = prompt_tutorial | llm | parser
+tutorial_chain = prompt_tutorial | routable_llm(MODEL_70B) | parser
 
+# Longer explanations are cut here; the tutorial only needs their core
+REFERENCE_MAX_CHARS = 6000
 
-def sanitize_text(text: str) -> str:
+
+def _grounded(inputs: dict) -> dict:
     """
-    Convert Unicode text to FPDF-safe latin-1.
+    Chain inputs with the topic's cached explanation (see
+    summary_generator) as reference notes. The reference is not part of
+    the cache key: a tutorial is the same request with or without it.
     """
-    replacements = {
-        "\u2013": "-",
-        "\u2014": "-",
-        "\u2018": "'",
-        "\u2019": "'",
-        "\u201c": '"',
-        "\u201d": '"',
-        "\u2022": "-",
-        "\xa0": " ",
-    }
+    explanation = cached_explanation(inputs["topic"])
+    reference = explanation[:REFERENCE_MAX_CHARS] if explanation else "(none)"
+    return {**inputs, "reference": reference}
 
-    for k, v in replacements.items():
-        text = text.replace(k, v)
 
-    return text.encode("latin-1", "ignore").decode("latin-1")
+def generate_tutorial(topic: str, depth, on_chunk=None) -> str:
+    """
+    Generate tutorial text, served from the generation cache when possible.
+    With `on_chunk`, text is streamed to it as it is generated (a cached
+    tutorial arrives as one chunk).
+    """
+    inputs = {"topic": topic, "depth": str(depth)}
+    model_name = route_model("tutorial", depth)
+    config = {**run_labels("tutorial", depth), **model_config(model_name)}
+    streamed = []
+
+    def compute():
+        chain_inputs = _grounded(inputs)
+        if on_chunk is None:
+            return tutorial_chain.invoke(chain_inputs, config=config)
+        streamed.append(True)
+        return stream_text(tutorial_chain, chain_inputs, on_chunk, config=config)
+
+    text = cached_generation(
+        "tutorial", inputs, prompt_tutorial, get_llm(model_name), compute,
+        similar_topics=True
+    )
+    if on_chunk is not None and not streamed:
+        on_chunk(text)
+    return text
 
 
-def strip_markdown(text: str) -> str:
+async def agenerate_tutorial(topic: str, depth) -> str:
     """
-    Remove all markdown symbols from text.
+    generate_tutorial for async views: awaits the chain instead of blocking.
     """
-    text = re.sub(r'^###\s*', '', text)
-    text = re.sub(r'^##\s*', '', text)
-    text = re.sub(r'^#\s*', '', text)
-    text = text.replace('**', '')
-    text = text.replace('__', '')
-    text = text.replace('*', '')
-    text = text.replace('_', '')
-    return text.strip()
+    inputs = {"topic": topic, "depth": str(depth)}
+    model_name = await sync_to_async(route_model, thread_sensitive=False)("tutorial", depth)
+    config = {**run_labels("tutorial", depth), **model_config(model_name)}
 
+    async def acompute():
+        chain_inputs = await sync_to_async(_grounded, thread_sensitive=False)(inputs)
+        return await tutorial_chain.ainvoke(chain_inputs, config=config)
+
+    return await acached_generation(
+        "tutorial", inputs, prompt_tutorial, get_llm(model_name), acompute,
+        similar_topics=True
+    )
+
+
+# ===========================
+#  TUTORIAL PDF
+# ===========================
+class TutorialPDF(ExamPrepPDF):
+    header_gap = 6
 
-class TutorialPDF(FPDF):
     def __init__(self, title, author):
         super().__init__()
         self.title = title
         self.author = author
-        self.first_page = True
-
-    def header(self):
-        if self.page_no() == 1 and self.first_page:
-            self.set_fill_color(255, 153, 51)
-            self.set_text_color(255, 255, 255)
-            self.set_font("helvetica", "B", 11)
-            self.cell(0, 12, "EXAMPREP DOST", ln=True, align="C", fill=True)
-            self.ln(2)
-            self.first_page = False
-        elif self.page_no() > 1:
-            self.set_font("helvetica", "I", 9)
-            self.set_text_color(120, 120, 120)
-            self.cell(0, 8, sanitize_text(self.title), ln=True, align="L")
-            self.set_draw_color(200, 200, 200)
-            self.line(10, self.get_y(), 200, self.get_y())
-            self.ln(6)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("helvetica", "I", 8)
-        self.set_text_color(150, 150, 150)
-        self.cell(0, 10, f"Page {self.page_no()}", align="C")
-
-    def rounded_rect(self, x, y, w, h, r, style=''):
-        k = self.k
-        hp = self.h
-        if style == 'F':
-            op = 'f'
-        elif style == 'FD' or style == 'DF':
-            op = 'B'
-        else:
-            op = 'S'
-        
-        my_arc = 4/3 * (2**0.5 - 1)
-        self._out(f'{(x+r)*k:.2f} {(hp-y)*k:.2f} m')
-        
-        xc = x + w - r
-        yc = y + r
-        self._out(f'{xc*k:.2f} {(hp-y)*k:.2f} l')
-        self._arc(xc + r * my_arc, yc - r, xc + r, yc - r * my_arc, xc + r, yc)
-        
-        xc = x + w - r
-        yc = y + h - r
-        self._out(f'{(x+w)*k:.2f} {(hp-yc)*k:.2f} l')
-        self._arc(xc + r, yc + r * my_arc, xc + r * my_arc, yc + r, xc, yc + r)
-        
-        xc = x + r
-        yc = y + h - r
-        self._out(f'{xc*k:.2f} {(hp-(y+h))*k:.2f} l')
-        self._arc(xc - r * my_arc, yc + r, xc - r, yc + r * my_arc, xc - r, yc)
-        
-        xc = x + r
-        yc = y + r
-        self._out(f'{x*k:.2f} {(hp-yc)*k:.2f} l')
-        self._arc(xc - r, yc - r * my_arc, xc - r * my_arc, yc - r, xc, yc - r)
-        
-        self._out(op)
-    
-    def _arc(self, x1, y1, x2, y2, x3, y3):
-        h = self.h
-        self._out(f'{x1*self.k:.2f} {(h-y1)*self.k:.2f} {x2*self.k:.2f} {(h-y2)*self.k:.2f} {x3*self.k:.2f} {(h-y3)*self.k:.2f} c')
+
+    def running_title(self) -> str:
+        return self.title
 
     def draw_title_block(self, topic: str):
-        self.set_font("helvetica", "B", 22)
-        self.set_text_color(30, 30, 30)
-        self.cell(0, 14, sanitize_text(topic.upper()), ln=True, align="C")
-        
-        self.set_font("helvetica", "", 11)
-        self.set_text_color(100, 100, 100)
-        self.cell(0, 6, "Complete Tutorial", ln=True, align="C")
-        
-        self.set_draw_color(255, 153, 51)
-        self.set_line_width(0.6)
-        self.line(50, self.get_y() + 2, 160, self.get_y() + 2)
+        super().draw_title_block(topic, "Complete Tutorial")
         self.ln(8)
         
         self.set_font("helvetica", "", 9)
@@ -283,44 +258,10 @@ class TutorialPDF(FPDF):
         self.cell(0, 6, f"Author: {self.author} | Date: {datetime.now().strftime('%B %d, %Y')}", ln=True, align="C")
         self.ln(6)
 
-    def draw_section_header(self, section_title: str):
-        if self.get_y() > 250:
-            self.add_page()
-        
-        self.ln(4)
-        
-        x = self.get_x()
-        y = self.get_y()
-        
-        self.set_fill_color(255, 153, 51)
-        self.rounded_rect(x, y, self.w - 2*x, 10, 2, 'F')
-        
-        self.set_text_color(255, 255, 255)
-        self.set_font("helvetica", "B", 12)
-        self.cell(0, 10, sanitize_text(f"  {section_title}  "), ln=True, align="L")
-        self.ln(3)
-
     def draw_subheading(self, subheading: str):
         if self.get_y() > 260:
             self.add_page()
-            
-        self.ln(2)
-        
-        sanitized = sanitize_text(subheading)
-        self.set_font("helvetica", "B", 11)
-        
-        nb_lines = len(self.multi_cell(0, 8, f"  {sanitized}", split_only=True))
-        cell_height = 8 * nb_lines
-        
-        x = self.get_x()
-        y = self.get_y()
-        
-        self.set_fill_color(245, 245, 245)
-        self.rounded_rect(x, y, self.w - 2*x, cell_height, 1.5, 'F')
-        
-        self.set_text_color(50, 50, 50)
-        self.multi_cell(0, 8, f"  {sanitized}")
-        self.ln(2)
+        super().draw_subheading(subheading)
 
     def exam_highlight_box(self, text: str):
         if self.get_y() > 250:
@@ -328,23 +269,17 @@ class TutorialPDF(FPDF):
             
         self.ln(2)
         
-        sanitized = sanitize_text(text)
+        text = f"  EXAM POINT: {sanitize_text(text)}"
         self.set_font("helvetica", "B", 10)
-        
-        nb_lines = len(self.multi_cell(0, 7, f"  EXAM POINT: {sanitized}", split_only=True))
-        cell_height = 7 * nb_lines + 2
-        
-        x = self.get_x()
-        y = self.get_y()
-        
         self.set_fill_color(255, 245, 230)
         self.set_draw_color(255, 153, 51)
         self.set_line_width(0.5)
-        self.rounded_rect(x, y, self.w - 2*x, cell_height, 2, 'FD')
+        # Sized for bold text, drawn in regular 9pt
+        self.text_box(text, 7, 2, 'FD', pad=2)
         
         self.set_text_color(102, 51, 0)
         self.set_font("helvetica", "", 9)
-        self.multi_cell(0, 7, f"  EXAM POINT: {sanitized}")
+        self.multi_cell(0, 7, text)
         self.ln(2)
 
     def code_block(self, code: str):
@@ -356,13 +291,13 @@ class TutorialPDF(FPDF):
         self.set_fill_color(245, 245, 245)
         self.set_text_color(33, 37, 41)
         
-        for line in code.strip().split("\n"):
+        for line in code.split("\n"):
             sanitized_line = sanitize_text(line)
             self.multi_cell(0, 5, f"  {sanitized_line}", border=0, fill=True)
         self.ln(2)
 
     def normal_text(self, text: str):
-        clean_text = sanitize_text(strip_markdown(text).strip())
+        clean_text = sanitize_text(text)
         if not clean_text:
             return
             
@@ -374,7 +309,8 @@ class TutorialPDF(FPDF):
 
 def generate_tutorial_pdf(tutorial_text: str, topic: str, author: str = "ExamPrep AI") -> bytes:
     """
-    Generate PDF from tutorial text with markdown formatting.
+    Generate PDF from tutorial text, rendered from its document tree
+    (see document_tree).
     
     Args:
         tutorial_text: The tutorial content in markdown format
@@ -385,74 +321,32 @@ def generate_tutorial_pdf(tutorial_text: str, topic: str, author: str = "ExamPre
         PDF file as bytes
     """
     try:
-        pdf = TutorialPDF(title=topic.upper(), author=author)
-        pdf.set_auto_page_break(auto=True, margin=20)
-        pdf.add_page()
-        
-        pdf.draw_title_block(topic)
+        return render_tutorial_pdf(document_tree("tutorial", tutorial_text), topic, author)
+            
+    except Exception as e:
+        logger.exception("[ERROR] Tutorial PDF generation failed: %s", e)
+        raise
 
-        in_code_block = False
-        code_buffer = []
 
-        for line in tutorial_text.split("\n"):
-            line_stripped = line.strip()
-            
-            if line_stripped.startswith("```"):
-                in_code_block = not in_code_block
-                if not in_code_block and code_buffer:
-                    pdf.code_block("\n".join(code_buffer))
-                    code_buffer = []
-                continue
-            
-            if in_code_block:
-                code_buffer.append(line)
-                continue
-            
-            if not line_stripped:
-                continue
-            
-            if line_stripped.startswith("-----"):
-                continue
-            
-            line_clean = strip_markdown(line_stripped)
-            
-            if line_clean.upper().startswith("EXAM POINT:") or line_clean.upper().startswith("KEY EXAM POINT:"):
-                exam_text = re.sub(r'^(EXAM POINT:|KEY EXAM POINT:)\s*', '', line_clean, flags=re.IGNORECASE)
-                pdf.exam_highlight_box(exam_text)
-                continue
-            
-            if line_clean.endswith(":") and len(line_clean) > 3:
-                title_text = line_clean[:-1].strip()
-                
-                if re.match(r'^Question\s+\d+$', title_text, re.IGNORECASE):
-                    pdf.draw_subheading(title_text)
-                    continue
-                
-                if title_text.replace(" ", "").isupper() and len(title_text) > 8:
-                    pdf.draw_section_header(title_text)
-                    continue
-                
-                if re.match(r'^\d+\.\d+\s+', title_text):
-                    pdf.draw_subheading(title_text)
-                    continue
-                
-                if title_text[0].isupper() and len(title_text) < 80:
-                    pdf.draw_subheading(title_text)
-                    continue
-            
-            clean_line = line_clean.lstrip("-").lstrip("*").strip()
-            if not clean_line:
-                continue
-            
-            if clean_line[0].isdigit() and len(clean_line) > 2 and clean_line[1:3] in ['. ', ') ']:
-                pdf.normal_text(clean_line)
+def render_tutorial_pdf(tree: dict, topic: str, author: str = "ExamPrep AI") -> bytes:
+    pdf = TutorialPDF(title=topic.upper(), author=author)
+    pdf.set_auto_page_break(auto=True, margin=20)
+    pdf.add_page()
+    
+    pdf.draw_title_block(topic)
+
+    for section in tree["sections"]:
+        if section["title"] is not None:
+            pdf.draw_section_header(section["title"])
+
+        for block_type, text in section["blocks"]:
+            if block_type == "code":
+                pdf.code_block(text)
+            elif block_type == "exam":
+                pdf.exam_highlight_box(text)
+            elif block_type == "subheading":
+                pdf.draw_subheading(text)
             else:
-                pdf.normal_text(clean_line)
-        
-        return pdf.output(dest="S").encode("latin-1")
-            
-    except Exception as e:
-        print(f"[ERROR] Tutorial PDF generation failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise
\ No newline at end of file
+                pdf.normal_text(text)
+
+    return pdf.output(dest="S").encode("latin-1")
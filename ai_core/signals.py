@@ -12,3 +12,48 @@ def set_username(sender, request, user, **kwargs):
     if not user.username:
         user.username = f"user_{uuid.uuid4().hex[:10]}"
         user.save()
+
+
+# ============================
+# CELERY TASK COMPLETION
+# ============================
+import time
+
+from celery.signals import before_task_publish, task_success, task_failure
+from ai_core.services.task_events import publish_task_result
+
+
+@task_success.connect
+def publish_task_success(sender=None, result=None, **kwargs):
+    """
+    Push the result to clients waiting on /ai/task-events/<id>/
+    """
+    publish_task_result(sender.request.id, {
+        "ready": True,
+        "successful": True,
+        "result": result,
+        "status": "SUCCESS"
+    })
+
+
+@task_failure.connect
+def publish_task_failure(sender=None, task_id=None, exception=None, **kwargs):
+    publish_task_result(task_id, {
+        "ready": True,
+        "successful": False,
+        "error": str(exception),
+        "status": "FAILURE"
+    })
+
+
+# ============================
+# QUEUE WAIT
+# ============================
+@before_task_publish.connect
+def stamp_publish_time(headers=None, **kwargs):
+    """
+    Record when a task was sent; task_slot() reports the queue wait.
+    A retry passes the original stamp along, which setdefault keeps.
+    """
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
@@ -1,6 +1,49 @@
 # ai_core/tasks.py
 
+import threading
+import time
+from contextlib import contextmanager
+
 from celery import shared_task
+from django.conf import settings
+
+from .services.metrics import QUEUE_WAIT
+from .services.streaming import StreamPublisher
+from .services.task_events import TaskProgress
+
+# ============================
+# PER-TASK CONCURRENCY LIMITS
+# ============================
+# The worker runs many tasks at once on threads. Each task type gets a
+# bounded number of slots per process; a task that can't get one within
+# SLOT_WAIT_SECONDS goes back to the queue instead of holding a thread.
+SLOT_WAIT_SECONDS = 1
+SLOT_RETRY_COUNTDOWN = 3
+
+_task_slots = {
+    name: threading.BoundedSemaphore(limit)
+    for name, limit in settings.TASK_CONCURRENCY_LIMITS.items()
+}
+
+
+@contextmanager
+def task_slot(task, name: str):
+    # published_at is stamped when the task is first sent (see signals).
+    # Retries carry it over, so time spent re-queued for a slot counts as
+    # queue wait.
+    published_at = task.request.get("published_at")
+    slot = _task_slots.get(name)
+    if slot is not None and not slot.acquire(timeout=SLOT_WAIT_SECONDS):
+        headers = {"published_at": published_at} if published_at is not None else None
+        raise task.retry(countdown=SLOT_RETRY_COUNTDOWN, max_retries=None, headers=headers)
+    if published_at is not None:
+        QUEUE_WAIT.observe(max(0.0, time.time() - float(published_at)), generator=name)
+    try:
+        yield
+    finally:
+        if slot is not None:
+            slot.release()
+
 
 # ============================
 # MCQ TASK
@@ -12,59 +55,127 @@ from .services.mcq_generator import generate_mcqs
 def mcq_generation_task(self, topic: str, num_ques: int, difficulty: str):
     """
     Heavy MCQ generation using LLM
+    MCQs completed so far are reported as PROGRESS state
     Returns: List[Dict]
     """
-    return generate_mcqs(topic, num_ques, difficulty)
+    with task_slot(self, "mcq"):
+        progress = TaskProgress(self, num_ques)
+        return generate_mcqs(topic, num_ques, difficulty, on_mcqs=progress.add)
 
 
 # ============================
 # TUTORIAL TASK (TEXT ONLY)
 # ============================
-from .services.tutorial_generator import tutorial_chain
+from .services.tutorial_generator import generate_tutorial
 
 
 @shared_task(bind=True)
-def tutorial_generation_task(self, topic: str, depth: int):
+def tutorial_generation_task(self, topic: str, depth: int, stream: bool = False):
     """
     Heavy tutorial text generation using LLM
+    With stream=True, text chunks are published for the SSE endpoint
     Returns: str
     """
-    return tutorial_chain.invoke({
-        "topic": topic,
-        "depth": depth
-    })
+    with task_slot(self, "tutorial"):
+        if not stream:
+            return generate_tutorial(topic, depth)
+
+        publisher = StreamPublisher(self.request.id)
+        try:
+            text = generate_tutorial(topic, depth, on_chunk=publisher.write)
+        except Exception as e:
+            publisher.finish(error=str(e))
+            raise
+        publisher.finish()
+        return text
 
 
 # ============================
 # SUMMARY TASK (EXPLANATION + SUMMARY)
 # ============================
-from .services.summary_generator import explanation_chain, summary_chain
+from .services.summary_generator import summarize
 
 
 @shared_task(bind=True)
 def summary_generation_task(
     self,
-    topic: str,
+    content: str,
     summary_type: str,
-    tone_style: str
+    tone_style: str,
+    stream: bool = False,
+    mode: str = "auto"
 ):
     """
     Heavy summary generation:
-    1) Explanation
-    2) Condensed summary
+    1) Explanation, when `content` is a topic (see resolve_summary_mode)
+    2) Condensed summary (streamed for the SSE endpoint when stream=True)
     Returns: str
     """
-    explanation_text = explanation_chain.invoke({
-        "topic": topic
-    })
+    with task_slot(self, "summary"):
+        if not stream:
+            return summarize(content, summary_type, tone_style, mode)
+
+        publisher = StreamPublisher(self.request.id)
+        try:
+            summary_text = summarize(
+                content, summary_type, tone_style, mode,
+                on_chunk=publisher.write, on_status=publisher.status
+            )
+        except Exception as e:
+            publisher.finish(error=str(e))
+            raise
+        publisher.finish()
+        return summary_text
 
-    summary_text = summary_chain.invoke({
-        "sum_content": explanation_text,
-        "summary_type": summary_type,
-        "tone_style": tone_style
-    })
 
-    return summary_text
+# ============================
+# DOCUMENT SUMMARY TASK (UPLOAD -> TEXT -> SUMMARY)
+# ============================
+from .services.documents import DocumentError, extract_text, remove_upload
+
+
+@shared_task(bind=True)
+def document_summary_task(
+    self,
+    path: str,
+    summary_type: str,
+    tone_style: str,
+    stream: bool = False
+):
+    """
+    Summary of an uploaded PDF/DOCX:
+    1) Text extraction (PDF pages in parallel worker processes)
+    2) Summary of the text (map-reduce for long documents)
+    The upload is removed afterwards.
+    Returns: str
+    """
+    with task_slot(self, "document"):
+        publisher = StreamPublisher(self.request.id) if stream else None
+
+        def on_progress(done, total):
+            if publisher is not None:
+                publisher.status(f"Reading page {done} of {total}")
+
+        try:
+            if publisher is not None:
+                publisher.status("Reading document")
+            text = extract_text(path, on_progress=on_progress)
+            if not text:
+                raise DocumentError("No text found in the document (scanned pages are not supported)")
+            summary_text = summarize(
+                text, summary_type, tone_style, "text",
+                on_chunk=publisher.write if publisher is not None else None,
+                on_status=publisher.status if publisher is not None else None
+            )
+        except Exception as e:
+            if publisher is not None:
+                publisher.finish(error=str(e))
+            raise
+        finally:
+            remove_upload(path)
+        if publisher is not None:
+            publisher.finish()
+        return summary_text
 
 
 # ============================
@@ -82,6 +193,28 @@ def quiz_generation_task(
 ):
     """
     Heavy quiz generation using LLM
+    Questions are parsed as they stream in and reported as PROGRESS state,
+    so the quiz can start before the last one is generated
     Returns: List[Dict]
     """
-    return generate_quiz(topic, num_questions, difficulty)
\ No newline at end of file
+    with task_slot(self, "quiz"):
+        progress = TaskProgress(self, num_questions)
+        return generate_quiz(topic, num_questions, difficulty, on_questions=progress.add)
+
+
+# ============================
+# PDF RENDER TASK (LINKED AFTER GENERATION)
+# ============================
+from .services.artifacts import render_pdf_artifact
+
+
+@shared_task
+def render_pdf_task(content, generator: str, title: str):
+    """
+    Render the PDF download of a finished generation into the artifact
+    store. Linked to the generation task, so `content` is its result.
+    Returns: str (artifact digest)
+    """
+    if not content:
+        return None
+    return render_pdf_artifact(generator, content, title)
@@ -1,3 +1,678 @@
-from django.test import TestCase
+import json
+import re
+import unittest
+import zlib
+from unittest import mock
 
-# Create your tests here.
+import redis
+from django.core import signing
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from fpdf import FPDF
+from langchain_core.messages import HumanMessage
+
+from ai_core import tasks, views
+from ai_core.benchmarks.fakes import SimulatedLLM, fake_mcq, fake_quiz_block, mcq_runnable, quiz_runnable
+from ai_core.services import (
+    artifacts, cache, mcq_generator, quiz_generator, rate_limit, streaming, task_events, tutorial_generator,
+)
+from ai_core.services.document_tree import document_tree, parse_summary, parse_tutorial
+from ai_core.services.fanout import fan_out
+from ai_core.services.json_stream import JsonItemStream
+from ai_core.services.llm_config import MODEL_70B, MODEL_8B, RateLimitedChatGroq, route_model
+from ai_core.services.metrics import level_label, run_labels
+from ai_core.services.pdf_engine import LayoutPDF
+from ai_core.services.question_bank import store_questions
+from ai_core.services.rate_limit import DEFAULT_COMPLETION_TOKENS, estimate_tokens, expected_completion_tokens
+from ai_core.services.summary_generator import render_summary_pdf, resolve_summary_mode
+from ai_core.services.topic_index import TopicIndex, canonicalize_topic
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class StreamedChain:
+    """
+    Stands in for a streaming chain: `render(inputs)` is the full
+    completion, streamed in small pieces.
+    """
+
+    def __init__(self, render, piece=40):
+        self.render = render
+        self.piece = piece
+
+    def stream(self, inputs, config=None):
+        text = self.render(inputs)
+        for i in range(0, len(text), self.piece):
+            yield text[i:i + self.piece]
+
+
+def mcq_completion(inputs):
+    return json.dumps({"mcqs": [fake_mcq(inputs["topic"]) for _ in range(int(inputs["num_ques"]))]})
+
+
+def quiz_completion(inputs):
+    return "\n".join(fake_quiz_block(inputs["topic"]) for _ in range(int(inputs["num_questions"])))
+
+
+@override_settings(GENERATION_CACHE_ENABLED=False, QUESTION_BANK_ENABLED=False,
+                   LLM_ROUTER_ENABLED=False, METRICS_ENABLED=False)
+class TaskProgressTests(SimpleTestCase):
+    """
+    Streamed chunks run on run_concurrently's pool threads, where Celery's
+    request context is not set; progress must still reach the task.
+    """
+
+    def run_task(self, task, chain_module, chain_attr, chain, *args):
+        with mock.patch.object(chain_module, chain_attr, chain), \
+                mock.patch.object(task, "update_state") as update_state, \
+                mock.patch("ai_core.services.task_events.publish_task_progress") as publish, \
+                mock.patch("ai_core.signals.publish_task_result"):
+            result = task.apply(args=args)
+        return result, update_state, publish
+
+    def assert_progress(self, result, update_state, publish):
+        self.assertTrue(publish.called, "no progress was published")
+        for task_id, meta in (c.args for c in publish.call_args_list):
+            self.assertEqual(task_id, result.id)
+            self.assertGreater(meta["done"], 0)
+        for call in update_state.call_args_list:
+            self.assertEqual(call.kwargs["task_id"], result.id)
+            self.assertEqual(call.kwargs["state"], "PROGRESS")
+
+    def test_mcq_progress_from_streamed_chunks(self):
+        result, update_state, publish = self.run_task(
+            tasks.mcq_generation_task, mcq_generator, "mcq_stream_chain",
+            StreamedChain(mcq_completion), "Binary Trees", 20, "medium"
+        )
+        self.assertEqual(len(result.get()), 20)
+        self.assert_progress(result, update_state, publish)
+
+    def test_quiz_progress_from_streamed_chunks(self):
+        result, update_state, publish = self.run_task(
+            tasks.quiz_generation_task, quiz_generator, "quiz_chain",
+            StreamedChain(quiz_completion), "Binary Trees", 20, "medium"
+        )
+        self.assertEqual(len(result.get()), 20)
+        self.assert_progress(result, update_state, publish)
+
+
+CREATION_DATE = re.compile(rb"/CreationDate \(D:\d+\)")
+
+
+class FormReferenceTests(SimpleTestCase):
+    """
+    Drawings shared as form XObjects are referenced as "/X3 Do" in page
+    content; text that reads the same must be left alone.
+    """
+
+    def page_content(self, pdf: bytes) -> str:
+        streams = re.findall(rb"stream\n(.*?)\nendstream", pdf, re.DOTALL)
+        return "".join(zlib.decompress(s).decode("latin-1") for s in streams)
+
+    def test_text_that_looks_like_a_form_reference(self):
+        text = (
+            "KEY STEPS OF RENDERING:\n"
+            "- 1. Use /X9 Do here\n"
+            "- Use /X1 Do and /X2 Do here\n"
+            "- A line after them\n"
+        )
+        for optimize in (False, True):
+            with self.subTest(optimize=optimize), override_settings(PDF_OPTIMIZE=optimize):
+                content = self.page_content(render_summary_pdf(parse_summary(text), "Forms"))
+                self.assertIn("(1. Use /X9 Do here) Tj", content)
+                self.assertIn("Use /X1 Do and /X2 Do here) Tj", content)
+
+
+@override_settings(PDF_OPTIMIZE=False)
+class LayoutEngineTests(SimpleTestCase):
+    """
+    LayoutPDF.multi_cell replaces FPDF's character loop; its line breaks,
+    justification and page breaks must be FPDF's own.
+    """
+
+    TEXT = (
+        "A binary search tree keeps every key in the left subtree smaller than its root, "
+        "so lookups discard half of the remaining tree at each step.\n"
+        "Supercalifragilisticexpialidocious-words-with-no-spaces-must-still-break-somewhere-sensible "
+        "and   repeated   spaces  survive.\n\n"
+        "Short line.\n" + "Enough text to run over a page break. " * 120
+    )
+
+    def render(self, cls, align):
+        pdf = cls()
+        pdf.add_page()
+        pdf.set_font("Arial", "", 11)
+        lines = pdf.multi_cell(120, 6, self.TEXT, split_only=True)
+        pdf.multi_cell(120, 6, self.TEXT, border=1, align=align, fill=1)
+        pdf.set_font("Arial", "B", 9)
+        pdf.multi_cell(0, 5, self.TEXT[:400], align=align)
+        return lines, CREATION_DATE.sub(b"", pdf.output(dest="S").encode("latin-1"))
+
+    def test_matches_stock_multi_cell(self):
+        for align in ("J", "L", "C", "R"):
+            with self.subTest(align=align):
+                self.assertEqual(self.render(LayoutPDF, align), self.render(FPDF, align))
+
+
+class LevelLabelTests(SimpleTestCase):
+    def test_tutorial_depth_is_labelled_by_name(self):
+        for depth, label in (("1", "short"), ("2", "medium"), (3, "full"), ("full", "full")):
+            with self.subTest(depth=depth):
+                self.assertEqual(level_label(depth), label)
+                self.assertEqual(run_labels("tutorial", depth)["metadata"]["level"], label)
+
+    def test_unknown_levels_are_folded(self):
+        self.assertEqual(level_label("4"), "other")
+        self.assertEqual(level_label("Hard "), "hard")
+
+
+class TokenEstimateTests(SimpleTestCase):
+    def test_tutorial_depth_books_its_length(self):
+        for depth, tokens in (("1", 4000), ("2", 7000), (3, 10000), ("full", 10000)):
+            with self.subTest(depth=depth):
+                self.assertEqual(expected_completion_tokens("tutorial", depth), tokens)
+                metadata = run_labels("tutorial", depth)["metadata"]
+                self.assertEqual(estimate_tokens([], metadata), tokens)
+
+    def test_unknown_depth_books_the_default(self):
+        self.assertEqual(expected_completion_tokens("tutorial", "7"), DEFAULT_COMPLETION_TOKENS)
+
+
+@override_settings(LLM_ROUTER_ENABLED=True, METRICS_ENABLED=False)
+class RouterTests(SimpleTestCase):
+    def test_tutorial_depth_as_the_views_send_it(self):
+        with mock.patch("ai_core.services.llm_config.seconds_per_token", return_value=None):
+            self.assertEqual(route_model("tutorial", "1"), MODEL_8B)
+            self.assertEqual(route_model("tutorial", "2"), MODEL_70B)
+            self.assertEqual(route_model("tutorial", "3"), MODEL_70B)
+
+    def test_slow_70b_moves_only_the_threshold_depth(self):
+        with mock.patch("ai_core.services.llm_config.seconds_per_token", return_value=0.01):
+            self.assertEqual(route_model("tutorial", "2"), MODEL_8B)
+            self.assertEqual(route_model("tutorial", "3"), MODEL_70B)
+
+    def test_thresholds(self):
+        cases = (
+            # generator, level, size, model
+            ("mcq", "easy", 40, MODEL_8B),
+            ("mcq", "medium", 30, MODEL_8B),
+            ("mcq", "medium", 31, MODEL_70B),
+            ("mcq", "hard", 10, MODEL_8B),
+            ("mcq", "hard", 11, MODEL_70B),
+            ("quiz", "easy", 31, MODEL_70B),
+            ("quiz", "medium", 10, MODEL_8B),
+            ("quiz", "medium", 11, MODEL_70B),
+            ("quiz", "hard", 5, MODEL_70B),
+            ("summary", "short", 5000, MODEL_8B),
+            ("summary", "bullet", 3001, MODEL_8B),
+            ("summary", "detailed", 800, MODEL_8B),
+            ("summary", "detailed", 801, MODEL_70B),
+        )
+        with mock.patch("ai_core.services.llm_config.seconds_per_token", return_value=None):
+            for generator, level, size, model in cases:
+                with self.subTest(generator=generator, level=level, size=size):
+                    self.assertEqual(route_model(generator, level, size), model)
+
+    def test_slow_70b_keeps_requests_above_the_threshold(self):
+        # 0.05 s/token: a hard 11-question MCQ (990 tokens) expects ~50 s
+        with mock.patch("ai_core.services.llm_config.seconds_per_token", return_value=0.05):
+            self.assertEqual(route_model("mcq", "hard", 11), MODEL_8B)
+            self.assertEqual(route_model("mcq", "hard", 31), MODEL_70B)
+
+    @override_settings(LLM_ROUTER_ENABLED=False)
+    def test_disabled_router_keeps_the_default_models(self):
+        self.assertEqual(route_model("mcq", "hard", 50), MODEL_8B)
+        self.assertEqual(route_model("quiz", "easy", 1), MODEL_70B)
+        self.assertEqual(route_model("tutorial", "1"), MODEL_70B)
+
+
+@override_settings(METRICS_ENABLED=False, MCQ_CHUNK_SIZE=10, QUIZ_CHUNK_SIZE=10)
+class FanOutTests(SimpleTestCase):
+    """
+    The simulated model answers identical prompts identically, as the
+    temperature-0 model does; chunks only add up if their prompts differ.
+    """
+
+    def test_chunked_mcqs_reach_the_requested_count(self):
+        inputs = {"topic": "Binary Trees", "num_ques": 50, "difficulty": "medium"}
+        with mock.patch.object(mcq_generator, "mcq_chain", mcq_runnable(SimulatedLLM(scale=0))):
+            self.assertEqual(len(mcq_generator._generate_mcqs(inputs, MODEL_8B)), 50)
+
+    def test_chunked_quiz_reaches_the_requested_count(self):
+        inputs = {"topic": "Binary Trees", "num_questions": 30, "difficulty": "hard"}
+        with mock.patch.object(quiz_generator, "quiz_chain", quiz_runnable(SimulatedLLM(scale=0))):
+            self.assertEqual(len(quiz_generator._run_quiz_chain(inputs, MODEL_70B)), 30)
+
+    def test_top_up_lists_the_questions_so_far(self):
+        rounds = []
+
+        def run_batch(chunks):
+            rounds.append(chunks)
+            # One question per chunk, so every round falls short
+            return [[{"question": f"Question {len(rounds)}.{i}"}] for i, _ in enumerate(chunks)]
+
+        fan_out(run_batch, 25, 10, "test")
+        focuses = [focus for _, focus in rounds[0]]
+        self.assertEqual(len(set(focuses)), 3)
+        self.assertIn("part 2 of 3", focuses[1])
+        self.assertIn("- Question 1.0", rounds[1][0][1])
+        self.assertIn("- Question 1.2", rounds[1][0][1])
+
+
+@override_settings(ARTIFACT_URL_MAX_AGE=300)
+class ArtifactLinkTests(SimpleTestCase):
+    """
+    A download link stays the same for its window, so the browser's
+    cached copy of it can be revalidated with If-None-Match.
+    """
+
+    def at(self, seconds):
+        return mock.patch("time.time", return_value=seconds)
+
+    def test_link_is_stable_within_a_window(self):
+        start = 1_800_000_000 // 300 * 300
+        with self.at(start + 1):
+            first = artifacts.signed_url("abc")
+        with self.at(start + 299):
+            self.assertEqual(artifacts.signed_url("abc"), first)
+        with self.at(start + 300):
+            self.assertNotEqual(artifacts.signed_url("abc"), first)
+
+    def test_link_expires_after_one_to_two_windows(self):
+        start = 1_800_000_000 // 300 * 300
+        with self.at(start + 299):
+            token = artifacts._signer.sign("abc")
+        with self.at(start + 599):
+            self.assertEqual(artifacts.unsign(token), "abc")
+        with self.at(start + 601):
+            with self.assertRaises(signing.SignatureExpired):
+                artifacts.unsign(token)
+
+    def test_redis_outage_is_a_503_not_a_404(self):
+        request = RequestFactory().get("/")
+        with mock.patch.object(views, "unsign", return_value="abc"), \
+                mock.patch.object(views, "load_artifact", side_effect=redis.ConnectionError("down")):
+            response = views.artifact_download_view(request, "token")
+        self.assertEqual(response.status_code, 503)
+
+
+class SseEventsTests(SimpleTestCase):
+    """
+    A reconnecting client gets every chunk after its offset exactly once,
+    and a client attached to a task without a stream gets a terminal event
+    instead of being held until MAX_STREAM_SECONDS.
+    """
+
+    def fake_redis(self, chunks_exist=False, messages=(), chunks=(), done=None):
+        pubsub = mock.AsyncMock()
+        pubsub.get_message.side_effect = list(messages) + [None] * 50
+        stored = [c.encode("utf-8") for c in chunks]
+        r = mock.MagicMock()
+        r.pubsub.return_value = pubsub
+        r.lrange = mock.AsyncMock(side_effect=lambda key, start, end: stored[start:None if end == -1 else end + 1])
+        r.get = mock.AsyncMock(return_value=done and json.dumps(done).encode("utf-8"))
+        r.exists = mock.AsyncMock(return_value=int(chunks_exist or bool(chunks)))
+        return r
+
+    async def frames(self, r, state, offset=0):
+        with mock.patch.object(streaming, "get_async_redis", return_value=r), \
+                mock.patch.object(streaming, "_task_state", return_value=state):
+            return [frame async for frame in streaming.sse_events("some-task", offset)]
+
+    def chunk(self, i, text):
+        return f'id: {i}\ndata: {json.dumps({"text": text})}\n\n'
+
+    async def test_finished_task_without_stream(self):
+        frames = await self.frames(self.fake_redis(), "SUCCESS")
+        self.assertEqual(frames, ['event: done\ndata: {"done": true, "error": "no stream for this task"}\n\n'])
+
+    async def test_unknown_task_is_given_up(self):
+        with mock.patch.object(streaming, "PENDING_STREAM_SECONDS", 0):
+            frames = await self.frames(self.fake_redis(), "PENDING")
+        self.assertEqual(frames, ['event: done\ndata: {"done": true, "error": "stream not found"}\n\n'])
+
+    async def test_active_stream_is_relayed(self):
+        done = {"type": "message", "data": json.dumps({"done": True, "error": None})}
+        frames = await self.frames(self.fake_redis(chunks_exist=True, messages=[None, done]), "SUCCESS")
+        self.assertEqual(frames, ['event: done\ndata: {"done": true, "error": null}\n\n'])
+
+    async def test_resume_replays_the_backlog_from_the_offset(self):
+        r = self.fake_redis(chunks=["a", "b", "c", "d"], done={"done": True, "error": None})
+        frames = await self.frames(r, "SUCCESS", offset=2)
+        self.assertEqual(frames, [
+            self.chunk(2, "c"), self.chunk(3, "d"),
+            'event: done\ndata: {"done": true, "error": null}\n\n',
+        ])
+
+    async def test_live_chunks_are_deduplicated_and_gaps_replayed(self):
+        live = [
+            {"type": "message", "data": json.dumps({"i": 1, "text": "b"})},   # already sent from the backlog
+            {"type": "message", "data": json.dumps({"i": 4, "text": "e"})},   # 2 and 3 were missed
+            {"type": "message", "data": json.dumps({"done": True, "error": None})},
+        ]
+        r = self.fake_redis(messages=live, chunks=["a", "b"])
+        # Backlog read, gap replay, catch-up before done
+        r.lrange.side_effect = [[b"b"], [b"c", b"d"], []]
+        frames = await self.frames(r, "STARTED", offset=1)
+        self.assertEqual(frames, [
+            self.chunk(1, "b"), self.chunk(2, "c"), self.chunk(3, "d"), self.chunk(4, "e"),
+            'event: done\ndata: {"done": true, "error": null}\n\n',
+        ])
+        self.assertEqual(r.lrange.call_args_list[1].args[1:], (2, 3))
+
+    def test_last_event_id_resumes_after_it(self):
+        cases = (
+            ({"Last-Event-ID": "7"}, "", 8),
+            ({}, "?offset=3", 3),
+            ({"Last-Event-ID": "x"}, "", 0),
+        )
+        for headers, query, offset in cases:
+            with self.subTest(headers=headers, query=query), \
+                    mock.patch.object(views, "sse_events") as sse_events:
+                views.stream_view(RequestFactory().get("/ai/stream/t/" + query, headers=headers), "t")
+            self.assertEqual(sse_events.call_args.args, ("t", offset))
+
+
+class TaskEventsTests(SimpleTestCase):
+    """
+    A task whose result was never published still ends its event stream
+    once the result backend has it.
+    """
+
+    def fake_redis(self, messages=()):
+        pubsub = mock.AsyncMock()
+        pubsub.get_message.side_effect = list(messages) + [None] * 50
+        r = mock.MagicMock()
+        r.pubsub.return_value = pubsub
+        r.get = mock.AsyncMock(return_value=None)
+        return r
+
+    async def frames(self, r, status):
+        with mock.patch.object(task_events, "get_async_redis", return_value=r), \
+                mock.patch.object(task_events, "backend_task_status", return_value=status):
+            return [frame async for frame in task_events.sse_task_events("some-task")]
+
+    async def test_finished_task_is_read_from_the_backend(self):
+        status = {"ready": True, "successful": True, "result": [1, 2], "status": "SUCCESS"}
+        frames = await self.frames(self.fake_redis(), status)
+        self.assertEqual(frames, [f"event: complete\ndata: {json.dumps(status)}\n\n"])
+
+    async def test_unknown_task_is_given_up(self):
+        status = {"ready": False, "successful": False, "status": "PENDING"}
+        with mock.patch.object(task_events, "PENDING_STREAM_SECONDS", 0):
+            frames = await self.frames(self.fake_redis(), status)
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(json.loads(frames[0].split("data: ")[1])["error"], "task not found")
+
+    async def test_published_result_is_relayed(self):
+        payload = {"ready": True, "successful": True, "result": "text", "status": "SUCCESS"}
+        message = {"type": "message", "data": json.dumps(payload)}
+        status = {"ready": False, "successful": False, "status": "PENDING"}
+        frames = await self.frames(self.fake_redis(messages=[None, message]), status)
+        self.assertEqual(frames, [f"event: complete\ndata: {json.dumps(payload)}\n\n"])
+
+
+@override_settings(TOPIC_SIMILARITY_THRESHOLD=0.8)
+class TopicIndexTests(SimpleTestCase):
+    def index(self, *topics):
+        index = TopicIndex()
+        for topic in topics:
+            index._insert("mcq", topic)
+        return index
+
+    def find(self, index, topic):
+        with mock.patch.object(index, "refresh"):
+            return index.find_similar("mcq", topic)
+
+    def test_canonical_forms(self):
+        self.assertEqual(canonicalize_topic("Binary-Trees!"), "binary tree")
+        self.assertEqual(canonicalize_topic("Physics basics"), "physics")
+        self.assertEqual(canonicalize_topic("Data Structures"), "data structure")
+
+    def test_rephrased_topic_matches(self):
+        index = self.index("binary tree")
+        for topic in ("Binary Trees", "binary-tree traversal basics"):
+            with self.subTest(topic=topic):
+                match = self.find(index, topic)
+                self.assertIsNotNone(match)
+                self.assertEqual(match[0], "binary tree")
+
+    def test_near_misses_do_not_match(self):
+        pairs = (
+            ("Organic Chemistry", "Inorganic Chemistry"),
+            ("World War I", "World War II"),
+            ("Python 2 syntax", "Python 3 syntax"),
+            ("Linear equations", "Non-linear equations"),
+            ("Supervised learning", "Unsupervised learning"),
+        )
+        for known, asked in pairs:
+            with self.subTest(asked=asked):
+                self.assertIsNone(self.find(self.index(known), asked))
+                self.assertIsNone(self.find(self.index(asked), known))
+
+
+@override_settings(GENERATION_CACHE_ENABLED=True, TOPIC_SIMILARITY_ENABLED=True)
+class GroundingTests(SimpleTestCase):
+    def test_grounding_is_not_borrowed_from_a_similar_topic(self):
+        with mock.patch.object(cache, "cache_get", return_value=None), \
+                mock.patch.object(cache, "_similar_topic_lookup", return_value="World War I notes") as similar:
+            chain_inputs = tutorial_generator._grounded({"topic": "World War II", "depth": "2"})
+        similar.assert_not_called()
+        self.assertEqual(chain_inputs["reference"], "(none)")
+
+
+@override_settings(SUMMARY_TOPIC_MAX_WORDS=5)
+class SummaryModeTests(SimpleTestCase):
+    def test_auto_reads_short_single_lines_as_topics(self):
+        self.assertEqual(resolve_summary_mode("  Binary Search Trees  "), "topic")
+        self.assertEqual(resolve_summary_mode("one two three four five"), "topic")
+
+    def test_auto_reads_longer_input_as_text(self):
+        self.assertEqual(resolve_summary_mode("one two three four five six"), "text")
+        self.assertEqual(resolve_summary_mode("Binary trees\nHeaps"), "text")
+
+    def test_explicit_mode_wins(self):
+        self.assertEqual(resolve_summary_mode("Binary trees", "text"), "text")
+        self.assertEqual(resolve_summary_mode("one two three four five six", "topic"), "topic")
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            resolve_summary_mode("Binary trees", "essay")
+
+
+RATE_LIMITS = {MODEL_8B: {"rpm": 60, "tpm": 60000}}
+
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+@override_settings(LLM_RATE_LIMIT_ENABLED=True, LLM_RATE_LIMITS=RATE_LIMITS,
+                   LLM_RATE_BURST_SECONDS=10, LLM_RATE_MAX_WAIT=30, METRICS_ENABLED=False)
+class RateLimitTests(SimpleTestCase):
+    """
+    60000 tpm with a 10 s burst: 10000 tokens of capacity, refilled at 1000/s.
+    """
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(rate_limit, "get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def available(self):
+        return rate_limit.budget_status()[MODEL_8B]["tpm"]["available"]
+
+    def test_reserve_within_capacity_does_not_wait(self):
+        self.assertEqual(rate_limit.reserve(MODEL_8B, 6000), 0.0)
+        self.assertAlmostEqual(self.available(), 4000, delta=50)
+
+    def test_reserve_beyond_capacity_waits_for_refill(self):
+        rate_limit.reserve(MODEL_8B, 6000)
+        self.assertAlmostEqual(rate_limit.reserve(MODEL_8B, 9000), 5.0, delta=0.1)
+
+    def test_reserve_too_far_ahead_is_refused(self):
+        with self.assertRaises(rate_limit.RateLimitExceeded):
+            rate_limit.reserve(MODEL_8B, 50000)
+
+    def test_settle_returns_the_unused_estimate(self):
+        rate_limit.reserve(MODEL_8B, 9000)
+        rate_limit.settle(MODEL_8B, 9000, 3000)
+        self.assertAlmostEqual(self.available(), 7000, delta=50)
+
+    def test_settle_charges_an_underestimate(self):
+        rate_limit.reserve(MODEL_8B, 3000)
+        rate_limit.settle(MODEL_8B, 3000, 5000)
+        self.assertAlmostEqual(self.available(), 5000, delta=50)
+
+    def test_settle_never_exceeds_capacity(self):
+        rate_limit.reserve(MODEL_8B, 1000)
+        rate_limit.settle(MODEL_8B, 1000, 0)
+        rate_limit.settle(MODEL_8B, 5000, 0)
+        self.assertAlmostEqual(self.available(), 10000, delta=1)
+
+    def test_failed_call_settles_as_unused(self):
+        llm = RateLimitedChatGroq(model=MODEL_8B, api_key="test", max_retries=0)
+        with mock.patch("langchain_groq.ChatGroq._generate", side_effect=RuntimeError("upstream")):
+            with self.assertRaises(RuntimeError):
+                llm._generate([HumanMessage(content="x" * 400)])
+        self.assertAlmostEqual(self.available(), 10000, delta=1)
+
+
+class BudgetViewTests(SimpleTestCase):
+    def test_redis_outage_is_a_503(self):
+        request = RequestFactory().get("/ai/llm-budget/")
+        with mock.patch.object(views, "budget_status", side_effect=redis.ConnectionError("down")):
+            response = views.llm_budget_view(request)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("error", json.loads(response.content))
+
+
+class MetricsViewTests(SimpleTestCase):
+    def test_redis_outage_is_a_503(self):
+        request = RequestFactory().get("/ai/metrics/")
+        with mock.patch.object(views, "render_metrics", side_effect=redis.ConnectionError("down")):
+            response = views.metrics_view(request)
+        self.assertEqual(response.status_code, 503)
+
+
+@override_settings(QUESTION_BANK_ENABLED=True)
+class QuestionBankTests(SimpleTestCase):
+    def stored_difficulty(self, difficulty):
+        with mock.patch("ai_core.models.Question.objects.bulk_create") as bulk_create:
+            store_questions("mcq", "Binary Trees", difficulty, [fake_mcq("Binary Trees")])
+        if not bulk_create.called:
+            return None
+        return bulk_create.call_args.args[0][0].difficulty
+
+    def test_difficulty_is_normalized(self):
+        self.assertEqual(self.stored_difficulty(" Hard "), "hard")
+        self.assertEqual(self.stored_difficulty("MEDIUM"), "medium")
+
+    def test_unknown_difficulty_is_not_banked(self):
+        self.assertIsNone(self.stored_difficulty("impossible, but make it 40 characters long"))
+        self.assertIsNone(self.stored_difficulty(""))
+
+
+class JsonItemStreamTests(SimpleTestCase):
+    ITEMS = [
+        {"question": 'Which brace closes "{"?', "options": {"A": "}", "B": "]"}, "answer": "A"},
+        {"question": "Escapes: \\\" and \\\\ stay in the string", "options": ["A [x]", "B {y}"], "answer": "B"},
+        {"question": "Nested", "options": [{"label": "A"}, {"label": "B"}], "answer": "A"},
+    ]
+
+    def scan(self, text, piece):
+        scanner = JsonItemStream()
+        found = []
+        for i in range(0, len(text), piece):
+            found.extend(scanner.feed(text[i:i + piece]))
+        return found
+
+    def test_items_of_a_wrapped_array(self):
+        text = "Here are your questions:\n```json\n" + json.dumps({"mcqs": self.ITEMS}) + "\n```\nGood luck!"
+        for piece in (1, 7, len(text)):
+            with self.subTest(piece=piece):
+                self.assertEqual(self.scan(text, piece), self.ITEMS)
+
+    def test_items_of_a_top_level_array(self):
+        self.assertEqual(self.scan(json.dumps(self.ITEMS), 5), self.ITEMS)
+
+    def test_item_is_returned_when_its_brace_arrives(self):
+        scanner = JsonItemStream()
+        first = json.dumps(self.ITEMS[0])
+        self.assertEqual(scanner.feed('{"mcqs": [' + first[:-1]), [])
+        self.assertEqual(scanner.feed("}, {"), [self.ITEMS[0]])
+
+    def test_malformed_item_is_skipped(self):
+        text = '{"mcqs": [{"question": "ok"}, {"question": oops}, {"question": "also ok"}]}'
+        self.assertEqual(self.scan(text, 3), [{"question": "ok"}, {"question": "also ok"}])
+
+    def test_truncated_output_keeps_earlier_items(self):
+        text = json.dumps({"mcqs": self.ITEMS})[:-40]
+        self.assertEqual(self.scan(text, 4), self.ITEMS[:2])
+
+
+class DocumentTreeTests(SimpleTestCase):
+    def test_summary(self):
+        text = (
+            "Intro line about **trees**.\n\n"
+            "KEY DEFINITIONS:\n"
+            "- **Binary tree**: each node has at most two children\n"
+            "* Leaf: a node without children\n"
+            "Traversal orders:\n"
+            "3. Inorder visits left, root, right\n\n"
+            "STEPS OF INSERTION:\n"
+            "- Compare with the root\n"
+            "- Recurse into a subtree\n"
+        )
+        self.assertEqual(parse_summary(text), {"kind": "summary", "sections": [
+            {"title": None, "blocks": [["bullet", "Intro line about trees."]]},
+            {"title": "KEY DEFINITIONS", "blocks": [
+                ["bullet", "Binary tree: each node has at most two children"],
+                ["bullet", "Leaf: a node without children"],
+                ["subheading", "Traversal orders"],
+                ["point", "3. Inorder visits left, root, right"],
+            ]},
+            {"title": "STEPS OF INSERTION", "blocks": [
+                ["point", "1. Compare with the root"],
+                ["point", "2. Recurse into a subtree"],
+            ]},
+        ]})
+
+    def test_tutorial(self):
+        text = (
+            "CORE CONCEPTS:\n"
+            "2.1 Arrays:\n"
+            "An array stores **elements** contiguously.\n"
+            "-----\n"
+            "```python\n"
+            "a = [1, 2]\n\n"
+            "print(a)\n"
+            "```\n"
+            "EXAM POINT: Indexing is O(1).\n"
+            "Question 3:\n"
+            "1. Define an array.\n"
+            "```\n"
+            "never closed\n"
+        )
+        self.assertEqual(parse_tutorial(text), {"kind": "tutorial", "sections": [
+            {"title": "CORE CONCEPTS", "blocks": [
+                ["subheading", "2.1 Arrays"],
+                ["text", "An array stores elements contiguously."],
+                ["code", "a = [1, 2]\n\nprint(a)"],
+                ["exam", "Indexing is O(1)."],
+                ["subheading", "Question 3"],
+                ["point", "1. Define an array."],
+            ]},
+        ]})
+
+    @override_settings(GENERATION_CACHE_ENABLED=True)
+    def test_cached_tree_is_not_parsed_again(self):
+        stored = {}
+        parser = mock.Mock(wraps=parse_summary)
+        with mock.patch("ai_core.services.document_tree.cache_get", side_effect=stored.get), \
+                mock.patch("ai_core.services.document_tree.cache_set", side_effect=stored.__setitem__), \
+                mock.patch.dict("ai_core.services.document_tree.PARSERS", {"summary": parser}):
+            first = document_tree("summary", "KEY POINTS:\n- One")
+            second = document_tree("summary", "KEY POINTS:\n- One")
+        self.assertEqual(first, second)
+        self.assertEqual(parser.call_count, 1)
@@ -16,7 +16,9 @@ urlpatterns = [
     # ==========================
     path("summary/", views.summary_view, name="summary"),
     path("summary/async/", views.summary_view_async, name="summary_async"),
+    path("summary/upload/", views.summary_upload_view, name="summary_upload"),
     path("download_summary_pdf/", views.download_summary_pdf, name="download_summary_pdf"),
+    path("download_summary_docx/", views.download_summary_docx, name="download_summary_docx"),
     path("store-summary/", views.store_summary_view, name="store_summary"),
 
     # ==========================
@@ -25,8 +27,14 @@ urlpatterns = [
     path("tutorial/", views.tutorial_view, name="tutorial"),
     path("tutorial/async/", views.tutorial_view_async, name="tutorial_async"),
     path("download_tutorial_pdf/", views.download_tutorial_pdf, name="download_tutorial_pdf"),
+    path("download_tutorial_docx/", views.download_tutorial_docx, name="download_tutorial_docx"),
     path("store-tutorial/", views.store_tutorial_view, name="store_tutorial"),
 
+    # ==========================
+    # PDF ARTIFACTS (SIGNED LINKS)
+    # ==========================
+    path("artifact/<str:token>/", views.artifact_download_view, name="artifact_download"),
+
     # ==========================
     # QUIZ
     # ==========================
@@ -37,4 +45,16 @@ urlpatterns = [
     # TASK STATUS
     # ==========================
     path("task-status/<str:task_id>/", views.task_status_view, name="task_status"),
+    path("task-events/<str:task_id>/", views.task_events_view, name="task_events"),
+    path("stream/<str:task_id>/", views.stream_view, name="task_stream"),
+
+    # ==========================
+    # GENERATION CACHE
+    # ==========================
+    path("cache-stats/", views.cache_stats_view, name="cache_stats"),
+
+    # ==========================
+    # LLM RATE LIMIT
+    # ==========================
+    path("llm-budget/", views.llm_budget_view, name="llm_budget"),
 ]
\ No newline at end of file
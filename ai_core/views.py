@@ -1,12 +1,26 @@
 from django.shortcuts import render, HttpResponse
-from ai_core.services.mcq_generator import generate_mcqs, generate_styled_mcq_pdf
-from ai_core.services.summary_generator import explanation_chain, summary_chain, generate_summary_pdf
-from ai_core.services.tutorial_generator import tutorial_chain, generate_tutorial_pdf
-from ai_core.services.quiz_generator import generate_quiz
+from ai_core.services.mcq_generator import agenerate_mcqs
+from ai_core.services.summary_generator import (
+    SUMMARY_MODES, agenerate_summary, resolve_summary_mode,
+)
+from ai_core.services.tutorial_generator import agenerate_tutorial
+from ai_core.services.cache import cache_stats
+from ai_core.services.metrics import render_metrics
+from ai_core.services.pdf_cache import pdf_etag
+from ai_core.services.rate_limit import budget_status
+from ai_core.services.streaming import sse_events
+from ai_core.services.task_events import backend_task_status, wait_for_task, sse_task_events
+from ai_core.services.quiz_generator import agenerate_quiz
 import json
+import logging
+import uuid
 
+import redis
+from asgiref.sync import sync_to_async
 from celery.result import AsyncResult
-from django.http import JsonResponse
+from django.conf import settings
+from django.core import signing
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.shortcuts import redirect
@@ -15,44 +29,61 @@ from ai_core.tasks import (
     mcq_generation_task,
     tutorial_generation_task,
     summary_generation_task,
+    document_summary_task,
     quiz_generation_task,
+    render_pdf_task,
+)
+from ai_core.services.artifacts import (
+    artifact_digest, artifact_exists, load_artifact, render_pdf_artifact, signed_url, unsign,
 )
+from ai_core.services.documents import document_type, save_upload
+from ai_core.services.document_export import DOCX_CONTENT_TYPE, html_pages, render_docx, render_html
+from ai_core.services.document_tree import document_tree
+
+logger = logging.getLogger(__name__)
+
+# Characters of text per page of the paginated tutorial view
+TUTORIAL_PAGE_CHARS = 3000
 
+# Generation views are async: under ASGI they await the LLM without holding
+# a thread. Template rendering (context processors read the session and
+# user) runs in a thread.
+arender = sync_to_async(render)
 
 
 # ========================= MCQ VIEWS (UNCHANGED) =========================
-def mcq_view(request):
-    print("🔥 SYNC MCQ VIEW HIT")
+async def mcq_view(request):
+    logger.debug("[VIEW] Sync MCQ view")
     context = {}
 
     if request.method == "POST":
-        print("[DEBUG] POST request received")
+        logger.debug("[DEBUG] POST request received")
         
         topic = request.POST.get("topic", "").strip()
         count = request.POST.get("count", "").strip()
         difficulty = request.POST.get("difficulty", "medium")
 
-        print(f"[DEBUG] Topic: {topic}, Count: {count}, Difficulty: {difficulty}")
+        logger.debug("[DEBUG] Topic: %s, Count: %s, Difficulty: %s", topic, count, difficulty)
 
         # Validation
         if not topic or not count:
             context["error"] = "Please enter topic and number of MCQs."
-            return render(request, "mcq.html", context)
+            return await arender(request, "mcq.html", context)
 
         try:
             count = int(count)
             if count <= 0 or count > 50:
                 context["error"] = "Please enter a number between 1 and 50."
-                return render(request, "mcq.html", context)
+                return await arender(request, "mcq.html", context)
         except ValueError:
             context["error"] = "Invalid number format."
-            return render(request, "mcq.html", context)
+            return await arender(request, "mcq.html", context)
 
         # Generate MCQs
         try:
-            result = generate_mcqs(topic, count, difficulty)
-            print(f"[DEBUG] LLM Response Type: {type(result)}")
-            print(f"[DEBUG] LLM Response: {result}")
+            result = await agenerate_mcqs(topic, count, difficulty)
+            logger.debug("[DEBUG] LLM Response Type: %s", type(result))
+            logger.debug("[DEBUG] LLM Response: %s", result)
             
             # Extract MCQs from response
             if isinstance(result, dict) and "mcqs" in result:
@@ -60,15 +91,15 @@ def mcq_view(request):
             elif isinstance(result, list):
                 mcqs = result
             else:
-                print(f"[ERROR] Unexpected response format: {result}")
+                logger.error("[ERROR] Unexpected response format: %s", result)
                 context["error"] = "Failed to generate MCQs. Unexpected format."
-                return render(request, "mcq.html", context)
+                return await arender(request, "mcq.html", context)
             
-            print(f"[DEBUG] Generated {len(mcqs)} MCQs")
+            logger.debug("[DEBUG] Generated %s MCQs", len(mcqs))
             
             if not mcqs or len(mcqs) == 0:
                 context["error"] = "No MCQs were generated. Please try again."
-                return render(request, "mcq.html", context)
+                return await arender(request, "mcq.html", context)
 
             # Store in context for display
             context["mcqs"] = mcqs
@@ -77,22 +108,87 @@ def mcq_view(request):
             context["difficulty"] = difficulty
 
             # Store MCQs in session for PDF download
-            request.session["mcqs_for_pdf"] = {
+            await request.session.aset("mcqs_for_pdf", {
                 "mcqs": mcqs,
                 "title": topic,
-            }
+            })
+            await sync_to_async(render_pdf_task.delay)(mcqs, "mcq", topic)
             
-            print(f"[SUCCESS] Context contains {len(mcqs)} MCQs")
-            print(f"[DEBUG] First MCQ: {mcqs[0] if mcqs else 'None'}")
+            logger.info("[SUCCESS] Context contains %s MCQs", len(mcqs))
+            logger.debug("[DEBUG] First MCQ: %s", mcqs[0] if mcqs else 'None')
             
         except Exception as e:
-            print(f"[ERROR] Exception in mcq_view: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[ERROR] Exception in mcq_view: %s", e)
             context["error"] = f"Error generating MCQs: {str(e)}"
-            return render(request, "mcq.html", context)
+            return await arender(request, "mcq.html", context)
 
-    return render(request, "mcq.html", context)
+    return await arender(request, "mcq.html", context)
+
+
+def _pdf_response(request, generator: str, content, title: str):
+    """
+    Redirect to a signed link to the PDF of a generation. The PDF is
+    normally already in the artifact store (render_pdf_task runs when
+    generation finishes); if not, it is rendered now. The ETag is the
+    artifact digest, computed without rendering, so a matching
+    If-None-Match is answered with 304 straight away.
+    """
+    digest = artifact_digest(generator, content, title)
+    etag = pdf_etag(digest)
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        if not artifact_exists(digest):
+            render_pdf_artifact(generator, content, title)
+        response = redirect(signed_url(digest))
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def artifact_download_view(request, token):
+    """
+    Stream a stored artifact through a signed, expiring link
+    """
+    try:
+        digest = unsign(token)
+    except signing.SignatureExpired:
+        return HttpResponse("This download link has expired. Please download again.", status=410)
+    except signing.BadSignature:
+        return HttpResponse("Invalid download link.", status=403)
+
+    etag = pdf_etag(digest)
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            artifact = load_artifact(digest)
+        except redis.RedisError as e:
+            logger.warning("[ARTIFACT] Redis unavailable on download: %s", e)
+            return HttpResponse("Downloads are temporarily unavailable. Please try again shortly.", status=503)
+        if artifact is None:
+            return HttpResponse("This file is no longer available. Please download again.", status=404)
+        response = HttpResponse(artifact["data"], content_type=artifact["content_type"])
+        response['Content-Disposition'] = f'attachment; filename="{artifact["filename"]}"'
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _docx_response(kind: str, text: str, title: str, subtitle: str, filename: str):
+    """
+    Word download of a summary or tutorial, rendered from its cached
+    document tree
+    """
+    try:
+        docx_bytes = render_docx(document_tree(kind, text), title, subtitle)
+    except Exception as e:
+        logger.exception("[ERROR] DOCX export failed: %s", e)
+        return HttpResponse(f"Error generating document: {str(e)}", status=500)
+
+    response = HttpResponse(docx_bytes, content_type=DOCX_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 def download_mcq_pdf(request):
@@ -106,82 +202,75 @@ def download_mcq_pdf(request):
         mcqs = mcq_session_data["mcqs"]
         title = mcq_session_data["title"]
 
-        print(f"[DEBUG] Generating PDF for {len(mcqs)} MCQs")
-
-        pdf_bytes = generate_styled_mcq_pdf(mcqs, title)
+        logger.debug("[DEBUG] Generating PDF for %s MCQs", len(mcqs))
 
-        response = HttpResponse(pdf_bytes, content_type="application/pdf")
-        response['Content-Disposition'] = f'attachment; filename="{title}_MCQs.pdf"'
-        return response
+        return _pdf_response(request, "mcq", mcqs, title)
         
     except Exception as e:
-        print(f"[ERROR] PDF download failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[ERROR] PDF download failed: %s", e)
         return HttpResponse(f"Error generating PDF: {str(e)}", status=500)
 
 
 # ========================= SUMMARY VIEWS (UNCHANGED) =========================
-def summary_view(request):
+async def summary_view(request):
     """Generate AI summary from text input"""
     context = {}
 
     if request.method == "POST":
-        print("[DEBUG] Summary POST request received")
+        logger.debug("[DEBUG] Summary POST request received")
         
         text_content = request.POST.get("text", "").strip()
         summary_type = request.POST.get("type", "short")
         tone_style = request.POST.get("tone", "simple")
 
-        print(f"[DEBUG] Content length: {len(text_content)}, Type: {summary_type}, Tone: {tone_style}")
+        logger.debug("[DEBUG] Content length: %s, Type: %s, Tone: %s", len(text_content), summary_type, tone_style)
 
         # Validation
         if not text_content:
             context["error"] = "Please enter some text to summarize."
-            return render(request, "summarizer.html", context)
+            return await arender(request, "summarizer.html", context)
 
         if len(text_content) < 50:
             context["error"] = "Please enter at least 50 characters to generate a meaningful summary."
-            return render(request, "summarizer.html", context)
+            return await arender(request, "summarizer.html", context)
 
         # Generate Summary
         try:
-            print("[DEBUG] Calling summary chain...")
+            logger.debug("[DEBUG] Calling summary chain...")
             
-            summary_result = summary_chain.invoke({
-                "sum_content": text_content,
-                "summary_type": summary_type,
-                "tone_style": tone_style
-            })
+            summary_result = await agenerate_summary(text_content, summary_type, tone_style)
             
-            print(f"[DEBUG] Summary generated, length: {len(summary_result)}")
+            logger.debug("[DEBUG] Summary generated, length: %s", len(summary_result))
             
             if not summary_result or len(summary_result.strip()) == 0:
                 context["error"] = "Failed to generate summary. Please try again."
-                return render(request, "summarizer.html", context)
+                return await arender(request, "summarizer.html", context)
 
             # Store in context for display
             context["output"] = summary_result
+            context["output_html"] = render_html(
+                await sync_to_async(document_tree)("summary", summary_result)
+            )
             context["text"] = text_content
             context["type"] = summary_type
             context["tone"] = tone_style
 
             # Store summary in session for PDF download
-            request.session["summary_for_pdf"] = {
+            pdf_title = f"{summary_type.title()} Summary ({tone_style})"
+            await request.session.aset("summary_for_pdf", {
                 "summary_text": summary_result,
-                "topic": f"{summary_type.title()} Summary ({tone_style})",
-            }
+                "topic": pdf_title,
+            })
+            await sync_to_async(render_pdf_task.delay)(summary_result, "summary", pdf_title)
             
-            print(f"[SUCCESS] Summary generated and stored in session")
+            logger.info("[SUCCESS] Summary generated and stored in session")
             
         except Exception as e:
-            print(f"[ERROR] Exception in summary_view: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[ERROR] Exception in summary_view: %s", e)
             context["error"] = f"Error generating summary: {str(e)}"
-            return render(request, "summarizer.html", context)
+            return await arender(request, "summarizer.html", context)
 
-    return render(request, "summarizer.html", context)
+    return await arender(request, "summarizer.html", context)
 
 
 def download_summary_pdf(request):
@@ -195,42 +284,49 @@ def download_summary_pdf(request):
         summary_text = summary_session_data["summary_text"]
         topic = summary_session_data["topic"]
 
-        print(f"[DEBUG] Generating Summary PDF: {topic}")
+        logger.debug("[DEBUG] Generating Summary PDF: %s", topic)
 
-        pdf_bytes = generate_summary_pdf(summary_text, topic)
-
-        response = HttpResponse(pdf_bytes, content_type="application/pdf")
-        response['Content-Disposition'] = f'attachment; filename="{topic}_Summary.pdf"'
-        return response
+        return _pdf_response(request, "summary", summary_text, topic)
         
     except Exception as e:
-        print(f"[ERROR] Summary PDF download failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[ERROR] Summary PDF download failed: %s", e)
         return HttpResponse(f"Error generating PDF: {str(e)}", status=500)
 
 
+def download_summary_docx(request):
+    """Download the summary as a Word document"""
+    summary_session_data = request.session.get("summary_for_pdf")
+
+    if not summary_session_data:
+        return HttpResponse("No summary generated yet. Please generate a summary first.", status=400)
+
+    topic = summary_session_data["topic"]
+    return _docx_response(
+        "summary", summary_session_data["summary_text"], topic, "Quick Revision Notes", f"{topic}_Summary.docx"
+    )
+
+
 # ========================= TUTORIAL VIEWS (UNCHANGED) =========================
-def tutorial_view(request):
+async def tutorial_view(request):
     """Generate AI tutorial from topic"""
     context = {}
 
     if request.method == "POST":
-        print("[DEBUG] Tutorial POST request received")
+        logger.debug("[DEBUG] Tutorial POST request received")
         
         topic = request.POST.get("topic", "").strip()
         depth = request.POST.get("depth", "medium")
 
-        print(f"[DEBUG] Topic: {topic}, Depth: {depth}")
+        logger.debug("[DEBUG] Topic: %s, Depth: %s", topic, depth)
 
         # Validation
         if not topic:
             context["error"] = "Please enter a topic for tutorial generation."
-            return render(request, "tutorials.html", context)
+            return await arender(request, "tutorials.html", context)
 
         if len(topic) < 3:
             context["error"] = "Please enter a valid topic (at least 3 characters)."
-            return render(request, "tutorials.html", context)
+            return await arender(request, "tutorials.html", context)
 
         # Map depth selection to numeric values
         depth_mapping = {
@@ -242,40 +338,39 @@ def tutorial_view(request):
 
         # Generate Tutorial
         try:
-            print(f"[DEBUG] Calling tutorial chain with depth={depth_value}...")
+            logger.debug("[DEBUG] Calling tutorial chain with depth=%s...", depth_value)
             
-            tutorial_result = tutorial_chain.invoke({
-                "topic": topic,
-                "depth": depth_value
-            })
+            tutorial_result = await agenerate_tutorial(topic, depth_value)
             
-            print(f"[DEBUG] Tutorial generated, length: {len(tutorial_result)}")
+            logger.debug("[DEBUG] Tutorial generated, length: %s", len(tutorial_result))
             
             if not tutorial_result or len(tutorial_result.strip()) == 0:
                 context["error"] = "Failed to generate tutorial. Please try again."
-                return render(request, "tutorials.html", context)
+                return await arender(request, "tutorials.html", context)
 
             # Store in context for display
             context["output"] = tutorial_result
+            context["output_html"] = render_html(
+                await sync_to_async(document_tree)("tutorial", tutorial_result)
+            )
             context["topic"] = topic
             context["depth"] = depth
 
             # Store tutorial in session for PDF download
-            request.session["tutorial_for_pdf"] = {
+            await request.session.aset("tutorial_for_pdf", {
                 "tutorial_text": tutorial_result,
                 "topic": topic,
-            }
+            })
+            await sync_to_async(render_pdf_task.delay)(tutorial_result, "tutorial", topic)
             
-            print(f"[SUCCESS] Tutorial generated and stored in session")
+            logger.info("[SUCCESS] Tutorial generated and stored in session")
             
         except Exception as e:
-            print(f"[ERROR] Exception in tutorial_view: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[ERROR] Exception in tutorial_view: %s", e)
             context["error"] = f"Error generating tutorial: {str(e)}"
-            return render(request, "tutorials.html", context)
+            return await arender(request, "tutorials.html", context)
 
-    return render(request, "tutorials.html", context)
+    return await arender(request, "tutorials.html", context)
 
 
 def download_tutorial_pdf(request):
@@ -289,65 +384,71 @@ def download_tutorial_pdf(request):
         tutorial_text = tutorial_session_data["tutorial_text"]
         topic = tutorial_session_data["topic"]
 
-        print(f"[DEBUG] Generating Tutorial PDF: {topic}")
-
-        # Generate PDF bytes
-        pdf_bytes = generate_tutorial_pdf(tutorial_text, topic)
+        logger.debug("[DEBUG] Generating Tutorial PDF: %s", topic)
 
-        response = HttpResponse(pdf_bytes, content_type="application/pdf")
-        response['Content-Disposition'] = f'attachment; filename="{topic}_Tutorial.pdf"'
-        return response
+        return _pdf_response(request, "tutorial", tutorial_text, topic)
         
     except Exception as e:
-        print(f"[ERROR] Tutorial PDF download failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[ERROR] Tutorial PDF download failed: %s", e)
         return HttpResponse(f"Error generating PDF: {str(e)}", status=500)
 
 
+def download_tutorial_docx(request):
+    """Download the tutorial as a Word document"""
+    tutorial_session_data = request.session.get("tutorial_for_pdf")
+
+    if not tutorial_session_data:
+        return HttpResponse("No tutorial generated yet. Please generate a tutorial first.", status=400)
+
+    topic = tutorial_session_data["topic"]
+    return _docx_response(
+        "tutorial", tutorial_session_data["tutorial_text"], topic, "Complete Tutorial", f"{topic}_Tutorial.docx"
+    )
+
+
 # ========================= QUIZ VIEWS (SYNC) =========================
-def quiz_view(request):
+async def quiz_view(request):
     """Generate interactive quiz (sync version for fallback)"""
     context = {}
 
     if request.method == "POST":
-        print("[DEBUG] Quiz POST request received")
+        logger.debug("[DEBUG] Quiz POST request received")
         
         topic = request.POST.get("topic", "").strip()
         count = request.POST.get("count", "10").strip()
         difficulty = request.POST.get("difficulty", "medium")
 
-        print(f"[DEBUG] Topic: {topic}, Count: {count}, Difficulty: {difficulty}")
+        logger.debug("[DEBUG] Topic: %s, Count: %s, Difficulty: %s", topic, count, difficulty)
 
         # Validation
         if not topic:
             context["error"] = "Please enter a topic for quiz generation."
-            return render(request, "quiz.html", context)
+            return await arender(request, "quiz.html", context)
 
         if len(topic) < 3:
             context["error"] = "Please enter a valid topic (at least 3 characters)."
-            return render(request, "quiz.html", context)
+            return await arender(request, "quiz.html", context)
 
         try:
             count = int(count)
             if count <= 0 or count > 100:
                 context["error"] = "Please enter a number between 1 and 100."
-                return render(request, "quiz.html", context)
+                return await arender(request, "quiz.html", context)
         except ValueError:
             context["error"] = "Invalid number format."
-            return render(request, "quiz.html", context)
+            return await arender(request, "quiz.html", context)
 
         # Generate Quiz
         try:
-            print(f"[DEBUG] Calling quiz generator...")
+            logger.debug("[DEBUG] Calling quiz generator...")
             
-            quiz_questions = generate_quiz(topic, count, difficulty)
+            quiz_questions = await agenerate_quiz(topic, count, difficulty)
             
-            print(f"[DEBUG] Quiz generated with {len(quiz_questions)} questions")
+            logger.debug("[DEBUG] Quiz generated with %s questions", len(quiz_questions))
             
             if not quiz_questions or len(quiz_questions) == 0:
                 context["error"] = "Failed to generate quiz. Please try again."
-                return render(request, "quiz.html", context)
+                return await arender(request, "quiz.html", context)
 
             # Convert to JSON format for JavaScript
             questions_json = json.dumps(quiz_questions)
@@ -358,21 +459,19 @@ def quiz_view(request):
             context["count"] = count
             context["difficulty"] = difficulty
             
-            print(f"[SUCCESS] Quiz ready with {len(quiz_questions)} questions")
+            logger.info("[SUCCESS] Quiz ready with %s questions", len(quiz_questions))
             
         except Exception as e:
-            print(f"[ERROR] Exception in quiz_view: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("[ERROR] Exception in quiz_view: %s", e)
             context["error"] = f"Error generating quiz: {str(e)}"
-            return render(request, "quiz.html", context)
+            return await arender(request, "quiz.html", context)
 
-    return render(request, "quiz.html", context)
+    return await arender(request, "quiz.html", context)
 
 from django.shortcuts import redirect
 #==============MCQ ASYNC VIEW (UPDATED) ==================
 def mcq_view_async(request):
-    print("🚀 ASYNC MCQ VIEW HIT")
+    logger.debug("[VIEW] Async MCQ view")
 
     if request.method == "POST":
         topic = request.POST.get("topic", "").strip()
@@ -389,7 +488,11 @@ def mcq_view_async(request):
         if existing_task_id:
             return redirect("mcq_async")  # name of your mcq url
 
-        task = mcq_generation_task.delay(topic, count, difficulty)
+        # The PDF is rendered by a linked task as soon as the MCQs are ready
+        task = mcq_generation_task.apply_async(
+            args=(topic, count, difficulty),
+            link=render_pdf_task.s("mcq", topic)
+        )
 
         # ✅ Store task info in session
         request.session["mcq_task_id"] = task.id
@@ -411,13 +514,13 @@ def tutorial_view_async(request):
     """
     Asynchronous tutorial generation using Celery
     """
-    print("🚀 ASYNC TUTORIAL VIEW HIT")
+    logger.debug("[VIEW] Async tutorial view")
 
     if request.method == "POST":
         topic = request.POST.get("topic", "").strip()
         depth = request.POST.get("depth", "medium")
 
-        print(f"[DEBUG] Tutorial Async - Topic: {topic}, Depth: {depth}")
+        logger.debug("[DEBUG] Tutorial Async - Topic: %s, Depth: %s", topic, depth)
 
         # Validation
         if not topic:
@@ -443,9 +546,13 @@ def tutorial_view_async(request):
         depth_value = depth_mapping.get(depth, "2")
 
         # Trigger Celery task
-        task = tutorial_generation_task.delay(topic, depth_value)
+        task = tutorial_generation_task.apply_async(
+            args=(topic, depth_value),
+            kwargs={"stream": True},
+            link=render_pdf_task.s("tutorial", topic)
+        )
 
-        print(f"[DEBUG] Tutorial task triggered: {task.id}")
+        logger.debug("[DEBUG] Tutorial task triggered: %s", task.id)
 
         # ✅ STORE TASK INFO IN SESSION
         request.session["tutorial_task_id"] = task.id
@@ -469,20 +576,25 @@ def summary_view_async(request):
     """
     Asynchronous summary generation using Celery
     """
-    print("🚀 ASYNC SUMMARY VIEW HIT")
+    logger.debug("[VIEW] Async summary view")
 
     if request.method == "POST":
         text_content = request.POST.get("text", "").strip()
         summary_type = request.POST.get("type", "short")
         tone_style = request.POST.get("tone", "simple")
+        mode = request.POST.get("mode", "auto")
 
-        print(f"[DEBUG] Summary Async - Text length: {len(text_content)}, Type: {summary_type}, Tone: {tone_style}")
+        logger.debug("[DEBUG] Summary Async - Text length: %s, Type: %s, Tone: %s, Mode: %s", len(text_content), summary_type, tone_style, mode)
 
         # Validation
         if not text_content:
             return render(request, "summarizer.html", {"error": "Please enter some text to summarize."})
 
-        if len(text_content) < 50:
+        if mode not in SUMMARY_MODES:
+            return render(request, "summarizer.html", {"error": "Please choose a valid input type."})
+
+        # A topic is explained before summarizing, so only pasted text needs length
+        if resolve_summary_mode(text_content, mode) == "text" and len(text_content) < 50:
             return render(request, "summarizer.html", {"error": "Please enter at least 50 characters."})
 
         # 🔒 PREVENT DUPLICATE TASK ON REFRESH
@@ -491,18 +603,19 @@ def summary_view_async(request):
             return redirect("summary_async")  # make sure URL name exists
 
         # Trigger Celery task
-        task = summary_generation_task.delay(
-            text_content,
-            summary_type,
-            tone_style
+        task = summary_generation_task.apply_async(
+            args=(text_content, summary_type, tone_style),
+            kwargs={"stream": True, "mode": mode},
+            link=render_pdf_task.s("summary", f"{summary_type.title()} Summary ({tone_style})")
         )
 
-        print(f"[DEBUG] Summary task triggered: {task.id}")
+        logger.debug("[DEBUG] Summary task triggered: %s", task.id)
 
         # ✅ STORE TASK INFO IN SESSION
         request.session["summary_task_id"] = task.id
         request.session["summary_type"] = summary_type
         request.session["summary_tone"] = tone_style
+        request.session["summary_mode"] = mode
 
         return redirect("summary_async")
 
@@ -511,18 +624,61 @@ def summary_view_async(request):
         "task_id": request.session.get("summary_task_id"),
         "type": request.session.get("summary_type"),
         "tone": request.session.get("summary_tone"),
+        "mode": request.session.get("summary_mode"),
     }
 
     return render(request, "summarizer.html", context)
 
 
+# ===== DOCUMENT UPLOAD SUMMARY VIEW =====
+@require_POST
+def summary_upload_view(request):
+    """
+    Summarize an uploaded PDF/DOCX with Celery. Text is extracted in the
+    worker; the result streams to the same page as pasted-text summaries.
+    """
+    document = request.FILES.get("document")
+    summary_type = request.POST.get("type", "short")
+    tone_style = request.POST.get("tone", "simple")
+
+    if document is None:
+        return render(request, "summarizer.html", {"error": "Please choose a PDF or DOCX file."})
+
+    if document_type(document.name) is None:
+        return render(request, "summarizer.html", {"error": "Only PDF and DOCX files are supported."})
+
+    if document.size > settings.DOCUMENT_MAX_UPLOAD_MB * 1024 * 1024:
+        return render(request, "summarizer.html", {
+            "error": f"Files up to {settings.DOCUMENT_MAX_UPLOAD_MB} MB are supported."
+        })
+
+    logger.debug("[DEBUG] Document upload - %s, %s bytes, Type: %s, Tone: %s", document.name, document.size, summary_type, tone_style)
+
+    # The task id names the stored file, so both are known before queuing
+    task_id = str(uuid.uuid4())
+    path = save_upload(document, task_id)
+    document_summary_task.apply_async(
+        args=(str(path), summary_type, tone_style),
+        kwargs={"stream": True},
+        task_id=task_id,
+        link=render_pdf_task.s("summary", f"{summary_type.title()} Summary ({tone_style})")
+    )
+
+    request.session["summary_task_id"] = task_id
+    request.session["summary_type"] = summary_type
+    request.session["summary_tone"] = tone_style
+    request.session["summary_mode"] = "text"
+
+    return redirect("summary_async")
+
+
 # ===== ASYNC QUIZ VIEW (REFRESH SAFE) =====
 @csrf_exempt
 def quiz_view_async(request):
     """
     Asynchronous quiz generation using Celery (refresh-safe)
     """
-    print("🚀 ASYNC QUIZ VIEW HIT")
+    logger.debug("[VIEW] Async quiz view")
 
     if request.method == "POST":
         try:
@@ -558,7 +714,7 @@ def quiz_view_async(request):
             request.session["quiz_count"] = count
             request.session["quiz_difficulty"] = difficulty
 
-            print(f"[DEBUG] Quiz task triggered: {task.id}")
+            logger.debug("[DEBUG] Quiz task triggered: %s", task.id)
 
             return JsonResponse({
                 "task_id": task.id,
@@ -566,7 +722,7 @@ def quiz_view_async(request):
             })
 
         except Exception as e:
-            print(f"[ERROR] Quiz async error: {str(e)}")
+            logger.error("[ERROR] Quiz async error: %s", e)
             return JsonResponse({"error": str(e)}, status=500)
 
     # GET → refresh safe
@@ -576,6 +732,19 @@ def quiz_view_async(request):
     })
 
 
+TASK_SESSION_KEYS = (
+    "mcq_task_id", "mcq_topic",
+    "summary_task_id", "summary_type", "summary_mode", "summary_tone",
+    "tutorial_task_id", "tutorial_topic", "tutorial_depth",
+    "quiz_task_id", "quiz_topic", "quiz_count", "quiz_difficulty",
+)
+
+
+def _clear_task_session(request):
+    for key in TASK_SESSION_KEYS:
+        request.session.pop(key, None)
+
+
 # ===== TASK STATUS VIEW (FIXED FOR FRONTEND COMPATIBILITY) =====
 def task_status_view(request, task_id):
     """
@@ -584,22 +753,11 @@ def task_status_view(request, task_id):
     try:
         result = AsyncResult(task_id)
         
-        print(f"[TASK STATUS] Task ID: {task_id}, State: {result.state}")
+        logger.debug("[TASK STATUS] Task ID: %s, State: %s", task_id, result.state)
         
         if result.state == "SUCCESS":
-            request.session.pop("mcq_task_id", None)
-            request.session.pop("mcq_topic", None)
-            request.session.pop("summary_task_id", None)
-            request.session.pop("summary_type", None)
-            request.session.pop("summary_tone", None)
-            request.session.pop("tutorial_task_id", None)
-            request.session.pop("tutorial_topic", None)
-            request.session.pop("tutorial_depth", None)
-            request.session.pop("quiz_task_id", None)
-            request.session.pop("quiz_topic", None)
-            request.session.pop("quiz_count", None)
-            request.session.pop("quiz_difficulty", None)
-            
+            _clear_task_session(request)
+
 
             data = {
                 "ready": True,
@@ -608,7 +766,7 @@ def task_status_view(request, task_id):
                 "status": result.state
             }
 
-            print(f"[TASK STATUS] SUCCESS - Result type: {type(result.result)}")
+            logger.debug("[TASK STATUS] SUCCESS - Result type: %s", type(result.result))
             
         elif result.state == "FAILURE":
             data = {
@@ -617,7 +775,16 @@ def task_status_view(request, task_id):
                 "error": str(result.info),
                 "status": result.state
             }
-            print(f"[TASK STATUS] FAILURE - Error: {str(result.info)}")
+            logger.debug("[TASK STATUS] FAILURE - Error: %s", result.info)
+
+        elif result.state == "PROGRESS":
+            # Partial result: {"items": [...], "done": n, "total": N}
+            data = {
+                "ready": False,
+                "successful": False,
+                "progress": result.info,
+                "status": result.state
+            }
             
         else:
             data = {
@@ -625,20 +792,63 @@ def task_status_view(request, task_id):
                 "successful": False,
                 "status": result.state
             }
-            print(f"[TASK STATUS] PENDING/PROCESSING - State: {result.state}")
+            logger.debug("[TASK STATUS] PENDING/PROCESSING - State: %s", result.state)
 
         return JsonResponse(data)
         
     except Exception as e:
-        print(f"[TASK STATUS ERROR] {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[TASK STATUS ERROR] %s", e)
         return JsonResponse({
             "ready": True,
             "successful": False,
             "error": str(e)
         }, status=500)
 
+# ===== TASK COMPLETION EVENTS (LONG-POLL / SSE) =====
+TASK_EVENTS_MAX_WAIT = 25
+
+
+async def task_events_view(request, task_id):
+    """
+    Wait for a Celery task to finish without polling the result backend.
+    Completion is pushed through Redis by the task_success/task_failure
+    signals, so waiting clients hold no database connection (and, being
+    async, no thread).
+
+    Accept: text/event-stream -> SSE with a single `complete` event
+    Otherwise -> long-poll JSON shaped like task-status, held up to ?wait=
+    seconds; "ready": false means ask again
+    """
+    if "text/event-stream" in request.headers.get("Accept", ""):
+        response = StreamingHttpResponse(sse_task_events(task_id), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    try:
+        wait = min(float(request.GET.get("wait", TASK_EVENTS_MAX_WAIT)), TASK_EVENTS_MAX_WAIT)
+    except ValueError:
+        wait = TASK_EVENTS_MAX_WAIT
+
+    try:
+        data = await wait_for_task(task_id, wait)
+    except Exception as e:
+        logger.error("[TASK EVENTS ERROR] %s", e)
+        data = None
+
+    if data is None:
+        # Nothing pushed yet: the task may still be running, or may have
+        # finished before this worker published. One backend check per
+        # long-poll instead of one per 2-second poll.
+        data = await sync_to_async(backend_task_status)(task_id)
+
+    if data.get("successful"):
+        for key in TASK_SESSION_KEYS:
+            await request.session.apop(key, None)
+
+    return JsonResponse(data)
+
+
 # ===== STORE MCQs IN SESSION FOR PDF DOWNLOAD (ADDED) =====
 @csrf_exempt
 @require_POST
@@ -656,14 +866,12 @@ def store_mcqs_view(request):
             "title": title
         }
         
-        print(f"[SESSION] Stored {len(mcqs)} MCQs for PDF download")
+        logger.info("[SESSION] Stored %s MCQs for PDF download", len(mcqs))
         
         return JsonResponse({"success": True})
         
     except Exception as e:
-        print(f"[SESSION ERROR] {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[SESSION ERROR] %s", e)
         return JsonResponse({"success": False, "error": str(e)}, status=500)
 
 # ===== STORE SUMMARY IN SESSION FOR PDF DOWNLOAD (ADDED) =====
@@ -684,14 +892,12 @@ def store_summary_view(request):
             "topic": f"{summary_type.title()} Summary ({tone_style})"
         }
         
-        print(f"[SESSION] Stored summary for PDF download (length: {len(summary_text)})")
+        logger.info("[SESSION] Stored summary for PDF download (length: %s)", len(summary_text))
         
-        return JsonResponse({"success": True})
+        return JsonResponse({"success": True, "html": render_html(document_tree("summary", summary_text))})
         
     except Exception as e:
-        print(f"[SESSION ERROR] {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[SESSION ERROR] %s", e)
         return JsonResponse({"success": False, "error": str(e)}, status=500)
 
 # ===== STORE TUTORIAL IN SESSION FOR PDF DOWNLOAD (ADDED) =====
@@ -711,12 +917,64 @@ def store_tutorial_view(request):
             "topic": topic
         }
         
-        print(f"[SESSION] Stored tutorial for PDF download (length: {len(tutorial_text)})")
+        logger.info("[SESSION] Stored tutorial for PDF download (length: %s)", len(tutorial_text))
         
-        return JsonResponse({"success": True})
+        tree = document_tree("tutorial", tutorial_text)
+        return JsonResponse({"success": True, "pages": html_pages(tree, TUTORIAL_PAGE_CHARS)})
         
     except Exception as e:
-        print(f"[SESSION ERROR] {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return JsonResponse({"success": False, "error": str(e)}, status=500)
\ No newline at end of file
+        logger.exception("[SESSION ERROR] %s", e)
+        return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+# ===== GENERATION CACHE STATS =====
+def cache_stats_view(request):
+    """
+    Hit/miss counters of the generation cache per generator
+    """
+    return JsonResponse(cache_stats())
+
+
+# ===== LLM RATE LIMIT BUDGET =====
+def llm_budget_view(request):
+    """
+    Requests and tokens left in the shared Groq budget per model
+    """
+    try:
+        return JsonResponse(budget_status())
+    except redis.RedisError as e:
+        logger.warning("[RATE LIMIT] Redis unavailable for budget status: %s", e)
+        return JsonResponse({"error": "Rate limit budget unavailable"}, status=503)
+
+
+# ===== PROMETHEUS METRICS =====
+def metrics_view(request):
+    """
+    Per-stage latency and token histograms from all web and worker processes
+    """
+    try:
+        body = render_metrics()
+    except redis.RedisError as e:
+        logger.warning("[METRICS] Redis unavailable for scrape: %s", e)
+        return HttpResponse("Metrics store unavailable\n", status=503, content_type="text/plain; charset=utf-8")
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ===== LIVE TEXT STREAM (SSE) =====
+def stream_view(request, task_id):
+    """
+    Relay a streaming task's text chunks as Server-Sent Events.
+    Resumes from Last-Event-ID (sent by EventSource on reconnect) or ?offset=
+    """
+    last_event_id = request.headers.get("Last-Event-ID")
+    try:
+        if last_event_id is not None:
+            offset = int(last_event_id) + 1
+        else:
+            offset = int(request.GET.get("offset", 0))
+    except ValueError:
+        offset = 0
+
+    response = StreamingHttpResponse(sse_events(task_id, offset), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -216,3 +216,126 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_BACKEND = "django-db"
 CELERY_RESULT_EXPIRES = 3600
+
+# Workers run the threads pool (see docker-compose): tasks spend nearly all
+# their time waiting on Groq, so one process can run dozens at once.
+# Prefetch one message per thread so long tasks spread across workers.
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Max concurrent executions per task type within one worker process.
+# Tasks over the limit are re-queued rather than holding a thread.
+TASK_CONCURRENCY_LIMITS = {
+    "mcq": int(os.getenv("MCQ_TASK_CONCURRENCY", 16)),
+    "quiz": int(os.getenv("QUIZ_TASK_CONCURRENCY", 16)),
+    "tutorial": int(os.getenv("TUTORIAL_TASK_CONCURRENCY", 8)),
+    "summary": int(os.getenv("SUMMARY_TASK_CONCURRENCY", 16)),
+    "document": int(os.getenv("DOCUMENT_TASK_CONCURRENCY", 4)),
+}
+
+# ===============================
+# REDIS / GENERATION CACHE
+# ===============================
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "1") == "1"
+GENERATION_CACHE_TTL = int(os.getenv("GENERATION_CACHE_TTL", 60 * 60 * 24 * 7))
+
+# Near-duplicate topics ("Binary Trees" / "binary tree") share cached output
+# when the Dice similarity of their canonical words reaches this threshold.
+TOPIC_SIMILARITY_ENABLED = os.getenv("TOPIC_SIMILARITY_ENABLED", "1") == "1"
+TOPIC_SIMILARITY_THRESHOLD = float(os.getenv("TOPIC_SIMILARITY_THRESHOLD", 0.8))
+TOPIC_INDEX_REFRESH_SECONDS = 1.0
+
+# MCQ and quiz requests are filled from stored questions before the LLM.
+QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "1") == "1"
+
+# Large MCQ/quiz requests are generated as concurrent chunks of this size.
+MCQ_CHUNK_SIZE = int(os.getenv("MCQ_CHUNK_SIZE", 10))
+QUIZ_CHUNK_SIZE = int(os.getenv("QUIZ_CHUNK_SIZE", 10))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+FANOUT_TOPUP_ROUNDS = 2
+
+# Summarizer input in "auto" mode: one line of at most this many words is
+# a topic to explain first, anything longer is summarized directly.
+SUMMARY_TOPIC_MAX_WORDS = int(os.getenv("SUMMARY_TOPIC_MAX_WORDS", 12))
+
+# Text estimated above SUMMARY_MAP_REDUCE_TOKENS is summarized map-reduce:
+# chunks of SUMMARY_CHUNK_TOKENS (overlapping by SUMMARY_CHUNK_OVERLAP_TOKENS)
+# are condensed in parallel, then the notes are summarized together.
+SUMMARY_MAP_REDUCE_TOKENS = int(os.getenv("SUMMARY_MAP_REDUCE_TOKENS", 6000))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 2000))
+SUMMARY_CHUNK_OVERLAP_TOKENS = int(os.getenv("SUMMARY_CHUNK_OVERLAP_TOKENS", 150))
+
+# PDF/DOCX uploads for the summarizer. Files are written to a directory
+# shared by web and worker containers and removed once summarized. PDF
+# pages are extracted in DOCUMENT_EXTRACT_PROCESSES worker processes, in
+# ranges of DOCUMENT_EXTRACT_PAGES_PER_TASK pages with at most
+# DOCUMENT_EXTRACT_WINDOW ranges in flight.
+DOCUMENT_UPLOAD_DIR = os.getenv("DOCUMENT_UPLOAD_DIR", str(BASE_DIR / "uploads"))
+DOCUMENT_MAX_UPLOAD_MB = int(os.getenv("DOCUMENT_MAX_UPLOAD_MB", 50))
+DOCUMENT_MAX_PAGES = int(os.getenv("DOCUMENT_MAX_PAGES", 1000))
+DOCUMENT_MAX_CHARS = int(os.getenv("DOCUMENT_MAX_CHARS", 3_000_000))
+DOCUMENT_EXTRACT_PROCESSES = int(os.getenv("DOCUMENT_EXTRACT_PROCESSES", os.cpu_count() or 1))
+DOCUMENT_EXTRACT_PAGES_PER_TASK = 10
+DOCUMENT_EXTRACT_WINDOW = 2 * DOCUMENT_EXTRACT_PROCESSES
+
+# Groq account limits per model. All processes share one requests bucket
+# and one tokens bucket per model in Redis; calls over budget wait their
+# turn (first come, first served) instead of hitting 429s. Buckets hold
+# LLM_RATE_BURST_SECONDS of refill, and a call fails only if the budget
+# is already booked more than LLM_RATE_MAX_WAIT seconds ahead.
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "1") == "1"
+LLM_RATE_LIMITS = {
+    "llama-3.3-70b-versatile": {
+        "rpm": int(os.getenv("GROQ_70B_RPM", 1000)),
+        "tpm": int(os.getenv("GROQ_70B_TPM", 300000)),
+    },
+    "llama-3.1-8b-instant": {
+        "rpm": int(os.getenv("GROQ_8B_RPM", 1000)),
+        "tpm": int(os.getenv("GROQ_8B_TPM", 250000)),
+    },
+}
+LLM_RATE_BURST_SECONDS = float(os.getenv("LLM_RATE_BURST_SECONDS", 10))
+LLM_RATE_MAX_WAIT = float(os.getenv("LLM_RATE_MAX_WAIT", 300))
+
+# Hedged LLM calls (opt-in). If a listed model has not streamed a token
+# within the p95 of its recent time-to-first-token, the request is also
+# sent to its backup (the same model or a faster one) and the first
+# response wins. Until LLM_HEDGE_MIN_SAMPLES calls have been seen, the
+# deadline is LLM_HEDGE_DEFAULT_DEADLINE seconds.
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0") == "1"
+LLM_HEDGE_BACKUPS = {
+    "llama-3.3-70b-versatile": os.getenv("LLM_HEDGE_BACKUP_MODEL", "llama-3.1-8b-instant"),
+}
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 95))
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_HEDGE_DEFAULT_DEADLINE = float(os.getenv("LLM_HEDGE_DEFAULT_DEADLINE", 2.0))
+LLM_HEDGE_MIN_DEADLINE = 0.25
+
+# Generators pick the 8B or 70B model per request from its size and
+# difficulty/depth (see llm_config.route_model). Borderline requests drop
+# to 8B when the 70B model is currently too slow for this budget.
+LLM_ROUTER_ENABLED = os.getenv("LLM_ROUTER_ENABLED", "1") == "1"
+LLM_ROUTER_LATENCY_BUDGET = float(os.getenv("LLM_ROUTER_LATENCY_BUDGET", 30))
+
+# Rendered PDF downloads are cached in Redis by content hash, as an LRU
+# bounded to PDF_CACHE_MAX_MB (entries have no TTL).
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "1") == "1"
+PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", 128))
+
+# Smaller PDFs with the same appearance: repeated boxes and page headers
+# drawn once as form XObjects, grey colours and font selections written
+# only as needed (see pdf_engine). 0 renders them as FPDF would.
+PDF_OPTIMIZE = os.getenv("PDF_OPTIMIZE", "1") == "1"
+
+# PDFs are rendered by a Celery task when generation finishes and kept in
+# the artifact store for ARTIFACT_TTL seconds; download links to them are
+# signed, stay the same for ARTIFACT_URL_MAX_AGE seconds and expire one to
+# two of those windows after they are issued.
+ARTIFACT_TTL = int(os.getenv("ARTIFACT_TTL", 6 * 3600))
+ARTIFACT_URL_MAX_AGE = int(os.getenv("ARTIFACT_URL_MAX_AGE", 300))
+
+# Per-stage latency histograms, shared across processes in Redis and
+# served on /metrics in the Prometheus text format.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
@@ -17,6 +17,8 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from ai_core.views import metrics_view
+
 admin.site.site_header = "ExamPrep Dost"
 admin.site.site_title = "My Admin Portal"
 admin.site.index_title = "Welcome to My Dashboard"
@@ -26,4 +28,5 @@ urlpatterns = [
     path('', include('home.urls')),
     path('ai/',include('ai_core.urls')),
     path('accounts/', include('allauth.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]